@@ -1,2 +1,4 @@
 # agents/__init__.py
-from .agents_graph import run_property_workflow
+from .agents_graph import run_property_workflow, arun_property_workflow, astream_property_workflow
+from .batch import submit_batch, get_batch
+from .jobs import submit_job, get_job, start_job_workers, stop_job_workers, job_stats
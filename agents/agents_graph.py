@@ -1,12 +1,29 @@
 # -*- coding: utf-8 -*-
-from typing import Dict, Any, List, TypedDict, Optional
+import operator
+import time
+from typing import Dict, Any, List, TypedDict, Optional, AsyncIterator, Annotated
 from loguru import logger
 from langgraph.graph import StateGraph, START, END
 
-from app.scraper import scrape_la_city_planning
-from app.search_integration import tavily_search_many
-from app.llm_integration import analyze_with_llm, plan_queries, extract_merge
+from app.aio import run_sync
+from app.scraper import PANEL_NAMES, scrape_la_city_planning_async
+from app.panel_cache import get_cached_panels, store_panels, format_age
+from app.search_integration import tavily_search_many_async
+from app.llm_integration import (
+    analyze_with_llm_async, analyze_with_llm_stream, plan_queries_async, extract_merge_async,
+    report_from_text, failed_report,
+)
+from app.panel_parser import parse_panels, parcel_fields
+from app.prompt_budget import missing_fields
+from app.completeness import completeness, fact_set, record_decision
 from app.prompts import REPORT_SYSTEM_PROMPT
+from app.metrics import NODE_ERRORS, NODE_LATENCY, WORKFLOW_LATENCY, instrument_node
+from app.cache import make_key
+from app.singleflight import get_singleflight
+from app.parcel_artifacts import (
+    content_hash, panels_hash, get_artifact, put_artifact, latest_base_extract, search_max_age_sec,
+)
+from app.settings import get_settings
 
 # -------------------- Types & Helpers --------------------
 
@@ -20,11 +37,26 @@ class PropState(TypedDict, total=False):
     queries: List[str]
     include_domains: List[str]
     stop_condition: str
-    iter: int
+    iter: int                        # completed plan/search/extract rounds
+    facts_added: int                 # facts the last extract round added to la_data
+    decision: str                    # why node_decide stopped looping
     report: Dict[str, Any]
-    errors: List[str]
+    errors: Annotated[List[str], operator.add]
     __next__: str
     user_queries: List[str]          # << new: user-provided questions
+    use_cache: bool                  # False -> bypass search, LLM response and artefact caches for this run
+    force_refresh: bool              # True -> re-scrape ZIMAS even if cached panels are fresh
+    notices: Annotated[List[str], operator.add]   # informational messages surfaced as warnings
+    token_usage: Annotated[List[Dict[str, Any]], operator.add]   # one prompt-packing entry per LLM call
+    scrape_timing: Optional[Dict[str, Any]]   # phase breakdown of a live ZIMAS scrape (None when cached)
+    # output of node_format
+    formatted_text: str
+    raw_llm_text: str
+    sections: List[Dict[str, Any]]
+    sources: List[Dict[str, Any]]
+    warnings: List[str]
+    llm_model: Optional[str]         # model that served the report
+    iterations: int                  # = iter, as reported in the response
 
 def build_address(street_name: str, house_number: str, city: str = "Los Angeles, CA") -> str:
     street = " ".join((street_name or "").split()).strip()
@@ -36,98 +68,245 @@ def _ensure_address(state: PropState) -> str:
         state["address"] = build_address(state["street_name"], state["house_number"])
     return state["address"]
 
+def _combined_notes(state: PropState) -> List[Dict[str, Any]]:
+    return (state.get("search_notes") or []) + (state.get("tavily_results") or [])
+
 # -------------------- Nodes --------------------
+# Nodes return only the keys they change: scrape and search may run as parallel branches,
+# and LangGraph rejects two writes to the same plain key within one step.
+
+async def _scrape_and_store(address: str, street_name: str, house_number: str,
+                            panel_names: Optional[List[str]] = None) -> Dict[str, Any]:
+    data = await scrape_la_city_planning_async(street_name, house_number, panel_names)
+    store_panels(address, data)
+    return data
+
+def _format_ages(ages: Dict[str, float]) -> str:
+    return ", ".join(f"{name} {format_age(age)}" for name, age in ages.items())
 
-def node_scrape(state: PropState) -> PropState:
+async def node_scrape(state: PropState) -> PropState:
+    out: PropState = {}
     try:
-        data = scrape_la_city_planning(state["street_name"], state["house_number"])
-        state["la_data"] = {
-            "panels": data.get("panels", {}),
+        address = _ensure_address(state)
+        cached = None if state.get("force_refresh") else get_cached_panels(address, PANEL_NAMES)
+        if cached is not None and not cached.stale:
+            data = cached.data
+            out["notices"] = [f"zimas_cache: panels served from cache (ages: {_format_ages(cached.ages)})"]
+            out["scrape_timing"] = None
+        else:
+            # re-scrape only the stale or missing panels when the rest of the entry is fresh
+            refresh = cached.stale if cached is not None else None
+            data = await get_singleflight("scrape").do(
+                make_key(address.lower(), refresh),
+                lambda: _scrape_and_store(address, state["street_name"], state["house_number"], refresh),
+            )
+            out["scrape_timing"] = data.get("timing")
+            if cached is not None:
+                fresh = {k: v for k, v in (data.get("panels") or {}).items() if v}
+                data = {**cached.data, "panels": {**cached.data["panels"], **fresh}}
+                refreshed = [f"{k} ({'expired' if k in cached.ages else 'not cached'})" for k in refresh]
+                out["notices"] = [
+                    f"zimas_cache: refreshed {', '.join(refreshed)}; other panels served from cache "
+                    f"(ages: {_format_ages({k: a for k, a in cached.ages.items() if k not in refresh})})"
+                ]
+        panels = data.get("panels", {})
+        facts = parse_panels(panels)
+        logger.info(f"[PARSE] {address}: zone={facts.zoning} known={facts.known_fields}")
+        out["la_data"] = {
+            "panels": panels,
             "notes": data.get("notes", ""),
             "sources": data.get("sources", []),
+            "facts": facts.model_dump(),
+            **parcel_fields(facts),
         }
-        state["tavily_results"] = data.get("tavily_results", [])
+        out["tavily_results"] = data.get("tavily_results", [])
     except Exception as e:
         logger.exception("scrape failed")
-        state.setdefault("errors", []).append(f"scrape:{e}")
-        state["la_data"] = {
+        out["errors"] = [f"scrape:{e}"]
+        out["la_data"] = {
             "street_name": state["street_name"],
             "house_number": state["house_number"],
         }
-    return state
+    return out
 
-def node_plan(state: PropState) -> PropState:
+async def node_plan(state: PropState) -> PropState:
     try:
         address = _ensure_address(state)
 
         # If the user supplied queries, use them and stop planning.
         user_qs = [q.strip() for q in (state.get("user_queries") or []) if str(q).strip()]
         if user_qs:
-            state["queries"] = user_qs
-            # Keep official domains as a starting point; Tavily can still search broadly if needed.
-            state["include_domains"] = ["planning.lacity.gov", "zimas.lacity.org", "ladbs.org"]
-            state["stop_condition"] = "enough"
-            return state
-
-        # Otherwise, let planner generate focused queries
-        plan = plan_queries(address, state.get("la_data", {}))
-        state["queries"] = plan.get("queries", [])
-        state["include_domains"] = plan.get(
-            "include_domains",
-            ["planning.lacity.gov", "zimas.lacity.org", "ladbs.org"]
-        )
-        state["stop_condition"] = plan.get("stop_condition", "")
+            return {
+                "queries": user_qs,
+                # Keep official domains as a starting point; Tavily can still search broadly if needed.
+                "include_domains": ["planning.lacity.gov", "zimas.lacity.org", "ladbs.org"],
+                "stop_condition": "enough",
+            }
+
+        # Otherwise, let planner generate focused queries (or reuse them if the facts are unchanged)
+        la_data = state.get("la_data", {})
+        use_cache = state.get("use_cache", True)
+        usage: List[Dict[str, Any]] = []
+        inputs = content_hash(la_data)
+        plan = get_artifact(address, "plan", inputs) if use_cache else None
+        if plan is None:
+            plan = await plan_queries_async(address, la_data, use_cache=use_cache, usage=usage)
+            if plan.get("stop_condition") != "error":
+                put_artifact(address, "plan", inputs, plan)
+        return {
+            "queries": plan.get("queries", []),
+            "include_domains": plan.get(
+                "include_domains",
+                ["planning.lacity.gov", "zimas.lacity.org", "ladbs.org"]
+            ),
+            "stop_condition": plan.get("stop_condition", ""),
+            "token_usage": usage,
+        }
     except Exception as e:
         logger.exception("plan failed")
-        state.setdefault("errors", []).append(f"plan:{e}")
-        state["queries"] = []
-        state["include_domains"] = []
-        state["stop_condition"] = "error"
-    return state
+        return {
+            "errors": [f"plan:{e}"],
+            "queries": [],
+            "include_domains": [],
+            "stop_condition": "error",
+        }
 
-def node_search(state: PropState) -> PropState:
+async def node_search(state: PropState) -> PropState:
     try:
-        notes = tavily_search_many(state.get("queries", []), state.get("include_domains", []))
-        state["search_notes"] = notes or []
+        address = _ensure_address(state)
+        use_cache = state.get("use_cache", True)
+        inputs = content_hash(state.get("queries", []), state.get("include_domains", []))
+        notes = get_artifact(address, "search", inputs, max_age_sec=search_max_age_sec()) if use_cache else None
+        if notes is None:
+            notes = await tavily_search_many_async(
+                state.get("queries", []),
+                state.get("include_domains", []),
+                use_cache=use_cache,
+            )
+            if notes:
+                put_artifact(address, "search", inputs, notes)
+        return {"search_notes": notes or []}
     except Exception as e:
         logger.exception("search failed")
-        state.setdefault("errors", []).append(f"search:{e}")
-        state["search_notes"] = []
-    return state
+        return {"errors": [f"search:{e}"], "search_notes": []}
+
+async def node_prefetch(state: PropState) -> PropState:
+    """
+    Plan + search as one node for runs with user queries, so the whole search branch
+    fits in the same graph step as node_scrape (each step waits for its slowest node).
+    """
+    planned = await node_plan(state)
+    searched = await node_search({**state, **planned})
+    errors = (planned.get("errors") or []) + (searched.get("errors") or [])
+    out: PropState = {**planned, **searched}
+    if errors:
+        out["errors"] = errors
+    return out
+
+def node_join(state: PropState) -> PropState:
+    """Fan-in point of the parallel scrape / prefetch branches."""
+    logger.info(
+        f"[GRAPH] join: panels={sum(1 for v in ((state.get('la_data') or {}).get('panels') or {}).values() if v)} "
+        f"notes={len(state.get('search_notes') or [])}"
+    )
+    return {}
 
-def node_extract(state: PropState) -> PropState:
+async def node_extract(state: PropState) -> PropState:
     try:
         address = _ensure_address(state)
-        combined_notes = (state.get("search_notes") or []) + (state.get("tavily_results") or [])
-        merged = extract_merge(address, state.get("la_data", {}), combined_notes)
-        state["la_data"] = merged
+        la_data = state.get("la_data", {})
+        combined_notes = _combined_notes(state)
+        use_cache = state.get("use_cache", True)
+        inputs = content_hash(la_data, combined_notes)
+        merged = get_artifact(address, "extract", inputs) if use_cache else None
+        if merged is not None:
+            return {"la_data": merged, "facts_added": _facts_added(la_data, merged)}
+        panels = panels_hash(la_data)
+        if use_cache and _has_user_queries(state):
+            # follow-up questions on known panels: keep the facts of the last full analysis and
+            # let the report read the question results directly
+            base = latest_base_extract(address, panels)
+            if base is not None:
+                return {"la_data": base, "facts_added": _facts_added(la_data, base),
+                        "notices": ["artifacts: reused facts extracted by the previous analysis"]}
+        usage: List[Dict[str, Any]] = []
+        merged = await extract_merge_async(address, la_data, combined_notes, use_cache=use_cache, usage=usage)
+        if merged is not la_data:  # extract_merge_async hands la_data back unchanged when the LLM call fails
+            put_artifact(address, "extract", inputs, merged,
+                         meta={"panels": panels, "user_queries": _has_user_queries(state)})
+        return {"la_data": merged, "facts_added": _facts_added(la_data, merged), "token_usage": usage}
     except Exception as e:
         logger.exception("extract failed")
-        state.setdefault("errors", []).append(f"extract:{e}")
-    return state
+        return {"errors": [f"extract:{e}"], "facts_added": 0}
+
+def _facts_added(before: Dict[str, Any], after: Dict[str, Any]) -> int:
+    return len(fact_set(after) - fact_set(before))
+
+MAX_ROUNDS = 2
+# ZIMAS lists no LADBS permits, so the panels never settle them; a parcel whose panels answer
+# everything else goes to the report without a search round for permits alone
+SCRAPE_OPTIONAL_FIELDS = ("permits",)
+
+def _missing_after_scrape(la_data: Dict[str, Any]) -> List[str]:
+    return [f for f in missing_fields(la_data) if f not in SCRAPE_OPTIONAL_FIELDS]
 
 def node_decide(state: PropState) -> PropState:
-    it = state.get("iter", 0)
-    stop = (state.get("stop_condition") == "enough")
-    state["iter"] = it + 1
-    state["__next__"] = "analyze" if stop or it >= 1 else "plan"
-    return state
+    """
+    Loops back to plan while fields are missing and the last round found something new.
+    Reached straight from scrape when the panels answer every field but SCRAPE_OPTIONAL_FIELDS.
+    """
+    la_data = state.get("la_data") or {}
+    after_round = "facts_added" in state
+    rounds = state.get("iter", 0) + (1 if after_round else 0)
+    missing = missing_fields(la_data)
+    if not after_round:
+        reason = "complete_after_scrape"
+    elif not missing:
+        reason = "complete"
+    elif state.get("facts_added") == 0:
+        reason = "no_new_facts"
+    elif state.get("stop_condition") == "enough":
+        reason = "planner_enough"
+    elif rounds >= MAX_ROUNDS:
+        reason = "max_iterations"
+    else:
+        reason = ""
+    logger.info(f"[DECIDE] rounds={rounds} completeness={completeness(la_data)} missing={missing} "
+                f"-> {reason or 'plan'}")
+    return {
+        "iter": rounds,
+        "decision": reason or f"missing: {', '.join(missing)}",
+        "__next__": "analyze" if reason else "plan",
+    }
 
-def node_analyze(state: PropState) -> PropState:
+async def node_analyze(state: PropState) -> PropState:
     try:
         address = _ensure_address(state)
-        combined_notes = (state.get("search_notes") or []) + (state.get("tavily_results") or [])
-        state["report"] = analyze_with_llm(
+        combined_notes = _combined_notes(state)
+        use_cache = state.get("use_cache", True)
+        inputs = content_hash(state.get("la_data", {}), combined_notes, REPORT_SYSTEM_PROMPT,
+                              get_settings().integrations.llm.model)
+        report = get_artifact(address, "report", inputs) if use_cache else None
+        if report is not None:
+            return {"report": report}
+        usage: List[Dict[str, Any]] = []
+        report = await analyze_with_llm_async(
             address=address,
             la_data=state.get("la_data", {}),
             search_notes=combined_notes,
-            system_prompt=REPORT_SYSTEM_PROMPT
+            system_prompt=REPORT_SYSTEM_PROMPT,
+            use_cache=use_cache,
+            usage=usage,
         )
+        if report.get("formatted_text"):
+            put_artifact(address, "report", inputs, report)
+        return {"report": report, "token_usage": usage}
     except Exception as e:
         logger.exception("llm failed")
-        state.setdefault("errors", []).append(f"llm:{e}")
-        state["report"] = {"sections": [{"title": "Error", "content": str(e)}]}
-    return state
+        return {
+            "errors": [f"llm:{e}"],
+            "report": {"sections": [{"title": "Error", "content": str(e)}]},
+        }
 
 def node_format(state: PropState) -> PropState:
     address = _ensure_address(state)
@@ -143,42 +322,81 @@ def node_format(state: PropState) -> PropState:
         "raw_llm_text": rpt.get("raw_llm_text", ""),   # ← חדש
         "sections": rpt.get("sections", []),
         "sources": (rpt.get("sources", []) + (state.get("la_data", {}).get("sources") or [])),
-        "warnings": ((rpt.get("warnings", []) or []) + (state.get("errors", []) or [])),
+        "warnings": ((rpt.get("warnings", []) or []) + (state.get("errors", []) or []) + (state.get("notices", []) or [])),
+        "llm_model": rpt.get("model"),
+        "decision": state.get("decision"),
+        "iterations": state.get("iter", 0),
     }
 
 
 # -------------------- Graph --------------------
-graph = StateGraph(PropState)
-graph.add_node("scrape", node_scrape)
-graph.add_node("plan", node_plan)
-graph.add_node("search", node_search)
-graph.add_node("extract", node_extract)
-graph.add_node("decide", node_decide)
-graph.add_node("analyze", node_analyze)
-graph.add_node("format", node_format)
-
-graph.add_edge(START, "scrape")
-graph.add_edge("scrape", "plan")
-graph.add_edge("plan", "search")
-graph.add_edge("search", "extract")
-graph.add_edge("extract", "decide")
-graph.add_conditional_edges("decide", lambda s: s["__next__"], {"plan": "plan", "analyze": "analyze"})
-graph.add_edge("analyze", "format")
-graph.add_edge("format", END)
-
-app = graph.compile()
+def _has_user_queries(state: PropState) -> bool:
+    return any(str(q).strip() for q in (state.get("user_queries") or []))
+
+def _route_start(state: PropState) -> List[str]:
+    # user queries don't depend on ZIMAS data: search alongside the scrape
+    return ["scrape", "prefetch"] if _has_user_queries(state) else ["scrape"]
+
+def _route_after_scrape(state: PropState) -> str:
+    if _has_user_queries(state):
+        return "join"
+    # every required field parsed from the panels: nothing to plan, search or extract
+    return "plan" if _missing_after_scrape(state.get("la_data") or {}) else "decide"
+
+def _build_graph(stop_before_analyze: bool = False):
+    """
+    Full workflow graph. Planner runs are sequential (scrape -> plan -> search -> extract);
+    with user queries, scrape and prefetch (plan + search) run in parallel and meet in `join`.
+    When the parsed panels answer every field but permits, scrape hands over to decide directly.
+    With stop_before_analyze the graph ends where node_decide would hand over to node_analyze;
+    the streaming entry point drives the report step itself.
+    """
+    graph = StateGraph(PropState)
+    graph.add_node("scrape", instrument_node("scrape", node_scrape))
+    graph.add_node("plan", instrument_node("plan", node_plan))
+    graph.add_node("search", instrument_node("search", node_search))
+    graph.add_node("prefetch", instrument_node("prefetch", node_prefetch))
+    graph.add_node("join", node_join)
+    graph.add_node("extract", instrument_node("extract", node_extract))
+    graph.add_node("decide", instrument_node("decide", node_decide))
+
+    graph.add_conditional_edges(START, _route_start, ["scrape", "prefetch"])
+    graph.add_conditional_edges("scrape", _route_after_scrape, ["join", "plan", "decide"])
+    graph.add_edge("prefetch", "join")
+    graph.add_edge("plan", "search")
+    graph.add_edge("search", "extract")
+    graph.add_edge("join", "extract")
+    graph.add_edge("extract", "decide")
+    if stop_before_analyze:
+        graph.add_conditional_edges("decide", lambda s: s["__next__"], {"plan": "plan", "analyze": END})
+        return graph.compile()
+
+    graph.add_node("analyze", instrument_node("analyze", node_analyze))
+    graph.add_node("format", instrument_node("format", node_format))
+    graph.add_conditional_edges("decide", lambda s: s["__next__"], {"plan": "plan", "analyze": "analyze"})
+    graph.add_edge("analyze", "format")
+    graph.add_edge("format", END)
+    return graph.compile()
+
+app = _build_graph()
+prep_app = _build_graph(stop_before_analyze=True)
 
 # -------------------- Entrypoint --------------------
-def run_property_workflow(street_name: str, house_number: str, user_queries: Optional[List[str]] = None) -> Dict[str, Any]:
+def _initial_state(street_name: str, house_number: str, user_queries: Optional[List[str]],
+                   use_cache: bool, force_refresh: bool) -> PropState:
     state: PropState = {
         "street_name": street_name,
         "house_number": house_number,
         "address": build_address(street_name, house_number),
         "iter": 0,
+        "use_cache": use_cache,
+        "force_refresh": force_refresh,
     }
     if user_queries:
         state["user_queries"] = [q.strip() for q in user_queries if str(q).strip()]
-    result = app.invoke(state)
+    return state
+
+def _result_view(result: Dict[str, Any]) -> Dict[str, Any]:
     return {
         "address": result.get("address"),
         "street_name": result.get("street_name"),
@@ -187,7 +405,94 @@ def run_property_workflow(street_name: str, house_number: str, user_queries: Opt
         "search_notes": result.get("search_notes"),
         "tavily_results": result.get("tavily_results"),
         "formatted_text": result.get("formatted_text"),
+        "raw_llm_text": result.get("raw_llm_text"),
         "sections": result.get("sections"),
         "sources": result.get("sources"),
         "warnings": result.get("warnings"),
+        "llm_model": result.get("llm_model"),
+        "token_usage": result.get("token_usage"),
+        "scrape_timing": result.get("scrape_timing"),
+        "decision": result.get("decision"),
+        "iterations": result.get("iterations"),
     }
+
+async def _invoke(state: PropState) -> Dict[str, Any]:
+    with WORKFLOW_LATENCY.labels("invoke").time():
+        result = await app.ainvoke(state)
+    view = _result_view(result)
+    record_decision(view)
+    return view
+
+async def arun_property_workflow(street_name: str, house_number: str, user_queries: Optional[List[str]] = None,
+                                 use_cache: bool = True, force_refresh: bool = False) -> Dict[str, Any]:
+    """Concurrent calls with the same address and options share one run."""
+    state = _initial_state(street_name, house_number, user_queries, use_cache, force_refresh)
+    key = make_key(state["address"].lower(), state.get("user_queries"), use_cache, force_refresh)
+    return await get_singleflight("workflow").do(key, lambda: _invoke(state))
+
+def run_property_workflow(street_name: str, house_number: str, user_queries: Optional[List[str]] = None,
+                          use_cache: bool = True, force_refresh: bool = False) -> Dict[str, Any]:
+    """Sync wrapper around arun_property_workflow."""
+    return run_sync(arun_property_workflow(street_name, house_number, user_queries,
+                                           use_cache=use_cache, force_refresh=force_refresh))
+
+def _node_summary(node: str, update: Dict[str, Any]) -> Dict[str, Any]:
+    if node == "scrape":
+        panels = (update.get("la_data") or {}).get("panels") or {}
+        return {"panels": [k for k, v in panels.items() if v], "timing": update.get("scrape_timing")}
+    if node == "plan":
+        return {"queries": update.get("queries", [])}
+    if node == "search":
+        return {"results": len(update.get("search_notes") or [])}
+    if node == "prefetch":
+        return {"queries": update.get("queries", []), "results": len(update.get("search_notes") or [])}
+    if node == "decide":
+        return {"next": update.get("__next__"), "decision": update.get("decision"), "iterations": update.get("iter")}
+    return {}
+
+async def astream_property_workflow(street_name: str, house_number: str, user_queries: Optional[List[str]] = None,
+                                    use_cache: bool = True, force_refresh: bool = False) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Event stream of one analysis: a `node` event as each graph node finishes, `token` events
+    carrying the report text as the LLM streams it, then one `result` event with the same
+    payload arun_property_workflow returns.
+    """
+    t_start = time.perf_counter()
+    state = _initial_state(street_name, house_number, user_queries, use_cache, force_refresh)
+    async for mode, chunk in prep_app.astream(state, stream_mode=["updates", "values"]):
+        if mode == "updates":
+            for node, update in chunk.items():
+                yield {"event": "node", "node": node, **_node_summary(node, update or {})}
+        else:
+            state = chunk
+
+    address = _ensure_address(state)
+    parts: List[str] = []
+    meta: Dict[str, Any] = {}
+    usage: List[Dict[str, Any]] = []
+    t_analyze = time.perf_counter()
+    try:
+        async for delta in analyze_with_llm_stream(
+            address=address,
+            la_data=state.get("la_data", {}),
+            search_notes=_combined_notes(state),
+            system_prompt=REPORT_SYSTEM_PROMPT,
+            use_cache=state.get("use_cache", True),
+            meta=meta,
+            usage=usage,
+        ):
+            parts.append(delta)
+            yield {"event": "token", "text": delta}
+        state["report"] = report_from_text("".join(parts).strip(), model=meta.get("model"))
+    except Exception as e:
+        logger.exception("llm stream failed")
+        NODE_ERRORS.labels("analyze").inc()
+        state.setdefault("errors", []).append(f"llm:{e}")
+        state["report"] = report_from_text("".join(parts).strip(), model=meta.get("model")) if parts else failed_report()
+    NODE_LATENCY.labels("analyze").observe(time.perf_counter() - t_analyze)
+    state["token_usage"] = (state.get("token_usage") or []) + usage
+    yield {"event": "node", "node": "analyze"}
+    result = _result_view({**state, **instrument_node("format", node_format)(state)})
+    WORKFLOW_LATENCY.labels("stream").observe(time.perf_counter() - t_start)
+    record_decision(result)
+    yield {"event": "result", **result}
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+Batch analysis of address portfolios.
+
+A BatchJob runs arun_property_workflow over its unique addresses with a bounded number of workers
+on the API event loop, so every address shares the process-wide browser pool and caches.
+Finished addresses are appended to `completed` in finishing order, which is what the stream endpoint follows.
+"""
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from loguru import logger
+
+from .agents_graph import arun_property_workflow, build_address
+
+MAX_JOBS_KEPT = 50
+
+
+class BatchJob:
+    def __init__(self, addresses: List[Dict[str, str]], user_queries: Optional[List[str]] = None,
+                 max_workers: int = 4, use_cache: bool = True, force_refresh: bool = False):
+        self.id = uuid.uuid4().hex
+        self.user_queries = user_queries
+        self.max_workers = max(1, max_workers)
+        self.use_cache = use_cache
+        self.force_refresh = force_refresh
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.submitted = len(addresses)
+
+        # identical addresses (after build_address normalization) are analyzed once
+        self.items: "OrderedDict[str, Dict[str, str]]" = OrderedDict()
+        for a in addresses:
+            key = build_address(a["street_name"], a["house_number"]).lower()
+            self.items.setdefault(key, {"street_name": a["street_name"], "house_number": a["house_number"]})
+
+        self.results: Dict[str, Dict[str, Any]] = {}
+        self.completed: List[Dict[str, Any]] = []
+        self.failed = 0
+        self._changed = asyncio.Condition()
+        self._task: Optional[asyncio.Task] = None
+
+    # ---------- execution ----------
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        self.status = "running"
+        self.started_at = time.time()
+        sem = asyncio.Semaphore(self.max_workers)
+
+        async def one(key: str, item: Dict[str, str]) -> None:
+            async with sem:
+                t0 = time.time()
+                try:
+                    res = await arun_property_workflow(
+                        item["street_name"], item["house_number"], self.user_queries,
+                        use_cache=self.use_cache, force_refresh=self.force_refresh,
+                    )
+                    entry = {"key": key, "status": "done", "result": res}
+                except Exception as e:
+                    logger.exception(f"[BATCH {self.id[:8]}] {key} failed")
+                    self.failed += 1
+                    entry = {"key": key, "status": "failed", "error": str(e)}
+                entry.update(item, elapsed_sec=round(time.time() - t0, 2))
+            self.results[key] = entry
+            async with self._changed:
+                self.completed.append(entry)
+                self._changed.notify_all()
+
+        await asyncio.gather(*(one(k, v) for k, v in self.items.items()))
+        self.finished_at = time.time()
+        self.status = "done"
+        async with self._changed:
+            self._changed.notify_all()
+        logger.info(f"[BATCH {self.id[:8]}] finished {len(self.items)} addresses, {self.failed} failed")
+
+    # ---------- views ----------
+    def status_view(self) -> Dict[str, Any]:
+        end = self.finished_at or time.time()
+        elapsed = (end - self.started_at) if self.started_at else 0.0
+        done = len(self.completed)
+        return {
+            "id": self.id,
+            "status": self.status,
+            "submitted": self.submitted,
+            "unique": len(self.items),
+            "completed": done,
+            "failed": self.failed,
+            "max_workers": self.max_workers,
+            "elapsed_sec": round(elapsed, 2),
+            "addresses_per_min": round(done / elapsed * 60, 2) if elapsed > 0 else 0.0,
+        }
+
+    def results_view(self) -> List[Dict[str, Any]]:
+        return [self.results[k] for k in self.items if k in self.results]
+
+    async def stream(self) -> AsyncIterator[Dict[str, Any]]:
+        """Yields finished entries in finishing order until the job is done."""
+        i = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: len(self.completed) > i or self.status == "done")
+                batch = self.completed[i:]
+            for entry in batch:
+                yield entry
+            i += len(batch)
+            if self.status == "done" and i >= len(self.completed):
+                return
+
+
+_jobs: "OrderedDict[str, BatchJob]" = OrderedDict()
+
+
+def submit_batch(addresses: List[Dict[str, str]], **kwargs: Any) -> BatchJob:
+    """Creates and starts a batch job on the running event loop."""
+    job = BatchJob(addresses, **kwargs)
+    _jobs[job.id] = job
+    # forget the oldest finished jobs beyond the retention limit
+    for jid in list(_jobs):
+        if len(_jobs) <= MAX_JOBS_KEPT:
+            break
+        if _jobs[jid].status == "done":
+            del _jobs[jid]
+    job.start()
+    return job
+
+
+def get_batch(job_id: str) -> Optional[BatchJob]:
+    return _jobs.get(job_id)
@@ -0,0 +1,455 @@
+# -*- coding: utf-8 -*-
+"""
+Background analyses with a persistent result store.
+
+POST /jobs writes a `queued` row and returns its id straight away; a pool of asyncio workers claims
+queued rows, runs the workflow through astream_property_workflow and writes per-node progress as
+each graph node finishes, then the result (or error). The store is SQLite by default and Postgres
+when `jobs.database_url` / JOBS_DATABASE_URL is a postgresql:// URL (needs psycopg), so workers can
+run in the API processes (`jobs.workers`) or separately with `python -m agents.jobs`, all sharing
+one table.
+
+A row stays `running` while its worker updates it; one that has not been touched for
+`stale_after_sec` (a worker died mid-job) is requeued, up to MAX_JOB_ATTEMPTS claims.
+"""
+import argparse
+import asyncio
+from abc import ABC, abstractmethod
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+from app.metrics import JOB_QUEUE_WAIT, JOB_RESULTS
+from app.settings import JobsSettings, get_settings
+
+from .agents_graph import astream_property_workflow
+
+MAX_JOB_ATTEMPTS = 2
+MAINTENANCE_INTERVAL_SEC = 60.0
+
+_COLUMNS = ("id", "status", "params", "progress", "result", "error", "worker", "attempts",
+            "created_at", "started_at", "updated_at", "finished_at")
+_JSON_COLUMNS = ("params", "progress", "result")
+
+
+class JobStore(ABC):
+    """
+    The `jobs` table. Statements are written with `?` placeholders; subclasses provide the
+    connection, the DDL and an atomic claim of the oldest queued row.
+    """
+
+    backend = ""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+
+    # ---------- backend hooks ----------
+    @abstractmethod
+    def _execute(self, sql: str, params: tuple = ()) -> List[tuple]:
+        ...
+
+    @abstractmethod
+    def claim(self, worker: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def close(self) -> None:
+        ...
+
+    # ---------- API ----------
+    def create(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        self._execute(
+            "INSERT INTO jobs (id, status, params, progress, attempts, created_at, updated_at) "
+            "VALUES (?, 'queued', ?, '[]', 0, ?, ?)",
+            (job_id, json.dumps(params, ensure_ascii=False), now, now),
+        )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        rows = self._execute(f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE id = ?", (job_id,))
+        return _decode(rows[0]) if rows else None
+
+    def set_progress(self, job_id: str, worker: str, progress: List[Dict[str, Any]]) -> None:
+        self._execute(
+            "UPDATE jobs SET progress = ?, updated_at = ? WHERE id = ? AND worker = ?",
+            (json.dumps(progress, ensure_ascii=False, default=str), time.time(), job_id, worker),
+        )
+
+    def finish(self, job_id: str, worker: str, result: Dict[str, Any]) -> None:
+        now = time.time()
+        self._execute(
+            "UPDATE jobs SET status = 'done', result = ?, updated_at = ?, finished_at = ? WHERE id = ? AND worker = ?",
+            (json.dumps(result, ensure_ascii=False, default=str), now, now, job_id, worker),
+        )
+
+    def fail(self, job_id: str, worker: str, error: str) -> None:
+        now = time.time()
+        self._execute(
+            "UPDATE jobs SET status = 'failed', error = ?, updated_at = ?, finished_at = ? WHERE id = ? AND worker = ?",
+            (error, now, now, job_id, worker),
+        )
+
+    def requeue(self, job_id: str, worker: str) -> None:
+        """Hands a claimed job back, e.g. when its worker shuts down mid-run."""
+        self._execute(
+            "UPDATE jobs SET status = 'queued', worker = NULL, progress = '[]', updated_at = ? "
+            "WHERE id = ? AND worker = ? AND status = 'running'",
+            (time.time(), job_id, worker),
+        )
+
+    def recover_stale(self, stale_after_sec: float) -> None:
+        now = time.time()
+        cutoff = now - stale_after_sec
+        self._execute(
+            "UPDATE jobs SET status = 'failed', error = ?, updated_at = ?, finished_at = ? "
+            "WHERE status = 'running' AND updated_at < ? AND attempts >= ?",
+            ("worker lost", now, now, cutoff, MAX_JOB_ATTEMPTS),
+        )
+        self._execute(
+            "UPDATE jobs SET status = 'queued', worker = NULL, progress = '[]', updated_at = ? "
+            "WHERE status = 'running' AND updated_at < ?",
+            (now, cutoff),
+        )
+
+    def purge(self, retention_sec: float) -> None:
+        self._execute(
+            "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?",
+            (time.time() - retention_sec,),
+        )
+
+    def counts(self) -> Dict[str, int]:
+        return {status: int(n) for status, n in self._execute("SELECT status, COUNT(*) FROM jobs GROUP BY status")}
+
+
+class SQLiteJobStore(JobStore):
+    backend = "sqlite"
+
+    def __init__(self, path: str) -> None:
+        super().__init__()
+        self.path = path
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        # autocommit; claims open their own IMMEDIATE transaction so several processes can share the file
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, status TEXT NOT NULL, params TEXT NOT NULL, progress TEXT NOT NULL, "
+            "result TEXT, error TEXT, worker TEXT, attempts INTEGER NOT NULL DEFAULT 0, "
+            "created_at REAL NOT NULL, started_at REAL, updated_at REAL NOT NULL, finished_at REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs(status, created_at)")
+
+    def _execute(self, sql: str, params: tuple = ()) -> List[tuple]:
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def claim(self, worker: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+                ).fetchone()
+                if row is not None:
+                    self._db.execute(
+                        "UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1, "
+                        "started_at = ?, updated_at = ? WHERE id = ?",
+                        (worker, now, now, row[0]),
+                    )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return self.get(row[0]) if row is not None else None
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class PostgresJobStore(JobStore):
+    backend = "postgres"
+
+    def __init__(self, url: str) -> None:
+        super().__init__()
+        try:
+            import psycopg
+        except ImportError as e:
+            raise RuntimeError("jobs.database_url points at Postgres but psycopg is not installed") from e
+        self._db = psycopg.connect(url, autocommit=True)
+        self._execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, status TEXT NOT NULL, params TEXT NOT NULL, progress TEXT NOT NULL, "
+            "result TEXT, error TEXT, worker TEXT, attempts INTEGER NOT NULL DEFAULT 0, "
+            "created_at DOUBLE PRECISION NOT NULL, started_at DOUBLE PRECISION, "
+            "updated_at DOUBLE PRECISION NOT NULL, finished_at DOUBLE PRECISION)"
+        )
+        self._execute("CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs(status, created_at)")
+
+    def _execute(self, sql: str, params: tuple = ()) -> List[tuple]:
+        with self._lock:
+            cur = self._db.execute(sql.replace("?", "%s"), params)
+            return cur.fetchall() if cur.description else []
+
+    def claim(self, worker: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        rows = self._execute(
+            "UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1, started_at = ?, updated_at = ? "
+            "WHERE id = (SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at "
+            "FOR UPDATE SKIP LOCKED LIMIT 1) "
+            f"RETURNING {', '.join(_COLUMNS)}",
+            (worker, now, now),
+        )
+        return _decode(rows[0]) if rows else None
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+def _decode(row: tuple) -> Dict[str, Any]:
+    job = dict(zip(_COLUMNS, row))
+    for col in _JSON_COLUMNS:
+        if job[col] is not None:
+            job[col] = json.loads(job[col])
+    return job
+
+
+def job_view(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Public shape of a job row for GET /jobs/{id}; `result` only once it is done."""
+    end = job["finished_at"] or time.time()
+    progress = job["progress"] or []
+    view = {
+        "id": job["id"],
+        "status": job["status"],
+        "params": job["params"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+        "elapsed_sec": round(end - job["started_at"], 2) if job["started_at"] else 0.0,
+        "attempts": job["attempts"],
+        "current_node": progress[-1]["node"] if progress and job["status"] == "running" else None,
+        "progress": progress,
+    }
+    if job["status"] == "done":
+        view["result"] = job["result"]
+    if job["status"] == "failed":
+        view["error"] = job["error"]
+    return view
+
+
+class JobWorkerPool:
+    """`workers` asyncio tasks on the running loop that claim and run queued jobs."""
+
+    def __init__(self, store: JobStore, workers: int, cfg: JobsSettings) -> None:
+        self.store = store
+        self.workers = workers
+        self.cfg = cfg
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self.completed = 0
+        self.failed = 0
+        self._running: Dict[str, str] = {}  # job id -> worker name
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._loop(f"{self.name}/{i}")) for i in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._maintenance()))
+        logger.info(f"[JOBS] {self.workers} workers started on {self.store.backend}")
+
+    def notify(self) -> None:
+        """Wakes idle workers right away; other processes pick the job up on their next poll."""
+        self._wakeup.set()
+
+    async def stop(self) -> None:
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for job_id, worker in list(self._running.items()):
+            await asyncio.to_thread(self.store.requeue, job_id, worker)
+        if self._running:
+            logger.info(f"[JOBS] requeued {len(self._running)} unfinished jobs")
+        self._running.clear()
+
+    async def _loop(self, worker: str) -> None:
+        while True:
+            try:
+                job = await asyncio.to_thread(self.store.claim, worker)
+            except Exception as e:
+                logger.error(f"[JOBS] {worker}: claim failed: {e}")
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.cfg.poll_interval_sec)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+            await self._run(job, worker)
+
+    async def _run(self, job: Dict[str, Any], worker: str) -> None:
+        job_id = job["id"]
+        p = job["params"]
+        self._running[job_id] = worker
+        JOB_QUEUE_WAIT.observe(max(0.0, job["started_at"] - job["created_at"]))
+        t0 = time.perf_counter()
+        progress: List[Dict[str, Any]] = []
+
+        async def run() -> Dict[str, Any]:
+            result: Dict[str, Any] = {}
+            async for ev in astream_property_workflow(
+                p["street_name"], p["house_number"], p.get("user_questions"),
+                use_cache=p.get("use_cache", True), force_refresh=p.get("force_refresh", False),
+            ):
+                kind = ev.pop("event")
+                if kind == "node":
+                    progress.append({**ev, "at_sec": round(time.perf_counter() - t0, 2)})
+                    await asyncio.to_thread(self.store.set_progress, job_id, worker, progress)
+                elif kind == "result":
+                    result = ev
+            return result
+
+        error: Optional[str] = None
+        try:
+            result = await asyncio.wait_for(run(), self.cfg.job_timeout_sec)
+        except asyncio.CancelledError:
+            raise  # stop() requeues it
+        except Exception as e:
+            error = f"timed out after {self.cfg.job_timeout_sec:.0f}s" if isinstance(e, asyncio.TimeoutError) else str(e)
+            logger.exception(f"[JOBS] {job_id[:8]} failed")
+        try:
+            if error is None:
+                await asyncio.to_thread(self.store.finish, job_id, worker, result)
+                self.completed += 1
+                JOB_RESULTS.labels("done").inc()
+                logger.info(f"[JOBS] {job_id[:8]} done in {time.perf_counter() - t0:.1f}s")
+            else:
+                await asyncio.to_thread(self.store.fail, job_id, worker, error)
+                self.failed += 1
+                JOB_RESULTS.labels("failed").inc()
+        except Exception as e:
+            # the row stays `running` until recover_stale requeues it
+            logger.error(f"[JOBS] {job_id[:8]}: could not record the outcome: {e}")
+        finally:
+            self._running.pop(job_id, None)
+
+    async def _maintenance(self) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(self.store.recover_stale, self.cfg.stale_after_sec)
+                await asyncio.to_thread(self.store.purge, self.cfg.retention_sec)
+            except Exception as e:
+                logger.error(f"[JOBS] maintenance failed: {e}")
+            await asyncio.sleep(MAINTENANCE_INTERVAL_SEC)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"workers": self.workers, "running": len(self._running), "completed": self.completed, "failed": self.failed}
+
+
+_store: Optional[JobStore] = None
+_store_lock = threading.Lock()
+_pool: Optional[JobWorkerPool] = None
+
+
+def get_job_store() -> JobStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            cfg = get_settings().jobs
+            url = os.getenv("JOBS_DATABASE_URL", cfg.database_url or "")
+            _store = PostgresJobStore(url) if url.startswith("postgres") else SQLiteJobStore(cfg.path)
+        return _store
+
+
+def submit_job(street_name: str, house_number: str, user_questions: Optional[List[str]] = None,
+               use_cache: bool = True, force_refresh: bool = False) -> Dict[str, Any]:
+    job = get_job_store().create({
+        "street_name": street_name,
+        "house_number": house_number,
+        "user_questions": user_questions,
+        "use_cache": use_cache,
+        "force_refresh": force_refresh,
+    })
+    if _pool is not None:
+        _pool.notify()
+    return job_view(job)
+
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    job = get_job_store().get(job_id)
+    return job_view(job) if job is not None else None
+
+
+def start_job_workers(workers: Optional[int] = None) -> Optional[JobWorkerPool]:
+    """Starts the worker pool on the running event loop (JOB_WORKERS overrides `jobs.workers`)."""
+    global _pool
+    if _pool is not None:
+        return _pool
+    cfg = get_settings().jobs
+    if workers is None:
+        workers = int(os.getenv("JOB_WORKERS", cfg.workers))
+    if workers <= 0:
+        return None
+    _pool = JobWorkerPool(get_job_store(), workers, cfg)
+    _pool.start()
+    return _pool
+
+
+async def stop_job_workers() -> None:
+    global _pool
+    pool, _pool = _pool, None
+    if pool is not None:
+        await pool.stop()
+
+
+def job_stats() -> Dict[str, Any]:
+    store = get_job_store()
+    return {
+        "backend": store.backend,
+        "counts": store.counts(),
+        "local_workers": _pool.stats() if _pool is not None else None,
+    }
+
+
+async def _serve(workers: int) -> None:
+    from app.http_clients import close_async_clients
+
+    start_job_workers(workers)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await stop_job_workers()
+        await close_async_clients()
+
+
+def main() -> None:
+    """Standalone worker process: `python -m agents.jobs --workers 4`."""
+    from app.browser_pool import close_browser_pool
+
+    ap = argparse.ArgumentParser(description="Run background analysis workers against the job store.")
+    ap.add_argument("--workers", type=int, default=None, help="defaults to JOB_WORKERS / jobs.workers")
+    args = ap.parse_args()
+    workers = args.workers if args.workers is not None else int(os.getenv("JOB_WORKERS", get_settings().jobs.workers))
+    try:
+        asyncio.run(_serve(max(1, workers)))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        close_browser_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,25 @@
 # -*- coding: utf-8 -*-
+import asyncio
+import json
+import os
 from typing import List, Optional
 from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from agents import run_property_workflow
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, Field
+from agents import (
+    arun_property_workflow, astream_property_workflow, submit_batch, get_batch,
+    submit_job, get_job, start_job_workers, stop_job_workers, job_stats,
+)
+from app.browser_pool import close_browser_pool, browser_pool_stats
+from app.cache import cache_stats
+from app.http_clients import close_async_clients, http_client_stats
+from app.llm_scheduler import llm_scheduler_stats
+from app.prompt_budget import prompt_stats
+from app.completeness import decision_stats
+from app.singleflight import singleflight_stats
+from app.scrape_timing import timeout_stats
+from app.metrics import render_metrics
+from app.settings import get_settings, start_settings_watcher
 from loguru import logger
 from dotenv import load_dotenv
 
@@ -14,15 +31,140 @@ class AnalyzeReq(BaseModel):
     street_name: str
     house_number: str
     user_questions: Optional[List[str]] = None
+    use_cache: bool = True
+    force_refresh: bool = False
 
 @app.post("/analyze")
-def analyze(req: AnalyzeReq):
+async def analyze(req: AnalyzeReq):
     try:
-        return run_property_workflow(req.street_name, req.house_number, req.user_questions)
+        return await arun_property_workflow(
+            req.street_name, req.house_number, req.user_questions,
+            use_cache=req.use_cache, force_refresh=req.force_refresh,
+        )
     except Exception as e:
         logger.exception("analysis failed")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/analyze/stream")
+async def analyze_stream(req: AnalyzeReq):
+    """
+    Server-Sent Events: `node` per finished graph step, `token` per report delta,
+    then `result` with the full /analyze payload (or `error`).
+    """
+    async def events():
+        try:
+            async for ev in astream_property_workflow(
+                req.street_name, req.house_number, req.user_questions,
+                use_cache=req.use_cache, force_refresh=req.force_refresh,
+            ):
+                name = ev.pop("event")
+                yield f"event: {name}\ndata: {json.dumps(ev, ensure_ascii=False, default=str)}\n\n"
+        except Exception as e:
+            logger.exception("analysis stream failed")
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+class AddressItem(BaseModel):
+    street_name: str
+    house_number: str
+
+class BatchAnalyzeReq(BaseModel):
+    addresses: List[AddressItem] = Field(..., min_length=1, max_length=500)
+    user_questions: Optional[List[str]] = None
+    max_workers: int = Field(4, ge=1, le=16)
+    use_cache: bool = True
+    force_refresh: bool = False
+
+def _batch_or_404(job_id: str):
+    job = get_batch(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="batch job not found")
+    return job
+
+@app.post("/analyze/batch", status_code=202)
+async def analyze_batch(req: BatchAnalyzeReq):
+    job = submit_batch(
+        [a.model_dump() for a in req.addresses],
+        user_queries=req.user_questions,
+        max_workers=req.max_workers,
+        use_cache=req.use_cache,
+        force_refresh=req.force_refresh,
+    )
+    return job.status_view()
+
+@app.get("/analyze/batch/{job_id}")
+async def analyze_batch_status(job_id: str):
+    return _batch_or_404(job_id).status_view()
+
+@app.get("/analyze/batch/{job_id}/results")
+async def analyze_batch_results(job_id: str):
+    job = _batch_or_404(job_id)
+    return {**job.status_view(), "results": job.results_view()}
+
+@app.get("/analyze/batch/{job_id}/stream")
+async def analyze_batch_stream(job_id: str):
+    """Newline-delimited JSON, one line per address as it finishes."""
+    job = _batch_or_404(job_id)
+
+    async def lines():
+        async for entry in job.stream():
+            yield json.dumps(entry, ensure_ascii=False, default=str) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.post("/jobs", status_code=202)
+async def create_job(req: AnalyzeReq):
+    """Queues one analysis and returns its id right away; poll GET /jobs/{id} for progress and the report."""
+    return await asyncio.to_thread(
+        submit_job, req.street_name, req.house_number, req.user_questions,
+        use_cache=req.use_cache, force_refresh=req.force_refresh,
+    )
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    job = await asyncio.to_thread(get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    return job
+
 @app.get("/health")
 def health():
     return {"ok": True}
+
+@app.get("/metrics")
+def metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/stats")
+def stats():
+    return {
+        "browser_pool": browser_pool_stats(),
+        "caches": cache_stats(),
+        "http_clients": http_client_stats(),
+        "llm": llm_scheduler_stats(),
+        "prompts": prompt_stats(),
+        "jobs": job_stats(),
+        "coalescing": singleflight_stats(),
+        "scrape_timeouts": timeout_stats(),
+        "decisions": decision_stats(),
+    }
+
+@app.on_event("startup")
+async def startup():
+    get_settings()  # fail fast on an invalid config
+    if os.getenv("CONFIG_WATCH", "0") == "1":
+        start_settings_watcher()
+    start_job_workers()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await stop_job_workers()
+    await close_async_clients()
+    close_browser_pool()
+
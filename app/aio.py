@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable
+
+from app.http_clients import close_async_clients
+
+
+async def _run_and_close(coro: Awaitable[Any]) -> Any:
+    try:
+        return await coro
+    finally:
+        # pooled clients are bound to this short-lived loop
+        await close_async_clients()
+
+
+def run_sync(coro: Awaitable[Any]) -> Any:
+    """
+    Runs a coroutine to completion from sync code.
+    If the caller already sits inside an event loop, the coroutine gets its own loop on a helper thread.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(_run_and_close(coro))
+    with ThreadPoolExecutor(max_workers=1) as ex:
+        return ex.submit(asyncio.run, _run_and_close(coro)).result()
@@ -0,0 +1,365 @@
+# -*- coding: utf-8 -*-
+"""
+Long-lived pool of warm Chromium contexts for the ZIMAS scraper.
+
+Playwright's sync API binds every object to the thread that created it, so each
+pool slot is a dedicated worker thread that owns one browser and one context.
+Callers hand a `fn(page)` to the pool; a free worker runs it on a fresh page of
+its warm context and returns the result through a Future.
+
+In the lightweight page mode (default, ZIMAS_LIGHT_MODE=0 turns it off) contexts get a small
+viewport and reuse a stored cookie/storage state, and every page aborts images, media, fonts,
+map tiles and analytics before they hit the network: the scraper only reads the left information
+bar. Bytes transferred per page are measured either way.
+"""
+import json
+import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+from loguru import logger
+from playwright.sync_api import sync_playwright, BrowserContext, Page, Request, Route
+
+from app.metrics import (
+    BROWSER_BLOCKED_REQUESTS, BROWSER_PAGE_BYTES, BROWSER_POOL_BUSY, BROWSER_POOL_QUEUED, BROWSER_POOL_WAIT,
+)
+
+POOL_SIZE = int(os.getenv("ZIMAS_POOL_SIZE", "2"))
+POOL_MAX_USES = int(os.getenv("ZIMAS_POOL_MAX_USES", "25"))          # recycle a context after N scrapes
+POOL_MAX_QUEUE = int(os.getenv("ZIMAS_POOL_MAX_QUEUE", "16"))        # waiting jobs before rejecting
+POOL_ACQUIRE_TIMEOUT = float(os.getenv("ZIMAS_POOL_ACQUIRE_TIMEOUT", "90"))
+POOL_HEADLESS = os.getenv("ZIMAS_POOL_HEADLESS", "1") != "0"
+
+# --- lightweight page mode ---
+LIGHT_MODE = os.getenv("ZIMAS_LIGHT_MODE", "1") != "0"
+BLOCK_RESOURCE_TYPES = frozenset(
+    t.strip() for t in os.getenv("ZIMAS_BLOCK_RESOURCE_TYPES", "image,media,font").split(",") if t.strip()
+)
+# ArcGIS map tiles / exports (also fetched as xhr) and analytics
+BLOCK_URL_PATTERN = re.compile(os.getenv(
+    "ZIMAS_BLOCK_URL_PATTERN",
+    r"/(MapServer|ImageServer|VectorTileServer)/(tile|export|exportImage)|/tile/\d+/|"
+    r"google-analytics\.com|googletagmanager\.com|doubleclick\.net|clarity\.ms",
+), re.IGNORECASE)
+VIEWPORT = os.getenv("ZIMAS_VIEWPORT", "1024x600")
+STORAGE_STATE_PATH = os.getenv("ZIMAS_STORAGE_STATE", ".cache/zimas_storage_state.json")  # empty -> off
+STORAGE_STATE_MAX_AGE = float(os.getenv("ZIMAS_STORAGE_STATE_MAX_AGE", "43200"))
+
+
+class BrowserPoolExhausted(RuntimeError):
+    """Raised when no browser slot becomes free within the acquire timeout."""
+
+
+def _stored_state() -> Optional[Dict[str, Any]]:
+    if not STORAGE_STATE_PATH:
+        return None
+    try:
+        if time.time() - os.path.getmtime(STORAGE_STATE_PATH) > STORAGE_STATE_MAX_AGE:
+            return None
+        with open(STORAGE_STATE_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def context_options() -> Dict[str, Any]:
+    """Keyword arguments for browser.new_context() in the current page mode."""
+    if not LIGHT_MODE:
+        return {}
+    width, _, height = VIEWPORT.partition("x")
+    opts: Dict[str, Any] = {
+        "viewport": {"width": int(width), "height": int(height or 600)},
+        "service_workers": "block",  # so every request goes through page.route
+    }
+    state = _stored_state()
+    if state is not None:
+        opts["storage_state"] = state
+    return opts
+
+
+def save_storage_state(context: BrowserContext) -> None:
+    """Stores cookies / local storage of a context that just completed a scrape, for the next contexts."""
+    if not (LIGHT_MODE and STORAGE_STATE_PATH):
+        return
+    try:
+        d = os.path.dirname(STORAGE_STATE_PATH)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        tmp = f"{STORAGE_STATE_PATH}.{os.getpid()}.{threading.get_ident()}.tmp"
+        context.storage_state(path=tmp)
+        os.replace(tmp, STORAGE_STATE_PATH)
+    except Exception as e:
+        logger.warning(f"[POOL] could not save storage state: {e}")
+
+
+class PageTraffic:
+    """Blocks heavy resources on one page (light mode) and totals the bytes it transferred."""
+
+    def __init__(self, page: Page) -> None:
+        self.finished: List[Request] = []
+        self.blocked = 0
+        if LIGHT_MODE:
+            page.route("**/*", self._route)
+        page.on("requestfinished", self.finished.append)
+
+    def _route(self, route: Route) -> None:
+        req = route.request
+        if req.resource_type in BLOCK_RESOURCE_TYPES or BLOCK_URL_PATTERN.search(req.url):
+            self.blocked += 1
+            BROWSER_BLOCKED_REQUESTS.labels(req.resource_type).inc()
+            route.abort("blockedbyclient")
+        else:
+            route.continue_()
+
+    def total_bytes(self) -> int:
+        """Headers plus encoded bodies of every finished request (call before the page closes)."""
+        total = 0
+        for req in self.finished:
+            try:
+                sizes = req.sizes()
+            except Exception:
+                continue
+            total += (sizes["requestHeadersSize"] + sizes["requestBodySize"]
+                      + sizes["responseHeadersSize"] + sizes["responseBodySize"])
+        return total
+
+    def report(self, label: str) -> int:
+        total = self.total_bytes()
+        BROWSER_PAGE_BYTES.observe(total)
+        logger.info(f"[POOL] {label}: {total / 1024:.0f} KB in {len(self.finished)} requests, {self.blocked} blocked")
+        return total
+
+
+class _Job:
+    __slots__ = ("fn", "future", "enqueued_at", "deadline")
+
+    def __init__(self, fn: Callable[[Page], Any], timeout: float):
+        self.fn = fn
+        self.future: Future = Future()
+        self.enqueued_at = time.monotonic()
+        self.deadline = self.enqueued_at + timeout
+
+
+class BrowserPool:
+    def __init__(
+        self,
+        size: int = POOL_SIZE,
+        max_uses: int = POOL_MAX_USES,
+        max_queue: int = POOL_MAX_QUEUE,
+        acquire_timeout: float = POOL_ACQUIRE_TIMEOUT,
+        headless: bool = POOL_HEADLESS,
+    ):
+        self.size = max(1, size)
+        self.max_uses = max(1, max_uses)
+        self.acquire_timeout = acquire_timeout
+        self.headless = headless
+        self._jobs: "queue.Queue[Optional[_Job]]" = queue.Queue(maxsize=max(1, max_queue))
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._closed = False
+        self._busy = 0
+        self._stats: Dict[str, float] = {
+            "launches": 0,
+            "context_recycles": 0,
+            "jobs_completed": 0,
+            "jobs_failed": 0,
+            "jobs_rejected": 0,
+            "wait_total_sec": 0.0,
+            "wait_max_sec": 0.0,
+            "wait_last_sec": 0.0,
+            "bytes_total": 0,
+            "bytes_last": 0,
+            "requests_blocked": 0,
+        }
+
+    # ---------- lifecycle ----------
+    def start(self) -> None:
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("BrowserPool is closed")
+            if self._threads:
+                return
+            for i in range(self.size):
+                t = threading.Thread(target=self._worker, args=(i,), name=f"zimas-browser-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+        logger.info(f"[POOL] started {self.size} browser slot(s), max_uses={self.max_uses}")
+
+    def close(self, timeout: float = 10.0) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            threads = list(self._threads)
+        for _ in threads:
+            try:
+                self._jobs.put(None, timeout=timeout)
+            except queue.Full:
+                break
+        for t in threads:
+            t.join(timeout=timeout)
+        logger.info("[POOL] closed")
+
+    # ---------- public API ----------
+    def submit(self, fn: Callable[[Page], Any], timeout: Optional[float] = None, block: bool = True) -> Future:
+        """
+        Queues `fn(page)` for the next free browser slot and returns its Future.
+        Raises BrowserPoolExhausted when the wait queue is full (back-pressure).
+        """
+        if self._closed:
+            raise RuntimeError("BrowserPool is closed")
+        self.start()
+        timeout = self.acquire_timeout if timeout is None else timeout
+        job = _Job(fn, timeout)
+        try:
+            if block:
+                self._jobs.put(job, timeout=timeout)
+            else:
+                self._jobs.put_nowait(job)
+        except queue.Full:
+            self._bump("jobs_rejected")
+            raise BrowserPoolExhausted(f"browser pool queue full ({self._jobs.maxsize} waiting)")
+        BROWSER_POOL_QUEUED.set(self._jobs.qsize())
+        return job.future
+
+    def run(self, fn: Callable[[Page], Any], timeout: Optional[float] = None) -> Any:
+        """Blocking helper: borrow a page, run `fn(page)` on it, return the result."""
+        return self.submit(fn, timeout=timeout).result()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            s = dict(self._stats)
+            busy = self._busy
+        done = s["jobs_completed"] + s["jobs_failed"]
+        s["wait_avg_sec"] = round(s["wait_total_sec"] / done, 4) if done else 0.0
+        s["bytes_avg"] = int(s["bytes_total"] / done) if done else 0
+        s["light_mode"] = LIGHT_MODE
+        s["size"] = self.size
+        s["busy"] = busy
+        s["queued"] = self._jobs.qsize()
+        return s
+
+    # ---------- internals ----------
+    def _bump(self, key: str, value: float = 1) -> None:
+        with self._lock:
+            self._stats[key] += value
+
+    def _record_wait(self, waited: float) -> None:
+        with self._lock:
+            self._stats["wait_total_sec"] += waited
+            self._stats["wait_last_sec"] = waited
+            self._stats["wait_max_sec"] = max(self._stats["wait_max_sec"], waited)
+        BROWSER_POOL_WAIT.observe(waited)
+
+    def _record_traffic(self, traffic: PageTraffic, label: str) -> None:
+        try:
+            total = traffic.report(label)
+        except Exception:
+            return
+        with self._lock:
+            self._stats["bytes_total"] += total
+            self._stats["bytes_last"] = total
+            self._stats["requests_blocked"] += traffic.blocked
+
+    def _worker(self, idx: int) -> None:
+        browser = None
+        context = None
+        uses = 0
+        with sync_playwright() as p:
+            while True:
+                job = self._jobs.get()
+                if job is None:
+                    break
+                waited = time.monotonic() - job.enqueued_at
+                BROWSER_POOL_QUEUED.set(self._jobs.qsize())
+                if time.monotonic() > job.deadline:
+                    self._bump("jobs_rejected")
+                    job.future.set_exception(
+                        BrowserPoolExhausted(f"no browser slot free within {self.acquire_timeout:.0f}s")
+                    )
+                    continue
+                if not job.future.set_running_or_notify_cancel():
+                    continue
+                self._record_wait(waited)
+                with self._lock:
+                    self._busy += 1
+                BROWSER_POOL_BUSY.inc()
+                try:
+                    # health check: relaunch a dead browser, recycle a worn-out context
+                    if browser is None or not browser.is_connected():
+                        browser = p.chromium.launch(headless=self.headless)
+                        context = None
+                        self._bump("launches")
+                        logger.info(f"[POOL] slot {idx}: launched chromium")
+                    if context is not None and uses >= self.max_uses:
+                        self._close_quietly(context)
+                        context = None
+                        self._bump("context_recycles")
+                    if context is None:
+                        context = browser.new_context(**context_options())
+                        uses = 0
+
+                    page = context.new_page()
+                    traffic = PageTraffic(page)
+                    uses += 1
+                    try:
+                        result = job.fn(page)
+                    finally:
+                        self._record_traffic(traffic, f"slot {idx}")
+                        self._close_quietly(page)
+                    if uses == 1:
+                        save_storage_state(context)
+                    job.future.set_result(result)
+                    self._bump("jobs_completed")
+                except BaseException as e:
+                    self._bump("jobs_failed")
+                    job.future.set_exception(e)
+                    # don't trust a context that just failed a scrape
+                    if context is not None:
+                        self._close_quietly(context)
+                        context = None
+                        self._bump("context_recycles")
+                finally:
+                    with self._lock:
+                        self._busy -= 1
+                    BROWSER_POOL_BUSY.dec()
+
+            if context is not None:
+                self._close_quietly(context)
+            if browser is not None:
+                self._close_quietly(browser)
+
+    @staticmethod
+    def _close_quietly(obj: Any) -> None:
+        try:
+            obj.close()
+        except Exception:
+            pass
+
+
+_pool: Optional[BrowserPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_browser_pool() -> BrowserPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool()
+        return _pool
+
+
+def close_browser_pool() -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close()
+
+
+def browser_pool_stats() -> Dict[str, Any]:
+    return _pool.stats() if _pool is not None else {"size": 0, "launches": 0}
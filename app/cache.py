@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+Small TTL + LRU cache for JSON-serialisable values.
+
+With `path` set, entries live in a SQLite table (one table per cache name) and survive restarts;
+without it they are kept in an in-process OrderedDict. Both backends are thread-safe and count hits/misses.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from loguru import logger
+
+from app.metrics import CACHE_REQUESTS
+from app.settings import get_settings
+
+
+def make_key(*parts: Any) -> str:
+    """Content address for a cache entry: sha256 of the canonical JSON of `parts`."""
+    raw = json.dumps(parts, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class TTLCache:
+    def __init__(self, name: str, ttl_sec: float, max_entries: int = 1000, path: Optional[str] = None):
+        self.name = name
+        self.ttl_sec = float(ttl_sec)
+        self.max_entries = max(1, int(max_entries))
+        self.path = path or None
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._mem: "OrderedDict[str, Tuple[float, float, str]]" = OrderedDict()  # key -> (created, expires, json)
+        self._db: Optional[sqlite3.Connection] = None
+        if self.path:
+            d = os.path.dirname(self.path)
+            if d:
+                os.makedirs(d, exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                f"CREATE TABLE IF NOT EXISTS {self._table} ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, "
+                "expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._db.execute(f"CREATE INDEX IF NOT EXISTS {self._table}_lru ON {self._table}(last_access)")
+
+    @property
+    def _table(self) -> str:
+        return "cache_" + "".join(c if c.isalnum() else "_" for c in self.name)
+
+    # ---------- public API ----------
+    def get(self, key: str) -> Optional[Any]:
+        hit = self.get_with_age(key)
+        return hit[0] if hit is not None else None
+
+    def get_with_age(self, key: str) -> Optional[Tuple[Any, float]]:
+        """Returns (value, age_seconds) for a live entry, else None."""
+        now = time.time()
+        with self._lock:
+            row = self._read(key, now)
+            if row is None:
+                self._misses += 1
+                CACHE_REQUESTS.labels(self.name, "miss").inc()
+                return None
+            self._hits += 1
+        CACHE_REQUESTS.labels(self.name, "hit").inc()
+        created, raw = row
+        return json.loads(raw), now - created
+
+    def set(self, key: str, value: Any, ttl_sec: Optional[float] = None) -> None:
+        now = time.time()
+        expires = now + (self.ttl_sec if ttl_sec is None else float(ttl_sec))
+        raw = json.dumps(value, ensure_ascii=False, default=str)
+        with self._lock:
+            if self._db is not None:
+                self._db.execute(
+                    f"INSERT OR REPLACE INTO {self._table} (key, value, created_at, expires_at, last_access) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, raw, now, expires, now),
+                )
+                self._evict_db(now)
+            else:
+                self._mem[key] = (now, expires, raw)
+                self._mem.move_to_end(key)
+                while len(self._mem) > self.max_entries:
+                    self._mem.popitem(last=False)
+                    self._evictions += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.execute(f"DELETE FROM {self._table} WHERE key = ?", (key,))
+            else:
+                self._mem.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.execute(f"DELETE FROM {self._table}")
+            else:
+                self._mem.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size = (
+                self._db.execute(f"SELECT COUNT(*) FROM {self._table}").fetchone()[0]
+                if self._db is not None else len(self._mem)
+            )
+            total = self._hits + self._misses
+            return {
+                "backend": "sqlite" if self._db is not None else "memory",
+                "size": size,
+                "max_entries": self.max_entries,
+                "ttl_sec": self.ttl_sec,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / total, 4) if total else 0.0,
+                "evictions": self._evictions,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    # ---------- internals (caller holds the lock) ----------
+    def _read(self, key: str, now: float) -> Optional[Tuple[float, str]]:
+        if self._db is not None:
+            row = self._db.execute(
+                f"SELECT created_at, expires_at, value FROM {self._table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                self._db.execute(f"DELETE FROM {self._table} WHERE key = ?", (key,))
+                return None
+            self._db.execute(f"UPDATE {self._table} SET last_access = ? WHERE key = ?", (now, key))
+            return row[0], row[2]
+
+        entry = self._mem.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= now:
+            del self._mem[key]
+            return None
+        self._mem.move_to_end(key)
+        return entry[0], entry[2]
+
+    def _evict_db(self, now: float) -> None:
+        self._db.execute(f"DELETE FROM {self._table} WHERE expires_at <= ?", (now,))
+        over = self._db.execute(f"SELECT COUNT(*) FROM {self._table}").fetchone()[0] - self.max_entries
+        if over > 0:
+            self._db.execute(
+                f"DELETE FROM {self._table} WHERE key IN "
+                f"(SELECT key FROM {self._table} ORDER BY last_access ASC LIMIT ?)",
+                (over,),
+            )
+            self._evictions += over
+            logger.debug(f"[CACHE] {self.name}: evicted {over} LRU entries")
+
+
+_caches: Dict[str, TTLCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(name: str) -> Optional[TTLCache]:
+    """
+    Process-wide cache registry configured from the `cache.<name>` settings section;
+    returns None when that cache is disabled.
+    """
+    cache_cfg = get_settings().cache
+    section = cache_cfg.section(name)
+    if not section.enabled:
+        return None
+    with _caches_lock:
+        if name not in _caches:
+            path = os.getenv("CACHE_PATH", cache_cfg.path or "")
+            _caches[name] = TTLCache(
+                name,
+                ttl_sec=section.ttl_sec,
+                max_entries=section.max_entries,
+                path=path or None,
+            )
+        return _caches[name]
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    with _caches_lock:
+        caches = dict(_caches)
+    return {name: c.stats() for name, c in caches.items()}
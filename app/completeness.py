@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+Completeness of the parcel facts and the stop decisions of the plan/search/extract loop.
+
+completeness() scores la_data on the fields of the extractor's patch schema (see
+prompt_budget.missing_fields); fact_set() lists the individual facts so a round of search and
+extraction can be judged by what it added. record_decision() keeps, per process, why each
+analysis stopped looping and how many runs got by without planner/extractor or any LLM calls.
+"""
+import threading
+from typing import Any, Dict, List, Set, Tuple
+
+from app.metrics import WORKFLOW_DECISIONS, WORKFLOW_LLM_AVOIDED
+from app.prompt_budget import missing_fields
+
+PATCH_FIELDS = ("base_zone", "height_limit", "far", "overlays", "permits")
+
+
+def completeness(la_data: Dict[str, Any]) -> float:
+    """Share of PATCH_FIELDS la_data has a value for (or that the panel parser settled)."""
+    return round(1 - len(missing_fields(la_data or {})) / len(PATCH_FIELDS), 3)
+
+
+def fact_set(la_data: Dict[str, Any]) -> Set[Tuple[str, ...]]:
+    la_data = la_data or {}
+    facts = {("zoning", k, str(v)) for k, v in (la_data.get("zoning") or {}).items() if v}
+    facts |= {("overlay", str(o)) for o in la_data.get("overlays") or []}
+    facts |= {("permit", str(p.get("id") or p) if isinstance(p, dict) else str(p)) for p in la_data.get("permits") or []}
+    return facts
+
+
+def llm_calls(token_usage: List[Dict[str, Any]], stages: Tuple[str, ...] = ()) -> int:
+    """LLM requests actually sent (response-cache hits excluded), optionally only for `stages`."""
+    return sum(1 for u in token_usage or [] if not u.get("cached") and (not stages or u.get("stage") in stages))
+
+
+_lock = threading.Lock()
+_stats: Dict[str, Any] = {"runs": 0, "reasons": {}, "iterations": 0, "no_plan_extract_llm": 0, "no_llm": 0}
+
+
+def record_decision(result: Dict[str, Any]) -> None:
+    reason = result.get("decision") or "unknown"
+    usage = result.get("token_usage") or []
+    no_loop_llm = llm_calls(usage, ("plan", "extract")) == 0
+    no_llm = llm_calls(usage) == 0
+    WORKFLOW_DECISIONS.labels(reason).inc()
+    if no_loop_llm:
+        WORKFLOW_LLM_AVOIDED.labels("plan_extract").inc()
+    if no_llm:
+        WORKFLOW_LLM_AVOIDED.labels("all").inc()
+    with _lock:
+        _stats["runs"] += 1
+        _stats["reasons"][reason] = _stats["reasons"].get(reason, 0) + 1
+        _stats["iterations"] += result.get("iterations") or 0
+        _stats["no_plan_extract_llm"] += 1 if no_loop_llm else 0
+        _stats["no_llm"] += 1 if no_llm else 0
+
+
+def decision_stats() -> Dict[str, Any]:
+    with _lock:
+        runs = _stats["runs"]
+        return {
+            "runs": runs,
+            "reasons": dict(_stats["reasons"]),
+            "avg_iterations": round(_stats["iterations"] / runs, 2) if runs else 0.0,
+            "no_plan_extract_llm_fraction": round(_stats["no_plan_extract_llm"] / runs, 3) if runs else 0.0,
+            "no_llm_fraction": round(_stats["no_llm"] / runs, 3) if runs else 0.0,
+        }
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+HTML -> text conversion of ZIMAS panel content, with interchangeable parser backends.
+
+Every table in the fragment (nested ones included, in document order) becomes one
+"label: value" line per row with two or more cells, or the row's whole text otherwise; a
+fragment without tables becomes its text nodes, one per line. Cell text is the cell's text
+nodes joined by spaces and whitespace-normalized (norm_text), so only where the parser puts
+text node boundaries matters, not how it keeps whitespace.
+
+Backends, fastest first: selectolax (lexbor), lxml, bs4 (BeautifulSoup with html.parser, the
+reference). bs4 is required; selectolax and lxml are listed in requirements.txt but optional at
+runtime. ZIMAS_HTML_BACKEND picks one (auto, the default, takes the fastest installed one).
+All backends give the bs4 output on the panel HTML the scraper reads, which is serialized by
+Chromium and so already well-formed HTML5; tests/test_html_text.py checks that against
+saved ZIMAS HTML. Fragments without tables and input a fast backend cannot parse go through bs4.
+"""
+import importlib.util
+import os
+import re
+from typing import Callable, Dict, List, Optional
+
+from bs4 import BeautifulSoup
+from loguru import logger
+
+SELECTOLAX_AVAILABLE = importlib.util.find_spec("selectolax") is not None
+LXML_AVAILABLE = importlib.util.find_spec("lxml") is not None
+# element text bs4's get_text() leaves out
+_NON_TEXT_TAGS = ("script", "style", "template")
+
+
+def norm_text(s: str) -> str:
+    s = (s or "").replace("\u00A0", " ")
+    s = " ".join(s.split())
+    s = re.sub(r"\s*/\s*", "/", s)
+    return s.strip()
+
+
+def _row_line(cells: List[str], row_text: Callable[[], str]) -> Optional[str]:
+    if len(cells) >= 2:
+        label, value = norm_text(cells[0]), norm_text(cells[1])
+        return f"{label}: {value}" if label or value else None
+    return norm_text(row_text()) or None
+
+
+# ---------- bs4 (reference) ----------
+def _bs4_table_lines(table: BeautifulSoup) -> List[str]:
+    out: List[str] = []
+    for tr in table.find_all("tr"):
+        tds = tr.find_all("td")
+        line = _row_line([td.get_text(" ", strip=True) for td in tds[:2]], lambda: tr.get_text(" ", strip=True))
+        if line:
+            out.append(line)
+    return out
+
+
+def _bs4_text(html: str) -> str:
+    soup = BeautifulSoup(html, "html.parser")
+    for br in soup.find_all("br"):
+        br.replace_with("\n")
+    tables = soup.find_all("table")
+    if tables:
+        lines: List[str] = []
+        for tb in tables:
+            lines.extend(_bs4_table_lines(tb))
+        return "\n".join(lines)
+    text = soup.get_text("\n", strip=True)
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    return text.strip()
+
+
+# ---------- lxml ----------
+def _lxml_text(html: str) -> Optional[str]:
+    from lxml import etree
+
+    root = etree.HTML(html)
+    if root is None:
+        return None
+    tables = list(root.iter("table"))
+    if not tables:
+        return None
+    etree.strip_elements(root, *_NON_TEXT_TAGS, with_tail=False)
+    lines: List[str] = []
+    for tb in tables:
+        for tr in tb.iter("tr"):
+            tds = list(tr.iter("td"))[:2]
+            line = _row_line([" ".join(td.itertext()) for td in tds], lambda: " ".join(tr.itertext()))
+            if line:
+                lines.append(line)
+    return "\n".join(lines)
+
+
+# ---------- selectolax ----------
+def _selectolax_text(html: str) -> Optional[str]:
+    from selectolax.lexbor import LexborHTMLParser
+
+    tree = LexborHTMLParser(html)
+    tables = tree.css("table")
+    if not tables:
+        return None
+    tree.strip_tags(list(_NON_TEXT_TAGS))
+    lines: List[str] = []
+    for tb in tables:
+        for tr in tb.css("tr"):
+            tds = tr.css("td")[:2]
+            line = _row_line([td.text(separator=" ") for td in tds], lambda: tr.text(separator=" "))
+            if line:
+                lines.append(line)
+    return "\n".join(lines)
+
+
+_FAST_BACKENDS: Dict[str, Callable[[str], Optional[str]]] = {"selectolax": _selectolax_text, "lxml": _lxml_text}
+
+
+def available_backends() -> List[str]:
+    return [name for name, ok in (("selectolax", SELECTOLAX_AVAILABLE), ("lxml", LXML_AVAILABLE)) if ok] + ["bs4"]
+
+
+def _resolve_backend(name: str) -> str:
+    available = available_backends()
+    if name in ("", "auto"):
+        return available[0]
+    if name not in available:
+        logger.warning(f"[HTML] backend {name!r} not available, using {available[0]}")
+        return available[0]
+    return name
+
+
+BACKEND = _resolve_backend(os.getenv("ZIMAS_HTML_BACKEND", "auto").strip().lower())
+
+
+def html_to_text(html: str, backend: Optional[str] = None) -> str:
+    """Panel text of an HTML fragment with `backend` (default: BACKEND)."""
+    if not html:
+        return ""
+    fast = _FAST_BACKENDS.get(_resolve_backend(backend) if backend else BACKEND)
+    if fast is not None:
+        try:
+            text = fast(html)
+            if text is not None:
+                return text
+        except Exception as e:  # e.g. lxml refuses str input with an encoding declaration
+            logger.debug(f"[HTML] fast backend failed ({e}), using bs4")
+    return _bs4_text(html)
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+Process-wide pooled httpx clients for the LLM and search integrations.
+
+httpx.AsyncClient is bound to the event loop it first runs on, so clients are kept per (name, loop).
+On the API loop that means one long-lived keep-alive pool per upstream; run_sync() loops close theirs
+when they finish. Every request carries an httpcore trace hook so we can count how many requests
+had to open a new TCP connection versus reusing a pooled one, and the transport is wrapped to
+feed per-client latency / error metrics.
+"""
+import asyncio
+import importlib.util
+import threading
+import time
+import weakref
+from typing import Any, Dict
+
+import httpx
+from loguru import logger
+
+from app.metrics import HTTP_ERRORS, HTTP_LATENCY
+from app.settings import get_settings
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+class _Counters:
+    def __init__(self) -> None:
+        self.requests = 0
+        self.new_connections = 0
+        self.http2 = False
+
+
+_lock = threading.Lock()
+_counters: Dict[str, _Counters] = {}
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, httpx.AsyncClient]]" = weakref.WeakKeyDictionary()
+
+
+def _counter(name: str) -> _Counters:
+    with _lock:
+        return _counters.setdefault(name, _Counters())
+
+
+class _InstrumentedTransport(httpx.AsyncBaseTransport):
+    """Times every request to response headers and counts requests that fail without a response."""
+
+    def __init__(self, name: str, inner: httpx.AsyncBaseTransport) -> None:
+        self.name = name
+        self.inner = inner
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        t0 = time.perf_counter()
+        try:
+            response = await self.inner.handle_async_request(request)
+        except Exception as e:
+            HTTP_ERRORS.labels(self.name, type(e).__name__).inc()
+            HTTP_LATENCY.labels(self.name, "error").observe(time.perf_counter() - t0)
+            raise
+        HTTP_LATENCY.labels(self.name, str(response.status_code)).observe(time.perf_counter() - t0)
+        return response
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
+
+
+def _build_client(name: str) -> httpx.AsyncClient:
+    section = get_settings().http.for_client(name)
+    limits = httpx.Limits(
+        max_connections=section.max_connections,
+        max_keepalive_connections=section.max_keepalive_connections,
+        keepalive_expiry=section.keepalive_expiry_sec,
+    )
+    http2 = section.http2 and HTTP2_AVAILABLE
+    counters = _counter(name)
+    counters.http2 = http2
+
+    async def _trace(event_name: str, info: Dict[str, Any]) -> None:
+        if event_name == "connection.connect_tcp.complete":
+            with _lock:
+                counters.new_connections += 1
+
+    async def _on_request(request: httpx.Request) -> None:
+        with _lock:
+            counters.requests += 1
+        request.extensions["trace"] = _trace
+
+    logger.info(f"[HTTP] new client '{name}' http2={http2} limits={limits}")
+    transport = _InstrumentedTransport(name, httpx.AsyncHTTPTransport(limits=limits, http2=http2))
+    return httpx.AsyncClient(transport=transport, event_hooks={"request": [_on_request]})
+
+
+def get_async_client(name: str) -> httpx.AsyncClient:
+    """Shared client for `name` ("llm", "search", ...) on the running event loop."""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        per_loop = _clients.setdefault(loop, {})
+        client = per_loop.get(name)
+    if client is None or client.is_closed:
+        # only this loop's thread ever builds its clients, and there is no await in between
+        client = _build_client(name)
+        with _lock:
+            per_loop[name] = client
+    return client
+
+
+async def close_async_clients() -> None:
+    """Closes the clients bound to the running loop (API shutdown, end of a run_sync loop)."""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        per_loop = _clients.pop(loop, {})
+    for client in per_loop.values():
+        try:
+            await client.aclose()
+        except Exception:
+            pass
+
+
+def http_client_stats() -> Dict[str, Dict[str, Any]]:
+    with _lock:
+        out = {}
+        for name, c in _counters.items():
+            out[name] = {
+                "requests": c.requests,
+                "new_connections": c.new_connections,
+                "reused_connections": max(0, c.requests - c.new_connections),
+                "reuse_ratio": round(1 - c.new_connections / c.requests, 4) if c.requests else 0.0,
+                "http2": c.http2,
+            }
+        return out
@@ -1,60 +1,48 @@
 # -*- coding: utf-8 -*-
-import os, json, httpx, yaml, re, time
-from typing import Dict, List, Any
+import os, json, httpx, re, time
+from typing import Dict, List, Any, AsyncIterator, Optional
 from loguru import logger
 from langsmith import traceable
 from app.prompts import PLAN_QUERIES_SYSTEM_PROMPT, EXTRACT_SYSTEM_PROMPT
+from app.aio import run_sync
+from app.cache import get_cache, make_key
+from app.llm_scheduler import LLMUnavailable, send_llm
+from app.metrics import LLM_TOKENS
+from app.prompt_budget import input_budget, pack_context, record_prompt_usage
+from app.settings import LLMSettings, get_settings
 
-CONFIG_PATH = os.getenv("CONFIG_PATH", "config/config.yaml")
-
-# ---------- helpers to shrink payload (מפחית TPM) ----------
-def _clip(s: str, max_chars: int) -> str:
-    if not s:
-        return ""
-    s = re.sub(r"\s+", " ", str(s)).strip()
-    return s if len(s) <= max_chars else (s[:max_chars].rstrip() + " …")
-
-def _shrink_panels(la_data: Dict, max_chars_per_panel: int = 1200) -> Dict:
-    la = dict(la_data or {})
-    panels = dict((la.get("panels") or {}))
-    small = {}
-    for k, v in panels.items():
-        small[k] = _clip(v or "", max_chars_per_panel)
-    la["panels"] = small
-    if "notes" in la:
-        la["notes"] = _clip(la["notes"], 1200)
-    if "sources" in la:
-        la["sources"] = la["sources"][:10]
-    if "zoning" in la:
-        for kk in list(la["zoning"].keys()):
-            la["zoning"][kk] = _clip(la["zoning"][kk], 200)
-    if "permits" in la:
-        la["permits"] = la["permits"][:10]
-    return la
-
-def _shrink_notes(search_notes: List[Dict], top_k: int = 5, max_chars: int = 700) -> List[Dict]:
-    notes = list(search_notes or [])
-    notes = sorted(notes, key=lambda x: x.get("score", 0.0), reverse=True)[:top_k]
-    small = []
-    for n in notes:
-        small.append({
-            "title": _clip(n.get("title") or "", 200),
-            "url": n.get("url") or "",
-            "content": _clip(n.get("content") or n.get("raw_text") or "", max_chars),
-            "score": n.get("score", 0.0),
-        })
-    return small
-# -----------------------------------------------------------
+# ---------- prompt packing (token budget per stage, מפחית TPM) ----------
+def _pack(stage: str, system_prompt: str, la_data: Dict, search_notes: List[Dict], llm_cfg: LLMSettings,
+          max_tokens: int, **kwargs: Any):
+    budget = input_budget(stage, llm_cfg, system_prompt, max_tokens)
+    la_small, notes_small, usage = pack_context(la_data or {}, search_notes or [], budget, **kwargs)
+    return la_small, notes_small, {"stage": stage, **usage}
 
-def _load_config() -> dict:
-    with open(CONFIG_PATH, "r", encoding="utf-8") as f:
-        return yaml.safe_load(f)
+def _record_usage(usage: Optional[List[Dict[str, Any]]], entry: Dict[str, Any], model: Optional[str],
+                  data: Optional[Dict[str, Any]] = None) -> None:
+    """Adds the serving model and provider-reported token counts to a packing entry and records it."""
+    reported = (data or {}).get("usage") or {}
+    entry = {
+        **entry,
+        "model": model,
+        "prompt_tokens": reported.get("prompt_tokens"),
+        "completion_tokens": reported.get("completion_tokens"),
+    }
+    record_prompt_usage(entry)
+    for kind in ("prompt_tokens", "completion_tokens"):
+        if entry[kind]:
+            LLM_TOKENS.labels(entry["stage"], model or "", kind.split("_")[0]).inc(entry[kind])
+    logger.info(
+        f"[PROMPT] stage={entry['stage']} est={entry['estimated_tokens']} budget={entry['budget']} "
+        f"prompt_tokens={entry['prompt_tokens']} panels={len(entry['panels'])} "
+        f"dropped={entry['panels_dropped']} notes={entry['notes']}"
+    )
+    if usage is not None:
+        usage.append(entry)
+# -----------------------------------------------------------
 
 def _headers() -> dict:
-    cfg = _load_config()
-    provider = (cfg.get("integrations", {})
-                  .get("llm", {})
-                  .get("provider", "openrouter")).lower()
+    provider = get_settings().integrations.llm.provider.lower()
 
     if provider == "groq":
         key = os.getenv("GROQ_API_KEY", "").strip()
@@ -76,9 +64,9 @@ def _headers() -> dict:
         "Content-Type": "application/json",
     }
 
-def _build_messages(system_prompt: str, address: str, la_data: Dict, search_notes: List[Dict]) -> List[Dict[str, Any]]:
-    la_small = _shrink_panels(la_data, max_chars_per_panel=1200)
-    notes_small = _shrink_notes(search_notes, top_k=5, max_chars=700)
+def _build_messages(system_prompt: str, address: str, la_data: Dict, search_notes: List[Dict],
+                    llm_cfg: LLMSettings, max_tokens: int):
+    la_small, notes_small, usage = _pack("report", system_prompt, la_data, search_notes, llm_cfg, max_tokens, max_notes=6)
     return [
         {"role": "system", "content": system_prompt},
         {
@@ -89,7 +77,7 @@ def _build_messages(system_prompt: str, address: str, la_data: Dict, search_note
                 f"Search notes (top): {json.dumps(notes_small, ensure_ascii=False)}"
             ),
         },
-    ]
+    ], usage
 
 def _make_timeout(total_seconds: int) -> httpx.Timeout:
     connect = min(20, max(5, total_seconds - 10))
@@ -101,143 +89,263 @@ def _make_timeout(total_seconds: int) -> httpx.Timeout:
     except TypeError:
         return httpx.Timeout(connect=connect, read=read, write=write, pool=pool)
 
+def _report_payload(address: str, la_data: Dict, search_notes: List[Dict], system_prompt: str, llm_cfg: LLMSettings):
+    # Reasonable output that allows for clean summarization but does not conflict severely with TPM
+    max_tokens = min(llm_cfg.max_tokens, 800)
+    messages, usage = _build_messages(system_prompt, address, la_data, search_notes, llm_cfg, max_tokens)
+    return {
+        "model": llm_cfg.model,
+        "messages": messages,
+        "temperature": llm_cfg.temperature,
+        "max_tokens": max_tokens,
+    }, usage
+
+def report_from_text(content: str, model: Optional[str] = None) -> Dict[str, Any]:
+    return {
+        "formatted_text": content,   
+        "raw_llm_text": content,    
+        "sections": [],
+        "sources": [],
+        "warnings": [],
+        "model": model,
+    }
+
+def failed_report(reason: Optional[str] = None) -> Dict[str, Any]:
+    return {
+        "formatted_text": "",
+        "sections": [{"title": "Error", "content": "LLM request failed. See server logs."}],
+        "sources": [],
+        "warnings": ["LLM call failed." + (f" ({reason})" if reason else "")],
+        "model": None,
+    }
+
+# ---------- response cache ----------
+def _llm_cache_key(payload: Dict[str, Any]) -> str:
+    # `stream` is deliberately not part of the key: streamed and blocking reports share entries
+    return make_key(
+        "llm",
+        payload.get("model"),
+        payload.get("messages"),
+        payload.get("temperature"),
+        payload.get("max_tokens"),
+        payload.get("response_format"),
+    )
+
+def _cached_entry(payload: Dict[str, Any], use_cache: bool) -> Optional[Dict[str, Any]]:
+    """Cached {"content", "model"} for this request; `model` is the one that originally served it."""
+    cache = get_cache("llm") if use_cache else None
+    hit = cache.get(_llm_cache_key(payload)) if cache is not None else None
+    if hit is not None:
+        logger.info(f"[LLM-CACHE] hit model={hit.get('model') or payload.get('model')}")
+    return hit
+
+def _store_content(payload: Dict[str, Any], content: str, model: str, use_cache: bool) -> None:
+    cache = get_cache("llm") if use_cache else None
+    if cache is not None and content:
+        cache.set(_llm_cache_key(payload), {"content": content, "model": model})
+
 @traceable(name="openrouter_llm")
-def analyze_with_llm(address: str, la_data: Dict, search_notes: List[Dict], system_prompt: str) -> Dict[str, Any]:
+async def analyze_with_llm_async(address: str, la_data: Dict, search_notes: List[Dict], system_prompt: str,
+                                 use_cache: bool = True, usage: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
     """
     Requests a single summarized text (Markdown) from the LLM, without JSON-mode.
-    Uses input truncation to reduce TPM, and always returns a dictionary with formatted_text.
+    Input is packed into the stage's token budget (entries appended to `usage`),
+    and always returns a dictionary with formatted_text.
+    Identical requests are answered from the `llm` cache unless use_cache=False.
+    Rate limits and 5xx are retried / rotated to fallback models by the scheduler;
+    the report's `model` records which model produced it.
     """
-    print("in analyze number 1111111111111111111111111111111")
-    cfg = _load_config()
-    llm_cfg = cfg["integrations"]["llm"]
+    llm_cfg = get_settings().integrations.llm
 
-    timeout = _make_timeout(int(llm_cfg.get("request_timeout_sec", 90)))
-    messages = _build_messages(system_prompt, address, la_data, search_notes)
+    timeout = _make_timeout(llm_cfg.request_timeout_sec)
+    payload, packed = _report_payload(address, la_data, search_notes, system_prompt, llm_cfg)
+    model = payload["model"]
+    cached = _cached_entry(payload, use_cache)
+    if cached is not None:
+        _record_usage(usage, {**packed, "cached": True}, cached.get("model"))
+        return report_from_text(cached["content"], model=cached.get("model"))
 
-    # Reasonable output that allows for clean summarization but does not conflict severely with TPM
-    max_tokens = min(int(llm_cfg.get("max_tokens", 900)), 800)
-    model = llm_cfg["model"]
-
-    with httpx.Client(timeout=timeout, headers=_headers()) as client:
+    headers = _headers()
+    try:
+        r, model = await send_llm(payload, timeout, headers, stage="report")
+        if r.status_code != 200:
+            logger.error(f"[LLM] HTTP {r.status_code} model={model} body={r.text[:600]}")
+        r.raise_for_status()
+        data = r.json()
+        _record_usage(usage, packed, model, data)
+        if "choices" in data and data["choices"]:
+            content = (data["choices"][0]["message"]["content"] or "").strip()
+            _store_content(payload, content, model, use_cache)
+            return report_from_text(content, model=model)
+    except LLMUnavailable as e:
+        logger.error(f"[LLM] {e}")
+        return failed_report("rate limited or unavailable on all models")
+    except httpx.HTTPStatusError as e:
         try:
-            payload = {
-                "model": model,
-                "messages": messages,
-                "temperature": llm_cfg.get("temperature", 0.2),
-                "max_tokens": max_tokens,
-            }
-            print("in analyze number 222222222222222222222222")
-            r = client.post(llm_cfg["base_url"], json=payload)
-            if r.status_code != 200:
-                logger.error(f"[LLM] HTTP {r.status_code} model={model} body={r.text[:600]}")
-            r.raise_for_status()
-            data = r.json()
-            if "choices" in data and data["choices"]:
-                print("in analyze number 3333333333333333333333")
-                content = (data["choices"][0]["message"]["content"] or "").strip()
-                print(content)
-                return {
-                    "formatted_text": content,   
-                    "raw_llm_text": content,    
-                    "sections": [],
-                    "sources": [],
-                    "warnings": [],
-                }
-        except httpx.HTTPStatusError as e:
-            try:
-                body = e.response.text[:600] if e.response is not None else ""
-            except Exception:
-                body = ""
-            logger.error(f"[LLM] HTTP error model={model}: {e} body={body}")
-        except Exception as e:
-            logger.warning(f"[LLM] request failed (model={model}): {e}")
+            body = e.response.text[:600] if e.response is not None else ""
+        except Exception:
+            body = ""
+        logger.error(f"[LLM] HTTP error model={model}: {e} body={body}")
+    except Exception as e:
+        logger.warning(f"[LLM] request failed (model={model}): {e}")
 
    
 # If we fail, we will return an indication — the UI will display a message accordingly   
-    return {
-        "formatted_text": "",
-        "sections": [{"title": "Error", "content": "LLM request failed. See server logs."}],
-        "sources": [],
-        "warnings": ["LLM call failed."],
-    }
+    return failed_report()
+
+def analyze_with_llm(address: str, la_data: Dict, search_notes: List[Dict], system_prompt: str,
+                     use_cache: bool = True, usage: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """Sync wrapper around analyze_with_llm_async."""
+    return run_sync(analyze_with_llm_async(address, la_data, search_notes, system_prompt,
+                                           use_cache=use_cache, usage=usage))
+
+async def analyze_with_llm_stream(address: str, la_data: Dict, search_notes: List[Dict], system_prompt: str,
+                                  use_cache: bool = True, meta: Optional[Dict[str, Any]] = None,
+                                  usage: Optional[List[Dict[str, Any]]] = None) -> AsyncIterator[str]:
+    """
+    Same request as analyze_with_llm_async with `stream: true`; yields the report text
+    delta by delta as the provider sends OpenAI-style SSE chunks. HTTP errors are raised.
+    A cached report is yielded as a single chunk; a completed stream is stored in the cache.
+    Retries and model fallback happen before the first chunk; the serving model is put in meta["model"].
+    """
+    llm_cfg = get_settings().integrations.llm
+    timeout = _make_timeout(llm_cfg.request_timeout_sec)
+    payload, packed = _report_payload(address, la_data, search_notes, system_prompt, llm_cfg)
+    payload["stream"] = True
+    meta = meta if meta is not None else {}
+    cached = _cached_entry(payload, use_cache)
+    if cached is not None:
+        meta["model"] = cached.get("model")
+        _record_usage(usage, {**packed, "cached": True}, cached.get("model"))
+        yield cached["content"]
+        return
+
+    headers = _headers()
+    r, model = await send_llm(payload, timeout, headers, stage="report-stream", stream=True)
+    meta["model"] = model
+    _record_usage(usage, packed, model)
+    try:
+        if r.status_code != 200:
+            body = (await r.aread()).decode("utf-8", "replace")[:600]
+            logger.error(f"[LLM-STREAM] HTTP {r.status_code} model={model} body={body}")
+            r.raise_for_status()
+        parts: List[str] = []
+        async for line in r.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            chunk = line[5:].strip()
+            if chunk == "[DONE]":
+                break
+            try:
+                delta = json.loads(chunk)["choices"][0].get("delta", {}).get("content")
+            except (ValueError, KeyError, IndexError):
+                continue
+            if delta:
+                parts.append(delta)
+                yield delta
+    finally:
+        await r.aclose()
+    _store_content(payload, "".join(parts).strip(), model, use_cache)
 
 
 # ---------- JSON helper for planner/extractor ----------
-def _llm_json(messages: List[Dict[str, Any]], llm_cfg: dict) -> Dict[str, Any]:
+JSON_MAX_TOKENS = 400
+
+async def _llm_json(messages: List[Dict[str, Any]], llm_cfg: LLMSettings, use_cache: bool = True,
+                    stage: str = "json", packed: Optional[Dict[str, Any]] = None,
+                    usage: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
     """
-    "Efficient" JSON reading: single model, single attempt, small max_tokens.
-    Pushes logs, and handles 413/429 on read error return.
+    "Efficient" JSON reading: small max_tokens, 429/5xx retried on fallback models by the scheduler.
+    Pushes logs, and handles 413 on read error return.
+    Parsed answers are cached per request unless use_cache=False.
     """
-    timeout = _make_timeout(int(llm_cfg.get("request_timeout_sec", 90)))
-    model = llm_cfg["model"]
-    max_tokens = 400  
+    timeout = _make_timeout(llm_cfg.request_timeout_sec)
+    model = llm_cfg.model
+    max_tokens = JSON_MAX_TOKENS
 
-    with httpx.Client(timeout=timeout, headers=_headers()) as client:
+    headers = _headers()
+    try:
+        payload = {
+            "model": model,
+            "messages": messages,
+            "temperature": llm_cfg.temperature,
+            "max_tokens": max_tokens,
+            "response_format": {"type": "json_object"},
+        }
+        cached = _cached_entry(payload, use_cache)
+        if cached is not None:
+            if packed is not None:
+                _record_usage(usage, {**packed, "cached": True}, cached.get("model"))
+            return json.loads(cached["content"])
         try:
-            payload = {
-                "model": model,
-                "messages": messages,
-                "temperature": llm_cfg.get("temperature", 0.2),
-                "max_tokens": max_tokens,
-                "response_format": {"type": "json_object"},
-            }
-            try:
-                lens = [len(m.get("content","")) for m in messages if isinstance(m, dict)]
-                logger.info(f"[LLM-JSON] model={model} max_tokens={max_tokens} msg_lens={lens}")
-            except Exception:
-                pass
-
-            r = client.post(llm_cfg["base_url"], json=payload)
-            if r.status_code != 200:
-                logger.error(f"[LLM-JSON] HTTP {r.status_code} model={model} body={r.text[:600]}")
-            r.raise_for_status()
+            lens = [len(m.get("content","")) for m in messages if isinstance(m, dict)]
+            logger.info(f"[LLM-JSON] model={model} max_tokens={max_tokens} msg_lens={lens}")
+        except Exception:
+            pass
 
-            data = r.json()
-            if data.get("choices"):
-                content = data["choices"][0]["message"]["content"]
-                return json.loads(content)
+        r, model = await send_llm(payload, timeout, headers, stage=stage)
+        if r.status_code != 200:
+            logger.error(f"[LLM-JSON] HTTP {r.status_code} model={model} body={r.text[:600]}")
+        r.raise_for_status()
 
-        except httpx.HTTPStatusError as e:
-            status = e.response.status_code if e.response is not None else None
-            body = ""
-            try:
-                body = e.response.text[:600] if e.response is not None else ""
-            except Exception:
-                pass
-            if status == 413:
-                logger.error(f"[LLM-JSON] 413 Payload Too Large: {body}")
-                raise RuntimeError("Input too large for JSON step (413). Reduce panels/notes before retry.")
-            elif status == 429:
-                logger.error(f"[LLM-JSON] 429 Rate Limit: {body}")
-                raise RuntimeError("Rate limited in JSON step (429). Try again later or reduce input.")
-            else:
-                logger.error(f"[LLM-JSON] HTTP error {status}: {e} body={body}")
-                raise
-
-        except Exception as e:
-            logger.error(f"[LLM-JSON] failed: {e}")
-            raise RuntimeError("LLM JSON request failed") from e
-
-def plan_queries(address: str, la_data: Dict) -> Dict:
+        data = r.json()
+        if packed is not None:
+            _record_usage(usage, packed, model, data)
+        if data.get("choices"):
+            content = data["choices"][0]["message"]["content"]
+            out = json.loads(content)
+            _store_content(payload, content, model, use_cache)
+            return out
+
+    except LLMUnavailable:
+        raise
+    except httpx.HTTPStatusError as e:
+        status = e.response.status_code if e.response is not None else None
+        body = ""
+        try:
+            body = e.response.text[:600] if e.response is not None else ""
+        except Exception:
+            pass
+        if status == 413:
+            logger.error(f"[LLM-JSON] 413 Payload Too Large: {body}")
+            raise RuntimeError("Input too large for JSON step (413). Reduce panels/notes before retry.")
+        else:
+            logger.error(f"[LLM-JSON] HTTP error {status}: {e} body={body}")
+            raise
+
+    except Exception as e:
+        logger.error(f"[LLM-JSON] failed: {e}")
+        raise RuntimeError("LLM JSON request failed") from e
+
+async def plan_queries_async(address: str, la_data: Dict, use_cache: bool = True,
+                             usage: Optional[List[Dict[str, Any]]] = None) -> Dict:
     """
-    Tavily query planner based on missing. Sends limited input to avoid 413.
+    Tavily query planner based on missing. Sends input packed to the `plan` budget to avoid 413.
     """
-    cfg = _load_config(); llm_cfg = cfg["integrations"]["llm"]
-    la_small = _shrink_panels(la_data, max_chars_per_panel=600)
-    la_small.pop("permits", None)
-    la_small.pop("notes", None)
+    llm_cfg = get_settings().integrations.llm
+    la_small, _, packed = _pack("plan", PLAN_QUERIES_SYSTEM_PROMPT, la_data, [], llm_cfg, JSON_MAX_TOKENS,
+                                exclude=("permits", "notes"), missing_panels_only=True)
 
     messages = [
         {"role": "system", "content": PLAN_QUERIES_SYSTEM_PROMPT},
-        {"role": "user", "content": f"ADDRESS: {address}\nLA_DATA:\n{json.dumps(la_small, ensure_ascii=False)}"}
+        {"role": "user", "content": (
+            f"ADDRESS: {address}\n"
+            f"MISSING_FIELDS: {json.dumps(packed['missing_fields'])}\n"
+            f"LA_DATA:\n{json.dumps(la_small, ensure_ascii=False)}"
+        )}
     ]
     try:
-        out = _llm_json(messages, llm_cfg)
+        out = await _llm_json(messages, llm_cfg, use_cache=use_cache, stage="plan", packed=packed, usage=usage)
         return out if isinstance(out, dict) else {"queries": [], "include_domains": [], "stop_condition": "error"}
     except Exception as e:
         logger.warning(f"[plan_queries] failed: {e}")
         return {"queries": [], "include_domains": [], "stop_condition": "error"}
 
+def plan_queries(address: str, la_data: Dict, use_cache: bool = True,
+                 usage: Optional[List[Dict[str, Any]]] = None) -> Dict:
+    """Sync wrapper around plan_queries_async."""
+    return run_sync(plan_queries_async(address, la_data, use_cache=use_cache, usage=usage))
+
 def _pack_notes(search_notes: List[Dict]) -> str:
     """Compact string from Tavily results for the extractor."""
     lines = []
@@ -249,14 +357,16 @@ def _pack_notes(search_notes: List[Dict]) -> str:
         lines.append(f"[{i}] {title} :: {url} :: score={score}\n{content}\n")
     return "\n---\n".join(lines)
 
-def extract_merge(address: str, la_data: Dict, search_notes: List[Dict]) -> Dict:
+async def extract_merge_async(address: str, la_data: Dict, search_notes: List[Dict], use_cache: bool = True,
+                              usage: Optional[List[Dict[str, Any]]] = None) -> Dict:
     """
-    Consolidates supported facts. Sends only a short summary to the LLM core (Top-3 comments, abbreviated panels).
+    Consolidates supported facts. Sends only a short summary to the LLM core
+    (the most relevant notes and panels, packed to the `extract` budget).
     """
-    cfg = _load_config(); llm_cfg = cfg["integrations"]["llm"]
+    llm_cfg = get_settings().integrations.llm
 
-    la_small = _shrink_panels(la_data, max_chars_per_panel=600)
-    notes_small = _shrink_notes(search_notes, top_k=3, max_chars=400)
+    la_small, notes_small, packed = _pack("extract", EXTRACT_SYSTEM_PROMPT, la_data, search_notes, llm_cfg,
+                                          JSON_MAX_TOKENS, max_notes=4, missing_panels_only=True)
 
     messages = [
         {"role": "system", "content": EXTRACT_SYSTEM_PROMPT},
@@ -264,28 +374,36 @@ def extract_merge(address: str, la_data: Dict, search_notes: List[Dict]) -> Dict
             "role": "user",
             "content": (
                 f"ADDRESS: {address}\n"
+                f"MISSING_FIELDS: {json.dumps(packed['missing_fields'])}\n"
                 f"NOTES_MINI:\n{json.dumps(notes_small, ensure_ascii=False)}\n"
                 f"CURRENT_MINI:\n{json.dumps(la_small, ensure_ascii=False)}"
             )
         }
     ]
     try:
-        out = _llm_json(messages, llm_cfg)
+        out = await _llm_json(messages, llm_cfg, use_cache=use_cache, stage="extract", packed=packed, usage=usage)
     except Exception as e:
         logger.warning(f"[extract_merge] failed: {e}")
         return la_data  
     patch = (out or {}).get("patch", {}) if isinstance(out, dict) else {}
     merged = dict(la_data)
+    # fields parsed from the ZIMAS panels are authoritative; the patch only fills the gaps
+    known = set((la_data.get("facts") or {}).get("known_fields") or [])
     if "zoning" in patch:
-        merged.setdefault("zoning", {})
+        merged["zoning"] = dict(merged.get("zoning") or {})
         for k, v in (patch["zoning"] or {}).items():
-            merged["zoning"][k] = v or merged["zoning"].get(k)
-    if "overlays" in patch and patch["overlays"]:
+            if k not in known:
+                merged["zoning"][k] = v or merged["zoning"].get(k)
+    if "overlays" in patch and patch["overlays"] and "overlays" not in known:
         merged["overlays"] = sorted(set((merged.get("overlays") or []) + patch["overlays"]))
-    if "permits" in patch and patch["permits"]:
+    if "permits" in patch and patch["permits"] and "permits" not in known:
         merged["permits"] = (merged.get("permits") or []) + patch["permits"]
     if "notes" in patch and patch["notes"]:
         merged["notes"] = ((merged.get("notes") or "") + "\n" + patch["notes"]).strip()
     merged["sources"] = (merged.get("sources") or []) + (out.get("sources") or [])
     return merged
 
+def extract_merge(address: str, la_data: Dict, search_notes: List[Dict], use_cache: bool = True,
+                  usage: Optional[List[Dict[str, Any]]] = None) -> Dict:
+    """Sync wrapper around extract_merge_async."""
+    return run_sync(extract_merge_async(address, la_data, search_notes, use_cache=use_cache, usage=usage))
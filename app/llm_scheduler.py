@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+"""
+Retry / fallback scheduling for chat-completion calls.
+
+Every LLM request goes through send_llm(): the configured model is tried first, then
+`fallback_models` in order. A 429 puts the model in cooldown for its Retry-After (or a jittered
+exponential backoff when the header is missing) and the call moves on to the next model; 5xx and
+transport errors do the same with backoff only. Other 4xx (bad request, 413, auth) are returned to
+the caller as-is, since another model would fail the same way.
+
+Each model also has a client-side tokens-per-minute budget (`integrations.llm.tpm_limits`): a call
+whose estimated tokens do not fit into the last 60 s window is routed to a model that has room,
+or waits for the window to open, so we do not spend a round trip to learn we are over the limit.
+"""
+import asyncio
+import email.utils
+import random
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import httpx
+from loguru import logger
+
+from app.http_clients import get_async_client
+from app.metrics import LLM_FALLBACKS, LLM_RETRIES
+from app.prompt_budget import count_message_tokens
+from app.settings import LLMSettings, get_settings
+
+TPM_WINDOW_SEC = 60.0
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "h": 3600.0, "m": 60.0, "s": 1.0}
+
+
+class LLMUnavailable(RuntimeError):
+    """Every candidate model was rate limited or failing for the whole retry budget."""
+
+
+class _ModelState:
+    def __init__(self) -> None:
+        self.window: Deque[List[float]] = deque()  # [timestamp, tokens] within the TPM window
+        self.cooldown_until = 0.0
+        self.calls = 0
+        self.served = 0
+        self.rate_limited = 0
+        self.server_errors = 0
+        self.transport_errors = 0
+        self.tokens = 0
+
+    def used(self, now: float) -> int:
+        while self.window and now - self.window[0][0] >= TPM_WINDOW_SEC:
+            self.window.popleft()
+        return int(sum(t for _, t in self.window))
+
+    def wait_for(self, tokens: int, limit: Optional[int], now: float) -> float:
+        """Seconds until `tokens` fit in this model's budget (0 if they fit now)."""
+        wait = max(0.0, self.cooldown_until - now)
+        if not limit:
+            return wait
+        used = self.used(now)
+        if used + tokens <= limit:
+            return wait
+        # the window frees up as old calls age out; a call larger than the whole budget waits for an empty window
+        freed = used
+        for ts, t in self.window:
+            freed -= t
+            if freed + tokens <= limit:
+                return max(wait, ts + TPM_WINDOW_SEC - now)
+        return max(wait, TPM_WINDOW_SEC)
+
+
+_lock = threading.Lock()
+_models: Dict[str, _ModelState] = {}
+_totals = {"calls": 0, "retries": 0, "fallbacks": 0, "failed": 0, "budget_waits": 0}
+
+
+def _state(model: str) -> _ModelState:
+    return _models.setdefault(model, _ModelState())
+
+
+def estimate_tokens(payload: Dict[str, Any]) -> int:
+    """Prompt tokens (same counter the prompt packer uses) plus the requested max_tokens."""
+    return count_message_tokens(payload.get("messages") or []) + int(payload.get("max_tokens") or 0)
+
+
+def candidate_models(llm_cfg: LLMSettings) -> List[str]:
+    seen: List[str] = []
+    for m in [llm_cfg.model, *llm_cfg.fallback_models]:
+        if m and m not in seen:
+            seen.append(m)
+    return seen
+
+
+def retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    """Parses Retry-After as delta-seconds or an HTTP date; also understands Groq/OpenAI reset headers."""
+    value = response.headers.get("retry-after")
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                when = email.utils.parsedate_to_datetime(value)
+                return max(0.0, when.timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    reset = response.headers.get("x-ratelimit-reset-tokens") or response.headers.get("x-ratelimit-reset-requests")
+    if reset:
+        # Go-style durations, e.g. "7.66s", "2m59.56s", "120ms"
+        parts = _DURATION_PART.findall(reset)
+        if parts and "".join(n + u for n, u in parts) == reset.strip():
+            return sum(float(n) * _DURATION_UNITS[u] for n, u in parts)
+    return None
+
+
+def backoff_delay(attempt: int, llm_cfg: LLMSettings) -> float:
+    """Full-jitter exponential backoff: uniform(0, min(max, base * 2**attempt))."""
+    return random.uniform(0, min(llm_cfg.backoff_max_sec, llm_cfg.backoff_base_sec * (2 ** attempt)))
+
+
+def _pick_model(models: List[str], tokens: int, llm_cfg: LLMSettings) -> Tuple[str, float]:
+    """First model that can take the call now, else the one that frees up soonest."""
+    now = time.time()
+    with _lock:
+        waits = [(m, _state(m).wait_for(tokens, llm_cfg.tpm_limits.get(m), now)) for m in models]
+    for m, w in waits:
+        if w <= 0:
+            return m, 0.0
+    return min(waits, key=lambda mw: mw[1])
+
+
+def _reserve(model: str, tokens: int) -> List[float]:
+    entry = [time.time(), tokens]
+    with _lock:
+        st = _state(model)
+        st.window.append(entry)
+        st.calls += 1
+    return entry
+
+
+def _settle(model: str, reservation: List[float], response: Optional[httpx.Response]) -> None:
+    """Replaces the reserved estimate with the provider-reported usage when the body has it."""
+    actual = None
+    if response is not None:
+        try:
+            actual = int((response.json().get("usage") or {}).get("total_tokens") or 0) or None
+        except (ValueError, AttributeError):
+            actual = None
+    with _lock:
+        st = _state(model)
+        st.served += 1
+        if actual is not None:
+            reservation[1] = actual
+        st.tokens += int(reservation[1])
+
+
+def _release(model: str, reservation: List[float]) -> None:
+    """A rejected request (429/5xx/other non-200, transport error) does not count against the budget."""
+    with _lock:
+        try:
+            _state(model).window.remove(reservation)
+        except ValueError:
+            pass
+
+
+def _cool_down(model: str, seconds: float) -> None:
+    with _lock:
+        st = _state(model)
+        st.cooldown_until = max(st.cooldown_until, time.time() + seconds)
+
+
+async def send_llm(payload: Dict[str, Any], timeout: httpx.Timeout, headers: Dict[str, str],
+                   stage: str = "llm", stream: bool = False) -> Tuple[httpx.Response, str]:
+    """
+    POSTs `payload` to the configured chat-completions endpoint with model fallback and retries.
+    Returns (response, model) for the first non-retryable response; with stream=True the response
+    body is not read and the caller must aclose() it. Raises LLMUnavailable when the attempts run out.
+    """
+    llm_cfg = get_settings().integrations.llm
+    client = get_async_client("llm")
+    models = candidate_models(llm_cfg)
+    tokens = estimate_tokens(payload)
+    last_error = "no attempt made"
+    with _lock:
+        _totals["calls"] += 1
+
+    for attempt in range(llm_cfg.max_attempts):
+        model, wait = _pick_model(models, tokens, llm_cfg)
+        if wait > 0:
+            if wait > llm_cfg.max_wait_sec:
+                last_error = f"all models busy for {wait:.1f}s"
+                break
+            logger.info(f"[LLM-SCHED] {stage}: waiting {wait:.1f}s for model={model} budget/cooldown")
+            with _lock:
+                _totals["budget_waits"] += 1
+            await asyncio.sleep(wait)
+        if attempt:
+            with _lock:
+                _totals["retries"] += 1
+        if model != models[0]:
+            with _lock:
+                _totals["fallbacks"] += 1
+
+        reservation = _reserve(model, tokens)
+        request = client.build_request("POST", llm_cfg.base_url, json={**payload, "model": model},
+                                       headers=headers, timeout=timeout)
+        try:
+            r = await client.send(request, stream=stream)
+        except httpx.TransportError as e:
+            with _lock:
+                _state(model).transport_errors += 1
+            LLM_RETRIES.labels(model, "transport").inc()
+            _release(model, reservation)
+            delay = backoff_delay(attempt, llm_cfg)
+            _cool_down(model, delay)
+            last_error = f"{model}: {type(e).__name__}: {e}"
+            logger.warning(f"[LLM-SCHED] {stage}: {last_error}; cooling {delay:.1f}s")
+            continue
+
+        if r.status_code == 429 or r.status_code >= 500:
+            if stream:
+                await r.aread()
+                await r.aclose()
+            _release(model, reservation)
+            delay = backoff_delay(attempt, llm_cfg)
+            with _lock:
+                st = _state(model)
+                if r.status_code == 429:
+                    st.rate_limited += 1
+                else:
+                    st.server_errors += 1
+            LLM_RETRIES.labels(model, "429" if r.status_code == 429 else "5xx").inc()
+            retry_after = retry_after_seconds(r) if r.status_code == 429 else None
+            if retry_after is not None:
+                delay = retry_after
+            _cool_down(model, delay)
+            last_error = f"{model}: HTTP {r.status_code}"
+            logger.warning(f"[LLM-SCHED] {stage}: {last_error} body={r.text[:300]}; cooling {delay:.1f}s")
+            continue
+
+        if r.status_code == 200:
+            _settle(model, reservation, None if stream else r)
+        else:
+            _release(model, reservation)   # rejected (400/401/404...): the provider counted nothing
+        if model != models[0]:
+            LLM_FALLBACKS.labels(model).inc()
+            logger.info(f"[LLM-SCHED] {stage}: served by fallback model={model}")
+        return r, model
+
+    with _lock:
+        _totals["failed"] += 1
+    raise LLMUnavailable(f"{stage}: no model available after {llm_cfg.max_attempts} attempts ({last_error})")
+
+
+def llm_scheduler_stats() -> Dict[str, Any]:
+    now = time.time()
+    limits = get_settings().integrations.llm.tpm_limits
+    with _lock:
+        return {
+            **_totals,
+            "models": {
+                name: {
+                    "calls": st.calls,
+                    "served": st.served,
+                    "rate_limited": st.rate_limited,
+                    "server_errors": st.server_errors,
+                    "transport_errors": st.transport_errors,
+                    "tokens": st.tokens,
+                    "tokens_last_min": st.used(now),
+                    "tpm_limit": limits.get(name),
+                    "cooldown_sec": round(max(0.0, st.cooldown_until - now), 2),
+                }
+                for name, st in _models.items()
+            },
+        }
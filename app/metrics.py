@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+Prometheus instrumentation, exposed by the API on GET /metrics.
+
+Histograms cover graph nodes, the end-to-end workflow, outbound HTTP (per shared client, time to
+response headers) and browser actions; counters cover node and HTTP errors, LLM retries/fallbacks,
+cache hits/misses, coalesced duplicate calls, loop stop decisions and analyses without LLM calls,
+background job outcomes and provider-reported LLM token usage.
+
+Everything is registered on the default registry of this process. With several uvicorn workers,
+scrape each one, or set up prometheus_client's multiprocess mode.
+"""
+import asyncio
+import functools
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+# seconds; ZIMAS scrapes and LLM reports sit in the 5-60 s range
+_SLOW_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 45, 60, 90, 120, 180)
+_FAST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+NODE_LATENCY = Histogram(
+    "property_graph_node_seconds", "Latency of one LangGraph node run", ["node"], buckets=_SLOW_BUCKETS,
+)
+NODE_ERRORS = Counter(
+    "property_graph_node_errors_total", "Node runs that raised or reported an error", ["node"],
+)
+WORKFLOW_LATENCY = Histogram(
+    "property_workflow_seconds", "End-to-end latency of one property analysis", ["mode"], buckets=_SLOW_BUCKETS,
+)
+HTTP_LATENCY = Histogram(
+    "property_http_request_seconds", "Outbound HTTP latency to response headers",
+    ["client", "status"], buckets=_FAST_BUCKETS,
+)
+HTTP_ERRORS = Counter(
+    "property_http_errors_total", "Outbound HTTP requests that failed without a response", ["client", "error"],
+)
+BROWSER_LATENCY = Histogram(
+    "property_browser_action_seconds", "Latency of Playwright actions on ZIMAS", ["action"], buckets=_SLOW_BUCKETS,
+)
+BROWSER_ERRORS = Counter(
+    "property_browser_action_errors_total", "Playwright actions that raised", ["action"],
+)
+BROWSER_PAGE_BYTES = Histogram(
+    "property_browser_page_bytes", "Bytes transferred (headers + encoded bodies) by one scrape page",
+    buckets=(50e3, 100e3, 250e3, 500e3, 1e6, 2.5e6, 5e6, 10e6, 25e6),
+)
+BROWSER_BLOCKED_REQUESTS = Counter(
+    "property_browser_blocked_requests_total", "Requests aborted by the lightweight page mode", ["resource_type"],
+)
+BROWSER_POOL_WAIT = Histogram(
+    "property_browser_pool_wait_seconds", "Time a scrape waited for a free browser slot", buckets=_FAST_BUCKETS,
+)
+LLM_RETRIES = Counter(
+    "property_llm_retries_total", "LLM attempts that were retried", ["model", "reason"],
+)
+LLM_FALLBACKS = Counter(
+    "property_llm_fallbacks_total", "LLM calls served by a fallback model", ["model"],
+)
+LLM_TOKENS = Counter(
+    "property_llm_tokens_total", "Provider-reported LLM token usage", ["stage", "model", "kind"],
+)
+CACHE_REQUESTS = Counter(
+    "property_cache_requests_total", "Cache lookups", ["cache", "result"],
+)
+ARTIFACT_REQUESTS = Counter(
+    "property_artifact_requests_total", "Graph nodes that reused a stored artefact or recomputed", ["stage", "result"],
+)
+SINGLEFLIGHT_CALLS = Counter(
+    "property_singleflight_calls_total", "Calls that ran the work (leader) or joined an identical in-flight call (follower)",
+    ["scope", "role"],
+)
+WORKFLOW_DECISIONS = Counter(
+    "property_workflow_decisions_total", "Analyses by the reason the plan/search/extract loop stopped", ["reason"],
+)
+WORKFLOW_LLM_AVOIDED = Counter(
+    "property_workflow_llm_avoided_total",
+    "Analyses that sent no LLM request in the plan/extract loop (plan_extract) or at all (all)", ["scope"],
+)
+JOB_RESULTS = Counter(
+    "property_jobs_total", "Background jobs that finished, by outcome", ["status"],
+)
+JOB_QUEUE_WAIT = Histogram(
+    "property_job_queue_wait_seconds", "Time a background job waited for a worker", buckets=_SLOW_BUCKETS,
+)
+BROWSER_POOL_BUSY = Gauge("property_browser_pool_busy", "Browser slots running a scrape")
+BROWSER_POOL_QUEUED = Gauge("property_browser_pool_queued", "Scrapes waiting for a browser slot")
+
+
+def _node_failed(result: Any) -> bool:
+    # nodes catch their own exceptions and report them in `errors`
+    return isinstance(result, dict) and bool(result.get("errors"))
+
+
+def instrument_node(name: str, fn: Callable) -> Callable:
+    """Wraps a graph node (sync or async) with latency and error metrics."""
+    if asyncio.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+            t0 = time.perf_counter()
+            try:
+                result = await fn(*args, **kwargs)
+            except Exception:
+                NODE_ERRORS.labels(name).inc()
+                raise
+            finally:
+                NODE_LATENCY.labels(name).observe(time.perf_counter() - t0)
+            if _node_failed(result):
+                NODE_ERRORS.labels(name).inc()
+            return result
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        t0 = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            NODE_ERRORS.labels(name).inc()
+            raise
+        finally:
+            NODE_LATENCY.labels(name).observe(time.perf_counter() - t0)
+        if _node_failed(result):
+            NODE_ERRORS.labels(name).inc()
+        return result
+    return wrapper
+
+
+@contextmanager
+def browser_action(action: str) -> Iterator[None]:
+    t0 = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        BROWSER_ERRORS.labels(action).inc()
+        raise
+    finally:
+        BROWSER_LATENCY.labels(action).observe(time.perf_counter() - t0)
+
+
+def render_metrics() -> tuple:
+    """(body, content_type) for the /metrics endpoint."""
+    return generate_latest(), CONTENT_TYPE_LATEST
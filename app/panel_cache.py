@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+Parcel-level cache of scraped ZIMAS panels.
+
+Entries are keyed by the normalized address (agents_graph.build_address) and store the `panels` dict
+with the fetch time of each panel. Each panel has its own TTL (cache.panels.panel_ttl_sec, falling
+back to ttl_sec): a lookup serves the panels that are still fresh and names the stale ones (past
+their TTL, or cached without text after a failed tab read), so the scraper only has to refresh
+those, and a later store merges the refreshed panels into the entry.
+"""
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+from app.cache import get_cache, make_key
+from app.settings import CacheSectionSettings, get_settings
+
+
+class CachedPanels(NamedTuple):
+    data: Dict[str, Any]          # scrape result; stale panels are None
+    ages: Dict[str, float]        # age in seconds of each cached non-empty panel
+    stale: List[str]              # panels past their TTL, empty or not cached at all
+
+
+def _key(address: str) -> str:
+    return make_key("zimas_panels", " ".join(address.lower().split()))
+
+
+def _panel_ttl(section: CacheSectionSettings, panel: str) -> float:
+    return float(section.panel_ttl_sec.get(panel, section.ttl_sec))
+
+
+def get_cached_panels(address: str, panel_names: Optional[Sequence[str]] = None) -> Optional[CachedPanels]:
+    """
+    The cached scrape result with per-panel ages; None when nothing fresh is cached. Panels of
+    `panel_names` (default: those of the entry) the entry has no text for count as stale.
+    """
+    cache = get_cache("panels")
+    if cache is None:
+        return None
+    section = get_settings().cache.section("panels")
+    hit = cache.get_with_age(_key(address))
+    if hit is None:
+        return None
+    entry, entry_age = hit
+    now = time.time()
+    fetched = entry.get("panel_fetched_at") or {}
+    panels = dict(entry.get("panels") or {})
+    ages: Dict[str, float] = {}
+    stale: List[str] = []
+    for name in list(panels) + [n for n in panel_names or () if n not in panels]:
+        if not panels.get(name):
+            stale.append(name)
+            panels[name] = None
+            continue
+        ages[name] = now - fetched[name] if name in fetched else entry_age
+        if ages[name] > _panel_ttl(section, name):
+            stale.append(name)
+            panels[name] = None
+    if len(stale) == len(panels):
+        return None
+    return CachedPanels({**entry, "panels": panels}, ages, stale)
+
+
+def store_panels(address: str, data: Dict[str, Any]) -> None:
+    """
+    Caches a scrape result, merged over the cached entry: panels with text replace the cached ones
+    and restart their TTL, the others keep what was cached. A scrape without any panel text is not stored.
+    """
+    panels = {k: v for k, v in (data.get("panels") or {}).items() if v}
+    if not panels:
+        return
+    cache = get_cache("panels")
+    if cache is None:
+        return
+    section = get_settings().cache.section("panels")
+    now = time.time()
+    key = _key(address)
+    hit = cache.get_with_age(key)
+    entry, entry_age = hit if hit is not None else ({}, 0.0)
+    cached = entry.get("panels") or {}
+    merged = {name: v or cached.get(name) for name, v in {**cached, **(data.get("panels") or {})}.items()}
+    fetched = {name: now - entry_age for name, v in cached.items() if v}   # entries from before per-panel times
+    fetched.update(entry.get("panel_fetched_at") or {})
+    fetched.update({name: now for name in panels})
+    ttl = max([_panel_ttl(section, name) for name in merged] or [section.ttl_sec])
+    cache.set(key, {**entry, **data, "panels": merged, "panel_fetched_at": fetched, "fetched_at": now}, ttl_sec=ttl)
+
+
+def format_age(seconds: float) -> str:
+    seconds = int(max(0, seconds))
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m"
+    if seconds < 86400:
+        return f"{seconds // 3600}h {(seconds % 3600) // 60}m"
+    return f"{seconds // 86400}d {(seconds % 86400) // 3600}h"
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+"""
+Deterministic parser for ZIMAS panel text.
+
+The scraper flattens each panel to one "Label: Value" line per table row (see
+app/html_text.py). parse_panels() reads those lines into a typed ParcelFacts, and
+parcel_fields() derives from it the fields of the extractor's patch schema (zoning base_zone /
+height_limit / far, overlays), so facts ZIMAS states outright never go through the LLM. Planning
+case numbers stay in ParcelFacts.case_numbers: they are not the LADBS permits the extractor looks for.
+
+Labels are matched by prefix because some ZIMAS labels contain ": " themselves
+("CPIO: Community Plan Imp. Overlay"). Panels read in the per-tab mode arrive as one
+whitespace-joined line; for those only the fields with a recognizable value shape are found.
+Values such as "None", "No" or an empty cell count as absent.
+"""
+import re
+from typing import Any, Dict, List, Optional, Pattern, Tuple
+
+from pydantic import BaseModel, Field
+
+ABSENT = {"", "none", "no", "n/a", "not available", "not eligible"}
+
+# field -> (label prefix, value shape for flattened text)
+_LABELS: Dict[str, Tuple[str, str]] = {
+    "apn": (r"Assessor Parcel No\. \(APN\)", r"\d{10}"),
+    "lot_area_sqft": (r"Lot/Parcel Area \(Calculated\)", r"[\d,]+(?:\.\d+)?"),
+    "zoning": (r"Zoning(?! Information)", r"[\[(]?[A-Z0-9][\w\[\]().\-/]*"),
+    "zoning_information": (r"Zoning Information \(ZI\)", ""),
+    "general_plan_land_use": (r"General Plan Land Use", ""),
+    "specific_plan": (r"Specific Plan Area", ""),
+    "cpio": (r"CPIO: Community Plan Imp\. Overlay", ""),
+    "cdo": (r"CDO: Community Design Overlay", ""),
+    "hpoz": (r"HPOZ|Historic Preservation Overlay Zone", ""),
+    "nso": (r"NSO: Neighborhood Stabilization Overlay", ""),
+    "hcr": (r"HCR: Hillside Construction Regulation", ""),
+    "rio": (r"RIO: River Implementation Overlay", ""),
+    "pod": (r"POD: Pedestrian Oriented Districts", ""),
+    "sign_district": (r"SN: Sign District", ""),
+    "rfa": (r"RFA: Residential Floor Area District", ""),
+    "hillside": (r"Hillside Area \(Zoning Code\)", r"Yes|No"),
+    "toc": (r"Transit Oriented Communities \(TOC\)", r"Tier \d"),
+    "rso": (r"Rent Stabilization Ordinance \(RSO\)", r"Yes|No"),
+    "year_built": (r"Year Built", r"\d{4}"),
+    "units": (r"Number of Units", r"\d+"),
+}
+_LINE_RX: Dict[str, Pattern[str]] = {f: re.compile(rf"^{label}:\s*(.*)$", re.I) for f, (label, _) in _LABELS.items()}
+_FLAT_RX: Dict[str, Pattern[str]] = {
+    f: re.compile(rf"{label}:?\s+({shape})\b", re.I) for f, (label, shape) in _LABELS.items() if shape
+}
+_ZI_ID_RX = re.compile(r"\bZI-\d{3,5}\b")
+_ZI_RX = re.compile(r"\bZI-\d{3,5}\b(?:\s+[^\n]+)?")
+_CASE_RX = re.compile(r"\b[A-Z]{2,5}-\d{4}-\d+(?:-[A-Z0-9]+)*\b")
+_ZONE_PREFIX_RX = re.compile(r"^(?:\[[A-Z]+\]|\([A-Z]+\))+")
+_HEIGHT_DISTRICT_RX = re.compile(r"^(\d)(SS|XL|VL|L)?(D)?$")
+# zone letters, then digits (a number class "R1", "A2", "RW1", or a lot size/density "RE11", "RAS3", "C1.5")
+_ZONE_CLASS_RX = re.compile(r"^([A-Z]+)(\d+(?:\.\d+)?)?")
+_NUMBERED_ZONE_CLASSES = ("A", "R", "RW")
+
+# LAMC 12.21.1: height limit and FAR of each height district; a "D" suffix replaces both with the
+# limits of its ordinance, and in the 1L / 1VL / 1XL districts commercial and industrial zones get 1.5:1
+HEIGHT_DISTRICTS: Dict[str, Tuple[Optional[str], str]] = {
+    "1": (None, "3:1"),
+    "1L": ("75 ft / 6 stories", "3:1"),
+    "1VL": ("45 ft / 3 stories", "3:1"),
+    "1XL": ("30 ft / 2 stories", "3:1"),
+    "2": ("no height district limit", "6:1"),
+    "3": ("no height district limit", "10:1"),
+    "4": ("no height district limit", "13:1"),
+}
+# overlay rows of the Planning and Zoning panel; the overlay list is only complete once one was read
+OVERLAY_FIELDS = ("specific_plan", "cpio", "cdo", "hpoz", "nso", "hcr", "rio", "pod", "sign_district", "rfa",
+                  "hillside", "toc")
+# zone classes (see zone_class) whose floor area is set by the residential floor area rules, not the height district
+SINGLE_FAMILY_ZONES = ("A1", "A2", "RA", "RE", "RS", "R1", "RU", "RZ", "RW1", "RMP", "OS")
+COMMERCIAL_ZONES = ("C", "M", "CM", "CR", "CW", "MR", "LAX", "PF")
+
+
+class CaseNumber(BaseModel):
+    id: str
+    action: Optional[str] = None
+    description: Optional[str] = None
+    year: Optional[int] = None
+
+
+class ParcelFacts(BaseModel):
+    apn: Optional[str] = None
+    lot_area_sqft: Optional[float] = None
+    zoning: Optional[str] = None              # full ZIMAS zone string, e.g. "[Q]C2-1VL-CPIO"
+    base_zone: Optional[str] = None           # "C2"
+    height_district: Optional[str] = None     # "1VL"
+    supplemental_districts: List[str] = Field(default_factory=list)   # "CPIO", "O", ...
+    general_plan_land_use: Optional[str] = None
+    specific_plans: List[str] = Field(default_factory=list)
+    zoning_information: List[str] = Field(default_factory=list)       # "ZI-2452 Transit Priority Area ..."
+    overlays: List[str] = Field(default_factory=list)
+    toc_tier: Optional[int] = None
+    hillside: Optional[bool] = None
+    rso: Optional[bool] = None
+    year_built: Optional[int] = None
+    units: Optional[int] = None
+    case_numbers: List[CaseNumber] = Field(default_factory=list)
+    known_fields: List[str] = Field(default_factory=list)            # patch-schema fields settled by ZIMAS
+
+
+def _value(raw: Optional[str]) -> Optional[str]:
+    v = " ".join((raw or "").split()).strip(" :")
+    return None if v.lower() in ABSENT else v
+
+
+def _yes_no(raw: Optional[str]) -> Optional[bool]:
+    if raw is None:
+        return None
+    word = raw.strip().split(" ")[0].lower() if raw.strip() else ""
+    return True if word == "yes" else False if word in ("no", "none") else None
+
+
+def _number(raw: Optional[str]) -> Optional[float]:
+    m = re.search(r"\d[\d,]*(?:\.\d+)?", raw or "")
+    return float(m.group(0).replace(",", "")) if m else None
+
+
+def _fields(text: str) -> Dict[str, str]:
+    """Raw label values of one panel; the first occurrence of a label wins."""
+    out: Dict[str, str] = {}
+    lines = [ln.strip() for ln in (text or "").splitlines() if ln.strip()]
+    if len(lines) > 1:
+        for ln in lines:
+            for f, rx in _LINE_RX.items():
+                m = rx.match(ln)
+                if m and f not in out:
+                    out[f] = m.group(1)
+                    break
+        return out
+    for f, rx in _FLAT_RX.items():
+        m = rx.search(text or "")
+        if m:
+            out[f] = m.group(1)
+    return out
+
+
+def _zi_items(text: str) -> List[str]:
+    """ZI items with their titles; only the numbers for flattened text, where the title runs on."""
+    lines = [ln for ln in (text or "").splitlines() if ln.strip()]
+    if len(lines) <= 1:
+        return list(dict.fromkeys(_ZI_ID_RX.findall(text or "")))
+    items: List[str] = []
+    for ln in lines:
+        for m in _ZI_RX.finditer(ln):
+            item = " ".join(m.group(0).split())
+            if item not in items:
+                items.append(item)
+    return items
+
+
+def _cases(text: str) -> List[CaseNumber]:
+    cases: List[CaseNumber] = []
+    for ln in (text or "").splitlines():
+        label, _, value = ln.partition(":")
+        label = label.strip().lower()
+        if label == "case number" or not cases:
+            for cid in _CASE_RX.findall(ln):
+                if all(c.id != cid for c in cases):
+                    year = re.search(r"-(\d{4})-", cid)
+                    cases.append(CaseNumber(id=cid, year=int(year.group(1)) if year else None))
+        elif label.startswith("required action"):
+            cases[-1].action = cases[-1].action or _value(value)
+        elif label.startswith("project description"):
+            cases[-1].description = cases[-1].description or _value(value)
+    return cases
+
+
+def split_zone(zoning: str) -> Tuple[Optional[str], Optional[str], List[str]]:
+    """Base zone, height district and supplemental districts: "[Q]C2-1VL-CPIO" -> ("C2", "1VL", ["CPIO"])."""
+    parts = _ZONE_PREFIX_RX.sub("", zoning.strip()).split("-")
+    base = parts[0] or None
+    height: Optional[str] = None
+    rest = parts[1:]
+    if rest and _HEIGHT_DISTRICT_RX.match(rest[0]):
+        height, rest = rest[0], rest[1:]
+    return base, height, [p for p in rest if p]
+
+
+def zone_class(base_zone: Optional[str]) -> Optional[str]:
+    """Zone class of a base zone: "R1V2" -> "R1", "RE11" -> "RE", "RAS3" -> "RAS", "C1.5" -> "C"."""
+    m = _ZONE_CLASS_RX.match((base_zone or "").strip().upper())
+    if not m:
+        return None
+    letters, digits = m.group(1), m.group(2)
+    return letters + digits if digits and letters in _NUMBERED_ZONE_CLASSES else letters
+
+
+def height_district_limits(base_zone: Optional[str], height_district: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """(height_limit, far) implied by the height district, or None where the zone or a D limitation decides."""
+    m = _HEIGHT_DISTRICT_RX.match(height_district or "")
+    if not m or m.group(3):
+        return None, None
+    height, far = HEIGHT_DISTRICTS.get(m.group(1) + (m.group(2) or ""), (None, None))
+    zone = zone_class(base_zone)
+    if zone in SINGLE_FAMILY_ZONES:
+        far = None
+    elif m.group(2) and zone in COMMERCIAL_ZONES:
+        far = "1.5:1"
+    return height, far
+
+
+def parse_panels(panels: Dict[str, Optional[str]]) -> ParcelFacts:
+    """Typed facts from the scraped panels (keys as in scraper._empty_panels)."""
+    panels = {k: v for k, v in (panels or {}).items() if v}
+    raw: Dict[str, str] = {}
+    for name in ("Planning and Zoning", "Address / Legal", "Assessor", "Housing"):
+        for f, v in _fields(panels.get(name, "")).items():
+            raw.setdefault(f, v)
+
+    facts = ParcelFacts(
+        apn=_value(raw.get("apn")),
+        lot_area_sqft=_number(raw.get("lot_area_sqft")),
+        general_plan_land_use=_value(raw.get("general_plan_land_use")),
+        hillside=_yes_no(raw.get("hillside")),
+        rso=_yes_no(raw.get("rso")),
+    )
+    zoning = _value(raw.get("zoning"))
+    if zoning:
+        facts.zoning = zoning.split(" ")[0]
+        facts.base_zone, facts.height_district, facts.supplemental_districts = split_zone(facts.zoning)
+    if _value(raw.get("specific_plan")):
+        facts.specific_plans = [_value(raw["specific_plan"])]
+    toc = re.search(r"Tier (\d)", raw.get("toc") or "", re.I)
+    facts.toc_tier = int(toc.group(1)) if toc else None
+    year, units = _number(raw.get("year_built")), _number(raw.get("units"))
+    facts.year_built = int(year) if year else None
+    facts.units = int(units) if units is not None else None
+    facts.zoning_information = _zi_items(panels.get("Planning and Zoning", ""))
+    facts.case_numbers = _cases(panels.get("Case Numbers", ""))
+
+    overlays = [f"Specific Plan: {p}" for p in facts.specific_plans]
+    for f, name in (("cpio", "CPIO"), ("cdo", "CDO"), ("hpoz", "HPOZ"), ("nso", "NSO"), ("hcr", "HCR"),
+                    ("rio", "RIO"), ("pod", "POD"), ("sign_district", "Sign District"), ("rfa", "RFA")):
+        v = _value(raw.get(f))
+        if v:
+            overlays.append(name if v.lower() == "yes" else f"{name}: {v}")
+    if facts.hillside:
+        overlays.append("Hillside Area")
+    if facts.toc_tier:
+        overlays.append(f"TOC Tier {facts.toc_tier}")
+    overlays += [d for d in facts.supplemental_districts if all(not o.startswith(d) for o in overlays)]
+    overlays += facts.zoning_information
+    facts.overlays = overlays
+
+    known = []
+    if facts.base_zone:
+        known.append("base_zone")
+    height, far = height_district_limits(facts.base_zone, facts.height_district)
+    if height:
+        known.append("height_limit")
+    if far:
+        known.append("far")
+    # an empty overlay list is an answer only once the ZI row and the overlay rows were recognized;
+    # planning cases are not building permits, so "permits" is never settled here
+    if "zoning_information" in raw and any(f in raw for f in OVERLAY_FIELDS):
+        known.append("overlays")
+    facts.known_fields = known
+    return facts
+
+
+def parcel_fields(facts: ParcelFacts) -> Dict[str, Any]:
+    """The known facts in the extractor's patch shape: zoning and overlays."""
+    height, far = height_district_limits(facts.base_zone, facts.height_district)
+    zoning = {"base_zone": facts.base_zone, "height_limit": height, "far": far}
+    out: Dict[str, Any] = {"zoning": {k: v for k, v in zoning.items() if v}}
+    if facts.height_district:
+        out["zoning"]["height_district"] = facts.height_district
+    if facts.overlays:
+        out["overlays"] = list(facts.overlays)
+    return out
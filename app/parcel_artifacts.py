@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+Per-parcel intermediate artefacts for incremental re-analysis.
+
+For each address the `artifacts` cache keeps, per workflow stage (plan, search, extract, report),
+the last few outputs together with the content hash of the inputs that produced them. A node
+hashes its inputs before doing any work; when the hash matches a stored artefact (and, for search
+notes, the artefact is younger than the search cache TTL) the stored output is used and the node
+makes no LLM or Tavily call. Inputs that changed simply miss and the node runs as usual.
+
+Extract artefacts also record the hash of the ZIMAS panels they were built from, so a follow-up
+run with user questions can start from the merged facts of the last planner run on the same
+panels (see latest_base_extract).
+"""
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from loguru import logger
+
+from app.cache import get_cache, make_key
+from app.metrics import ARTIFACT_REQUESTS
+from app.settings import get_settings
+
+MAX_ENTRIES_PER_STAGE = 4
+
+_lock = threading.Lock()
+
+
+def content_hash(*parts: Any) -> str:
+    return make_key("artifact", *parts)
+
+
+def panels_hash(la_data: Dict[str, Any]) -> str:
+    return content_hash((la_data or {}).get("panels") or {})
+
+
+def _key(address: str) -> str:
+    return make_key("parcel_artifacts", " ".join(address.lower().split()))
+
+
+def get_artifact(address: str, stage: str, input_hash: str, max_age_sec: Optional[float] = None) -> Optional[Any]:
+    """Stored output of `stage` for exactly these inputs, or None."""
+    cache = get_cache("artifacts")
+    if cache is None:
+        return None
+    record = cache.get(_key(address)) or {}
+    now = time.time()
+    for entry in record.get(stage) or []:
+        if entry["hash"] == input_hash and (max_age_sec is None or now - entry["at"] <= max_age_sec):
+            ARTIFACT_REQUESTS.labels(stage, "reused").inc()
+            logger.info(f"[ARTIFACT] {stage}: inputs unchanged, reusing output for {address}")
+            return entry["output"]
+    ARTIFACT_REQUESTS.labels(stage, "recomputed").inc()
+    return None
+
+
+def latest_base_extract(address: str, panels: str) -> Optional[Dict[str, Any]]:
+    """Most recent extract output of a planner run (no user questions) over the same panels."""
+    cache = get_cache("artifacts")
+    if cache is None:
+        return None
+    record = cache.get(_key(address)) or {}
+    for entry in record.get("extract") or []:
+        meta = entry.get("meta") or {}
+        if meta.get("panels") == panels and not meta.get("user_queries"):
+            ARTIFACT_REQUESTS.labels("extract", "reused_base").inc()
+            return entry["output"]
+    return None
+
+
+def put_artifact(address: str, stage: str, input_hash: str, output: Any,
+                 meta: Optional[Dict[str, Any]] = None) -> None:
+    """Records a stage output; newest first, at most MAX_ENTRIES_PER_STAGE per stage."""
+    cache = get_cache("artifacts")
+    if cache is None:
+        return
+    key = _key(address)
+    entry = {"hash": input_hash, "output": output, "at": time.time(), "meta": meta or {}}
+    with _lock:
+        record = cache.get(key) or {}
+        kept = [e for e in record.get(stage) or [] if e["hash"] != input_hash]
+        record[stage] = [entry, *kept][:MAX_ENTRIES_PER_STAGE]
+        cache.set(key, record)
+
+
+def search_max_age_sec() -> float:
+    """Search-note artefacts are only as fresh as the search cache would allow."""
+    return get_settings().cache.section("search").ttl_sec
+
@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+"""
+Token-budgeted packing of ZIMAS panels and search notes into LLM prompts.
+
+Each call gets an input budget: the stage cap from `integrations.llm.prompt_budget` bounded by the
+smallest context window among the candidate models, minus the completion tokens and system prompt.
+Panels and notes are ranked by how much they say about the fields still missing from la_data,
+near-duplicate snippets are dropped, and the remaining budget is shared out water-filling style:
+short items are kept whole and the long ones are clipped to a common cap.
+
+Tokens are counted with tiktoken when it is installed and its encoding can be loaded; otherwise
+with a chars/token heuristic calibrated on ZIMAS panel text (which tokenizes denser than prose).
+"""
+import importlib.util
+import json
+import re
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from loguru import logger
+
+from app.settings import LLMSettings
+
+TIKTOKEN_AVAILABLE = importlib.util.find_spec("tiktoken") is not None
+CHARS_PER_TOKEN = 3.2
+MESSAGE_OVERHEAD_TOKENS = 4
+SAFETY_MARGIN_TOKENS = 64
+DEFAULT_CONTEXT_WINDOW = 8192
+MIN_ITEM_TOKENS = 40           # an item squeezed below this is dropped instead
+NEAR_DUPLICATE_JACCARD = 0.8
+
+# field -> words that show a panel/snippet talks about it
+FIELD_KEYWORDS: Dict[str, Tuple[str, ...]] = {
+    "base_zone": ("zone", "zoning", "r1", "r2", "r3", "r4", "r5", "rd", "c1", "c2", "c4", "cm", "m1", "m2", "[q]", "[t]"),
+    "height_limit": ("height district", "height", "stories", "feet"),
+    "far": ("floor area", "far", "ratio", "density"),
+    "overlays": ("overlay", "specific plan", "hpoz", "cpio", "toc", "transit", "hillside", "fault", "liquefaction",
+                 "fire hazard", "coastal", "community plan"),
+    "permits": ("permit", "ladbs", "certificate of occupancy", "case", "cpc-", "zi-", "env-", "adm-", "dir-"),
+}
+# panels that usually carry each field; a missing field lifts these first
+FIELD_PANELS: Dict[str, Tuple[str, ...]] = {
+    "base_zone": ("Planning and Zoning",),
+    "height_limit": ("Planning and Zoning",),
+    "far": ("Planning and Zoning", "Assessor"),
+    "overlays": ("Planning and Zoning", "Housing"),
+    "permits": ("Case Numbers", "Citywide / Code Amendment Cases"),
+}
+
+_encoder: Any = None
+_encoder_failed = False
+
+
+def _get_encoder() -> Any:
+    global _encoder, _encoder_failed
+    if _encoder is None and TIKTOKEN_AVAILABLE and not _encoder_failed:
+        try:
+            import tiktoken
+            _encoder = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:  # the encoding file is downloaded on first use
+            _encoder_failed = True
+            logger.info(f"[PROMPT] tiktoken unavailable ({e}); using {CHARS_PER_TOKEN} chars/token")
+    return _encoder
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    enc = _get_encoder()
+    if enc is not None:
+        return len(enc.encode(text, disallowed_special=()))
+    return int(len(text) / CHARS_PER_TOKEN) + 1
+
+
+def count_message_tokens(messages: Iterable[Dict[str, Any]]) -> int:
+    return sum(count_tokens(str(m.get("content") or "")) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+def clip_to_tokens(text: str, max_tokens: int) -> str:
+    """Whitespace-normalized `text` cut to about max_tokens, on a word boundary where possible."""
+    text = re.sub(r"\s+", " ", str(text or "")).strip()
+    if count_tokens(text) <= max_tokens:
+        return text
+    enc = _get_encoder()
+    if enc is not None:
+        cut = enc.decode(enc.encode(text, disallowed_special=())[:max(0, max_tokens - 1)])
+    else:
+        cut = text[:max(0, int((max_tokens - 1) * CHARS_PER_TOKEN))]
+    space = cut.rfind(" ")
+    if space > len(cut) * 0.8:
+        cut = cut[:space]
+    return cut.rstrip() + " …"
+
+
+# ---------- budget ----------
+def input_budget(stage: str, llm_cfg: LLMSettings, system_prompt: str, max_tokens: int) -> int:
+    """Tokens available for the user message of `stage` on every model that might serve it."""
+    models = [m for m in [llm_cfg.model, *llm_cfg.fallback_models] if m]
+    context = min(llm_cfg.context_windows.get(m, DEFAULT_CONTEXT_WINDOW) for m in models)
+    room = context - max_tokens - count_tokens(system_prompt) - MESSAGE_OVERHEAD_TOKENS * 2 - SAFETY_MARGIN_TOKENS
+    cap = llm_cfg.prompt_budget.get(stage)
+    return max(0, min(room, cap) if cap else room)
+
+
+# ---------- relevance ----------
+def missing_fields(la_data: Dict[str, Any]) -> List[str]:
+    """
+    Fields of the extractor's patch schema that la_data has no value for yet. Fields the panel
+    parser settled (la_data["facts"]["known_fields"]) are never missing, even when empty.
+    """
+    known = set(((la_data or {}).get("facts") or {}).get("known_fields") or [])
+    zoning = la_data.get("zoning") or {}
+    out = [f for f in ("base_zone", "height_limit", "far") if not zoning.get(f)]
+    if not la_data.get("overlays"):
+        out.append("overlays")
+    if not la_data.get("permits"):
+        out.append("permits")
+    return [f for f in out if f not in known]
+
+
+def _relevance(text: str, missing: List[str], panel: Optional[str] = None) -> float:
+    low = (text or "").lower()
+    score = 0.0
+    for field in missing:
+        hits = sum(1 for kw in FIELD_KEYWORDS.get(field, ()) if kw in low)
+        score += min(hits, 3)
+        if panel and panel in FIELD_PANELS.get(field, ()):
+            score += 3
+    return score
+
+
+def _shingles(text: str, n: int = 3) -> Set[Tuple[str, ...]]:
+    words = re.findall(r"\w+", (text or "").lower())
+    return {tuple(words[i:i + n]) for i in range(max(1, len(words) - n + 1))}
+
+
+def dedupe_near_duplicates(notes: List[Dict[str, Any]], threshold: float = NEAR_DUPLICATE_JACCARD) -> List[Dict[str, Any]]:
+    """Drops notes whose content shares >= threshold of its word 3-grams with an earlier note."""
+    kept: List[Dict[str, Any]] = []
+    seen: List[Set[Tuple[str, ...]]] = []
+    for n in notes:
+        sh = _shingles(n.get("content") or n.get("raw_text") or "")
+        if any(len(sh & s) / max(1, len(sh | s)) >= threshold for s in seen):
+            continue
+        kept.append(n)
+        seen.append(sh)
+    return kept
+
+
+# ---------- allocation ----------
+def _water_fill(sizes: List[int], budget: int) -> int:
+    """Largest per-item cap c with sum(min(size, c)) <= budget."""
+    budget = max(0, budget)
+    if sum(sizes) <= budget:
+        return max(sizes or [0])
+    lo, hi = 0, max(sizes)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if sum(min(s, mid) for s in sizes) <= budget:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _allocate(items: List[Tuple[str, str]], budget: int) -> Tuple[Dict[str, str], List[str]]:
+    """
+    items: (key, text) in priority order. Returns {key: packed text} and the dropped keys;
+    the lowest-priority items are dropped until every kept item gets at least MIN_ITEM_TOKENS.
+    """
+    items = [(k, re.sub(r"\s+", " ", str(t or "")).strip()) for k, t in items]
+    items = [(k, t) for k, t in items if t]
+    # JSON string quoting/escaping is part of what the model reads
+    sizes = [count_tokens(json.dumps(t, ensure_ascii=False)) for _, t in items]
+    keys = [count_tokens(json.dumps(k, ensure_ascii=False)) + 2 for k, _ in items]   # "key": , separators
+    dropped: List[str] = []
+    cap = _water_fill(sizes, budget - sum(keys))
+    while items and cap < min(MIN_ITEM_TOKENS, max(sizes)):
+        dropped.append(items.pop()[0])
+        sizes.pop()
+        keys.pop()
+        cap = _water_fill(sizes, budget - sum(keys))
+    # clip_to_tokens counts the raw text; leave room for the ellipsis and JSON escaping
+    return {k: (t if s <= cap else clip_to_tokens(t, max(1, cap - 3))) for (k, t), s in zip(items, sizes)}, dropped
+
+
+def pack_context(la_data: Dict[str, Any], search_notes: List[Dict[str, Any]], budget: int,
+                 max_notes: int = 6, note_share: float = 0.4, exclude: Iterable[str] = (),
+                 missing_panels_only: bool = False,
+                 ) -> Tuple[Dict[str, Any], List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Packs la_data (minus `exclude` keys) and search notes into `budget` tokens of JSON.
+    Returns (la_small, notes_small, usage), where usage lists the missing fields, kept/dropped
+    panels and notes, and the estimated tokens. Notes get at most `note_share` of the budget
+    when the panels need the room. With missing_panels_only, only the panels that carry a
+    missing field (FIELD_PANELS) are sent; the parsed facts already stand for the rest.
+    """
+    missing = missing_fields(la_data)
+    la_small: Dict[str, Any] = {}
+    for k, v in (la_data or {}).items():
+        if k in ("panels", "tavily_results", "facts") or k in exclude:
+            continue
+        if k == "notes":
+            v = clip_to_tokens(v, 300)
+        elif k in ("sources", "permits"):
+            v = list(v or [])[:10]
+        elif k == "zoning":
+            v = {zk: clip_to_tokens(zv, 60) if isinstance(zv, str) else zv for zk, zv in (v or {}).items()}
+        la_small[k] = v
+    fixed = count_tokens(json.dumps(la_small, ensure_ascii=False))
+    left = max(0, budget - fixed)
+
+    panels = {k: v for k, v in (la_data.get("panels") or {}).items() if v}
+    if missing_panels_only:
+        wanted = {p for f in missing for p in FIELD_PANELS.get(f, ())}
+        panels = {k: v for k, v in panels.items() if k in wanted}
+    panel_order = sorted(panels, key=lambda k: -_relevance(panels[k], missing, panel=k))
+
+    notes = dedupe_near_duplicates(sorted(search_notes or [], key=lambda n: n.get("score") or 0.0, reverse=True))
+    duplicates = len(search_notes or []) - len(notes)
+    notes = sorted(
+        notes,
+        key=lambda n: -(_relevance(f"{n.get('title') or ''} {n.get('content') or n.get('raw_text') or ''}", missing)
+                        + 2 * float(n.get("score") or 0.0)),
+    )[:max_notes]
+
+    panel_tokens = sum(count_tokens(json.dumps(panels[k], ensure_ascii=False)) for k in panel_order)
+    note_budget = left - min(panel_tokens, int(left * (1 - note_share))) if notes else 0
+    packed_notes, dropped_notes = _allocate(
+        [(str(i), n.get("content") or n.get("raw_text") or "") for i, n in enumerate(notes)],
+        # title/url/score of each note are fixed costs
+        max(0, note_budget - sum(count_tokens(json.dumps({"title": n.get("title") or "", "url": n.get("url") or ""}))
+                                 for n in notes)),
+    )
+    notes_small = [
+        {
+            "title": clip_to_tokens(n.get("title") or "", 60),
+            "url": n.get("url") or "",
+            "content": packed_notes[str(i)],
+            "score": n.get("score", 0.0),
+        }
+        for i, n in enumerate(notes) if str(i) in packed_notes
+    ]
+    notes_used = count_tokens(json.dumps(notes_small, ensure_ascii=False)) if notes_small else 0
+
+    packed_panels, dropped_panels = _allocate([(k, panels[k]) for k in panel_order], max(0, left - notes_used))
+    la_small["panels"] = {k: packed_panels[k] for k in panel_order if k in packed_panels}
+
+    usage = {
+        "budget": budget,
+        "missing_fields": missing,
+        "panels": list(la_small["panels"]),
+        "panels_dropped": dropped_panels,
+        "notes": len(notes_small),
+        "notes_dropped": len(dropped_notes),
+        "notes_duplicates": duplicates,
+        "estimated_tokens": count_tokens(json.dumps(la_small, ensure_ascii=False)) + notes_used,
+    }
+    return la_small, notes_small, usage
+
+
+# ---------- per-stage accounting ----------
+_stats_lock = threading.Lock()
+_stage_stats: Dict[str, Dict[str, Any]] = {}
+
+
+def record_prompt_usage(entry: Dict[str, Any]) -> None:
+    with _stats_lock:
+        st = _stage_stats.setdefault(entry["stage"], {
+            "calls": 0, "cached": 0, "estimated_tokens": 0, "max_estimated_tokens": 0,
+            "prompt_tokens": 0, "reported_calls": 0, "panels_dropped": 0, "notes_duplicates": 0,
+        })
+        st["calls"] += 1
+        st["cached"] += 1 if entry.get("cached") else 0
+        st["estimated_tokens"] += entry.get("estimated_tokens") or 0
+        st["max_estimated_tokens"] = max(st["max_estimated_tokens"], entry.get("estimated_tokens") or 0)
+        if entry.get("prompt_tokens"):
+            st["prompt_tokens"] += entry["prompt_tokens"]
+            st["reported_calls"] += 1
+        st["panels_dropped"] += len(entry.get("panels_dropped") or [])
+        st["notes_duplicates"] += entry.get("notes_duplicates") or 0
+
+
+def prompt_stats() -> Dict[str, Dict[str, Any]]:
+    with _stats_lock:
+        return {
+            stage: {
+                **st,
+                "avg_estimated_tokens": round(st["estimated_tokens"] / st["calls"], 1) if st["calls"] else 0.0,
+                "avg_prompt_tokens": round(st["prompt_tokens"] / st["reported_calls"], 1) if st["reported_calls"] else None,
+            }
+            for stage, st in _stage_stats.items()
+        }
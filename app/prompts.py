@@ -28,7 +28,8 @@ Be concise and practical. Use Hebrew if the UI language is Hebrew.
 # === Planner (figures out gaps -> queries) ===
 PLAN_QUERIES_SYSTEM_PROMPT = """
 You are a research planning agent. Given official LA planning data extracted for an ADDRESS,
-identify missing/uncertain fields and produce a compact list of web search queries to resolve them.
+produce a compact list of web search queries that resolve the fields in MISSING_FIELDS.
+Fields not listed there are already known from ZIMAS; do not query for them.
 Return ONLY JSON:
 {
   "queries": [string],            // up to 6 focused queries
@@ -41,6 +42,7 @@ Return ONLY JSON:
 EXTRACT_SYSTEM_PROMPT = """
 You are an extraction agent for Los Angeles planning data.
 Use the provided search snippets/pages to extract ONLY facts supported by official sources.
+Fill only the fields in MISSING_FIELDS; the others are already known from ZIMAS, leave them null/[].
 Return ONLY one JSON object:
 {
   "patch": {
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+Adaptive timeouts and per-scrape timing for the ZIMAS scraper.
+
+An AdaptiveTimeout learns from the latencies it is fed: until it has MIN_SAMPLES observations it
+uses its configured initial value, afterwards `multiplier` x the recent p95, clamped to
+[min_ms, max_ms]. A wait that timed out is fed back as its timeout, so a slowing ZIMAS pushes the
+limit up instead of failing repeatedly. One instance per kind of wait is shared by all pool threads.
+
+ScrapeTiming collects the phase durations of one scrape (also reported as browser action metrics).
+"""
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, Optional
+
+from app.metrics import browser_action
+
+MIN_SAMPLES = 5
+WINDOW = 50
+
+
+class AdaptiveTimeout:
+    def __init__(self, name: str, initial_ms: float, min_ms: float, max_ms: float, multiplier: float = 3.0) -> None:
+        self.name = name
+        self.initial_ms = initial_ms
+        self.min_ms = min_ms
+        self.max_ms = max_ms
+        self.multiplier = multiplier
+        self._samples: Deque[float] = deque(maxlen=WINDOW)
+        self._lock = threading.Lock()
+
+    def observe(self, ms: float) -> None:
+        with self._lock:
+            self._samples.append(ms)
+
+    def current_ms(self) -> float:
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < MIN_SAMPLES:
+            return self.initial_ms
+        p95 = samples[min(len(samples) - 1, int(0.95 * len(samples)))]
+        return max(self.min_ms, min(self.max_ms, p95 * self.multiplier))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            n = len(self._samples)
+        return {"samples": n, "timeout_ms": round(self.current_ms())}
+
+
+def _env_ms(name: str, default: float) -> float:
+    return float(os.getenv(name, str(default)))
+
+
+# address search -> #divLeftInformationBar rendered
+SEARCH_TIMEOUT = AdaptiveTimeout(
+    "search", _env_ms("ZIMAS_SEARCH_TIMEOUT_MS", 60000), min_ms=8000, max_ms=_env_ms("ZIMAS_SEARCH_TIMEOUT_MAX_MS", 90000),
+)
+# tab click -> its content row populated
+PANEL_TIMEOUT = AdaptiveTimeout(
+    "panel", _env_ms("ZIMAS_PANEL_TIMEOUT_MS", 15000), min_ms=1500, max_ms=_env_ms("ZIMAS_PANEL_TIMEOUT_MAX_MS", 60000),
+)
+# single pass: every expanded tab's row populated
+EXPAND_TIMEOUT = AdaptiveTimeout(
+    "expand", _env_ms("ZIMAS_EXPAND_TIMEOUT_MS", 10000), min_ms=1500, max_ms=_env_ms("ZIMAS_EXPAND_TIMEOUT_MAX_MS", 30000),
+)
+
+
+class ScrapeTiming:
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str, action: Optional[str] = None) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            with browser_action(action or name):
+                yield
+        finally:
+            self.phases[name] = round(time.perf_counter() - t0, 3)
+
+    def summary(self) -> Dict[str, Any]:
+        return {"total_sec": round(time.perf_counter() - self.started, 3), "phases": dict(self.phases)}
+
+
+def timeout_stats() -> Dict[str, Dict[str, Any]]:
+    return {t.name: t.stats() for t in (SEARCH_TIMEOUT, PANEL_TIMEOUT, EXPAND_TIMEOUT)}
@@ -1,13 +1,19 @@
 # -*- coding: utf-8 -*-
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from loguru import logger
 from langsmith import traceable
 
-from playwright.sync_api import sync_playwright, Page, Locator
+from playwright.sync_api import sync_playwright, Page, Locator, TimeoutError as PlaywrightTimeoutError
 from bs4 import BeautifulSoup
+import functools
 import re
 import os
 import time
+import asyncio
+
+from app.html_text import html_to_text, norm_text as _norm
+from app.browser_pool import PageTraffic, context_options, get_browser_pool
+from app.scrape_timing import EXPAND_TIMEOUT, PANEL_TIMEOUT, SEARCH_TIMEOUT, ScrapeTiming
 
 OFFICIAL_SOURCES = [
     "https://planning.lacity.gov",
@@ -15,10 +21,17 @@ OFFICIAL_SOURCES = [
     "https://www.ladbs.org",
 ]
 
+ZIMAS_URL = os.getenv("ZIMAS_URL", "https://zimas.lacity.org/")  # the offline benchmark points this at a stand-in
+
 # --- diagnostics printing limits ---
 PANEL_PRINT_MAX_CHARS = int(os.getenv("PANEL_PRINT_MAX_CHARS", "4000"))
 PANEL_PRINT_MAX_LINES = int(os.getenv("PANEL_PRINT_MAX_LINES", "120"))
 
+# --- browser reuse (see app/browser_pool.py) ---
+USE_BROWSER_POOL = os.getenv("ZIMAS_BROWSER_POOL", "1") != "0"
+# read all panels from one #divLeftInformationBar dump, clicking tabs only for misses
+SINGLE_PASS = os.getenv("ZIMAS_SINGLE_PASS", "1") != "0"
+
 def _print_panel(title: str, content: Optional[str]) -> None:
     print(f"\n===== PANEL: {title} =====")
     if not content:
@@ -34,20 +47,17 @@ def _print_panel(title: str, content: Optional[str]) -> None:
     print(text)
     print("===== END PANEL =====\n")
 
-def _norm(s: str) -> str:
-    s = (s or "").replace("\u00A0", " ")
-    s = " ".join(s.split())
-    s = re.sub(r"\s*/\s*", "/", s)
-    return s.strip()
-
-def _list_available_tabs(page: Page) -> List[str]:
-    texts = page.locator("#divLeftInformationBar td.DataTabs").locator("a, span, div").all_inner_texts()
-    cleaned = []
-    for t in texts:
-        s = t.replace("\u00A0", " ")
-        s = " ".join(s.split())
-        if s:
-            cleaned.append(s)
+def _list_available_tabs(page: Page, index: Optional["_TabIndex"] = None) -> List[str]:
+    if index is not None:
+        cleaned = [label for _, _, label in index.entries]
+    else:
+        texts = page.locator("#divLeftInformationBar td.DataTabs").locator("a, span, div").all_inner_texts()
+        cleaned = []
+        for t in texts:
+            s = t.replace("\u00A0", " ")
+            s = " ".join(s.split())
+            if s:
+                cleaned.append(s)
     logger.info(f"[TABS] {cleaned}")
     print(f"[TABS] {cleaned}")
     return cleaned
@@ -66,66 +76,62 @@ TAB_ALIASES = {
     "Housing": ["Housing", "Housing Dept", "Housing (HCD)"],
 }
 
-def _find_tab_locator(page: Page, canonical_name: str) -> Optional[Locator]:
-    root = page.locator("#divLeftInformationBar")
-    aliases = TAB_ALIASES.get(canonical_name, [canonical_name])
-
+@functools.lru_cache(maxsize=None)
+def _alias_patterns(canonical_name: str) -> Tuple[re.Pattern, ...]:
     patterns = []
-    for alias in aliases:
+    for alias in TAB_ALIASES.get(canonical_name, [canonical_name]):
         pat = re.escape(_norm(alias))
         pat = pat.replace("/", r"\s*/\s*")
         patterns.append(re.compile(rf"^{pat}$", re.IGNORECASE))
+    return tuple(patterns)
+
+# compiled once at import; panels outside TAB_ALIASES are compiled on first use
+for _name in TAB_ALIASES:
+    _alias_patterns(_name)
+
+# tags every tab label element with a stable data attribute and returns (idx, tag, text) in DOM order
+_INDEX_TABS_JS = """
+(root) => {
+    const out = [];
+    root.querySelectorAll("td.DataTabs a, td.DataTabs span, td.DataTabs div").forEach((el, i) => {
+        el.setAttribute("data-zimas-tab", String(i));
+        out.push([i, el.tagName.toLowerCase(), el.innerText || ""]);
+    });
+    return out;
+}
+"""
+
+class _TabIndex:
+    """Label -> element index of the info bar tabs, built with one in-page evaluation."""
 
-    for rx in patterns:
+    def __init__(self, page: Page) -> None:
+        self.root = page.locator("#divLeftInformationBar")
+        self.entries: List[Tuple[int, str, str]] = []
+        self.rebuild()
+
+    def rebuild(self) -> None:
+        self.entries = []
         try:
-            loc = root.get_by_role("link", name=rx).first
-            if loc.count() > 0:
-                return loc
-        except Exception:
-            pass
-        containers = root.locator("td.DataTabs").locator("a, span, div")
-        n = containers.count()
-        for i in range(n):
-            el = containers.nth(i)
-            try:
-                txt = el.inner_text(timeout=200)
-            except Exception:
-                continue
-            if rx.match(_norm(txt) or ""):
-                return el
-    return None
-
-def _table_to_lines(table: BeautifulSoup) -> List[str]:
-    out: List[str] = []
-    rows = table.find_all("tr")
-    for tr in rows:
-        tds = tr.find_all("td")
-        if len(tds) >= 2:
-            label = _norm(tds[0].get_text(" ", strip=True))
-            value = _norm(tds[1].get_text(" ", strip=True))
-            if label or value:
-                out.append(f"{label}: {value}")
-        else:
-            txt = _norm(tr.get_text(" ", strip=True))
-            if txt:
-                out.append(txt)
-    return out
+            raw = self.root.evaluate(_INDEX_TABS_JS)
+        except Exception as e:
+            logger.warning(f"[TABS] index build failed: {e}")
+            raw = []
+        for idx, tag, text in raw:
+            label = _norm(text)
+            if label:
+                self.entries.append((idx, tag, label))
+        # links first, as the role=link lookup used to prefer them
+        self.entries.sort(key=lambda e: (e[1] != "a", e[0]))
 
-def _html_to_text(html: str) -> str:
-    if not html:
-        return ""
-    soup = BeautifulSoup(html, "html.parser")
-    for br in soup.find_all("br"):
-        br.replace_with("\n")
-    tables = soup.find_all("table")
-    if tables:
-        lines: List[str] = []
-        for tb in tables:
-            lines.extend(_table_to_lines(tb))
-        return "\n".join(lines)
-    text = soup.get_text("\n", strip=True)
-    text = re.sub(r"\n{3,}", "\n\n", text)
-    return text.strip()
+    def find(self, canonical_name: str) -> Optional[Locator]:
+        for rx in _alias_patterns(canonical_name):
+            for idx, _, label in self.entries:
+                if rx.match(label):
+                    return self.root.locator(f'[data-zimas-tab="{idx}"]').first
+        return None
+
+def _find_tab_locator(page: Page, canonical_name: str, index: Optional[_TabIndex] = None) -> Optional[Locator]:
+    return (index or _TabIndex(page)).find(canonical_name)
 
 def _clean_panel_text(value: Optional[str]) -> Optional[str]:
     if not value:
@@ -133,16 +139,48 @@ def _clean_panel_text(value: Optional[str]) -> Optional[str]:
     v = value.strip()
     if "<" in v and ">" in v:
         try:
-            return _html_to_text(v)
+            return html_to_text(v)
         except Exception:
             return _norm(v)
     return _norm(v)
 
-def _open_tab_and_get_content(page: Page, tab_text: str, timeout: int = 60000) -> Optional[str]:
+# resolves once the row has content (its own or XHR-filled), or with false after timeoutMs
+_WAIT_ROW_CONTENT_JS = """
+(row, timeoutMs) => new Promise((resolve) => {
+    const ready = () => (row.textContent || "").trim().length > 0;
+    if (ready()) return resolve(true);
+    const obs = new MutationObserver(() => {
+        if (ready()) { obs.disconnect(); clearTimeout(timer); resolve(true); }
+    });
+    obs.observe(row, {childList: true, subtree: true, characterData: true});
+    const timer = setTimeout(() => { obs.disconnect(); resolve(ready()); }, timeoutMs);
+})
+"""
+
+def _wait_for_row_content(row: Locator, timeout_ms: float) -> bool:
+    t0 = time.perf_counter()
+    try:
+        ready = bool(row.evaluate(_WAIT_ROW_CONTENT_JS, timeout_ms, timeout=timeout_ms + 5000))
+    except Exception as e:
+        logger.warning(f"[PANEL] content wait failed: {e}")
+        ready = False
+    # a miss is fed back as the full timeout so the limit grows when ZIMAS slows down
+    PANEL_TIMEOUT.observe((time.perf_counter() - t0) * 1000 if ready else timeout_ms)
+    return ready
+
+def _open_tab_and_get_content(page: Page, tab_text: str, timeout: Optional[float] = None,
+                              index: Optional[_TabIndex] = None) -> Optional[str]:
     t0 = time.time()
-    anchor = _find_tab_locator(page, tab_text)
+    # reads follow the content wait, so the adaptive panel limit bounds them too
+    timeout = timeout or PANEL_TIMEOUT.current_ms()
+    index = index or _TabIndex(page)
+    anchor = index.find(tab_text)
+    if anchor is not None and anchor.count() == 0:
+        # the bar was re-rendered since the index was built
+        index.rebuild()
+        anchor = index.find(tab_text)
     if anchor is None or anchor.count() == 0:
-        avail = _list_available_tabs(page)
+        avail = _list_available_tabs(page, index)
         logger.warning(f"Tab not found: {tab_text}; available: {avail}; aliases: {TAB_ALIASES.get(tab_text)}")
         print(f"[WARN] Tab not found: {tab_text}; available: {avail}; aliases: {TAB_ALIASES.get(tab_text)}")
         return None
@@ -157,11 +195,9 @@ def _open_tab_and_get_content(page: Page, tab_text: str, timeout: int = 60000) -
         src = ""
     if "twist_closed" in src:
         anchor.click()
-        page.wait_for_timeout(200)
     else:
         try:
             anchor.click()
-            page.wait_for_timeout(120)
         except Exception:
             pass
 
@@ -173,6 +209,8 @@ def _open_tab_and_get_content(page: Page, tab_text: str, timeout: int = 60000) -
         logger.warning(f"No content row found for tab: {tab_text}")
         print(f"[WARN] No content row found for tab: {tab_text}")
         return None
+    if not _wait_for_row_content(content_tr, timeout):
+        logger.warning(f"[PANEL] {tab_text}: row still empty after {timeout:.0f}ms, reading anyway")
 
     try:
         raw_text = (content_tr.inner_text(timeout=timeout) or "").strip()
@@ -193,49 +231,213 @@ def _open_tab_and_get_content(page: Page, tab_text: str, timeout: int = 60000) -
         print(f"[WARN] Failed extracting content for tab {tab_text}: {e}")
         return None
 
-@traceable(name="la_scrape")
-def scrape_la_city_planning(street_name: str, house_number: str) -> Dict:
+# --- single-pass mode: expand every tab in-page, read the bar once, parse offline ---
+# resolves once every tab's content row has content, or with the number still empty after timeoutMs
+_WAIT_ALL_ROWS_JS = """
+(root, timeoutMs) => new Promise((resolve) => {
+    const rows = [];
+    root.querySelectorAll("td.DataTabs").forEach((td) => {
+        const tr = td.closest("tr");
+        const next = tr && tr.nextElementSibling;
+        if (next && !next.querySelector("td.DataTabs")) rows.push(next);
+    });
+    const empty = () => rows.filter((r) => !(r.textContent || "").trim()).length;
+    if (!empty()) return resolve(0);
+    const obs = new MutationObserver(() => {
+        if (!empty()) { obs.disconnect(); clearTimeout(timer); resolve(0); }
+    });
+    obs.observe(root, {childList: true, subtree: true, characterData: true});
+    const timer = setTimeout(() => { obs.disconnect(); resolve(empty()); }, timeoutMs);
+})
+"""
+
+_EXPAND_ALL_TABS_JS = """
+(root) => {
+    let clicked = 0;
+    root.querySelectorAll("td.DataTabs a").forEach((a) => {
+        const img = a.querySelector("img");
+        if (img && (img.getAttribute("src") || "").includes("twist_closed")) {
+            a.click();
+            clicked++;
+        }
+    });
+    return clicked;
+}
+"""
+
+def _parse_panels_from_html(html: str, names: List[str]) -> Dict[str, Optional[str]]:
     """
-    ZIMAS scrape by street/house number.
-    Tavily queries are handled elsewhere (planner or user-supplied).
+    Offline counterpart of _open_tab_and_get_content for a whole #divLeftInformationBar dump:
+    each tab row (td.DataTabs) is matched against TAB_ALIASES and its content is the following
+    non-tab row. Panels that are absent or empty come back as None.
     """
-    address = f"{house_number} {street_name}, Los Angeles, CA"
-    panels: Dict[str, Optional[str]] = {
-        "Address / Legal": None,
-        "Planning and Zoning": None,
-        "Assessor": None,
-        "Case Numbers": None,
-        "Citywide / Code Amendment Cases": None,
-        "Housing": None,
-    }
+    out: Dict[str, Optional[str]] = {name: None for name in names}
+    if not html:
+        return out
+    soup = BeautifulSoup(html, "html.parser")
+    patterns = {name: _alias_patterns(name) for name in names}
 
-    sources: List[Dict] = []
-    notes_parts: List[str] = []
+    for td in soup.select("td.DataTabs"):
+        labels = [_norm(td.get_text(" ", strip=True))]
+        labels += [_norm(el.get_text(" ", strip=True)) for el in td.find_all(["a", "span", "div"])]
+        name = next(
+            (n for n in names if out[n] is None and any(rx.match(lb) for rx in patterns[n] for lb in labels if lb)),
+            None,
+        )
+        if name is None:
+            continue
+        tab_tr = td.find_parent("tr")
+        if tab_tr is None:
+            continue
+        for tr in tab_tr.find_next_siblings("tr"):
+            if tr.select_one("td.DataTabs") is not None:
+                break  # next tab reached: this one has no content row
+            out[name] = _clean_panel_text(tr.decode_contents()) or None
+            break
+    return out
 
-    # ZIMAS
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        page = browser.new_page()
-        page.goto("https://zimas.lacity.org/", wait_until="domcontentloaded")
+def _collect_panels_single_pass(page: Page, panels: Dict[str, Optional[str]]) -> Dict[str, Optional[str]]:
+    t0 = time.time()
+    root = page.locator("#divLeftInformationBar")
+    try:
+        clicked = root.evaluate(_EXPAND_ALL_TABS_JS)
+        if clicked:
+            limit = EXPAND_TIMEOUT.current_ms()
+            t_wait = time.perf_counter()
+            still_empty = root.evaluate(_WAIT_ALL_ROWS_JS, limit)
+            EXPAND_TIMEOUT.observe((time.perf_counter() - t_wait) * 1000 if not still_empty else limit)
+            if still_empty:
+                logger.info(f"[SINGLE-PASS] {still_empty} rows still empty after {limit:.0f}ms")
+        html = root.inner_html(timeout=PANEL_TIMEOUT.current_ms())
+    except Exception as e:
+        logger.warning(f"[SINGLE-PASS] bar dump failed, using per-tab mode: {e}")
+        return dict(panels)
 
+    out = _parse_panels_from_html(html, list(panels.keys()))
+    found = [k for k, v in out.items() if v]
+    dt = time.time() - t0
+    logger.info(f"[SINGLE-PASS] expanded={clicked} parsed={len(found)}/{len(out)} in {dt:.2f}s")
+    print(f"[SINGLE-PASS] {len(found)}/{len(out)} panels in {dt:.2f}s")
+    return out
+
+def _wait_for_info_bar(page: Page) -> None:
+    """Waits for the search result with the learned timeout; a miss gets one more try up to the cap."""
+    limit = SEARCH_TIMEOUT.current_ms()
+    t0 = time.perf_counter()
+    try:
+        page.wait_for_selector("#divLeftInformationBar", timeout=limit)
+    except PlaywrightTimeoutError:
+        SEARCH_TIMEOUT.observe(limit)
+        if limit >= SEARCH_TIMEOUT.max_ms:
+            raise
+        logger.warning(f"[SEARCH] info bar not there after {limit:.0f}ms, waiting up to {SEARCH_TIMEOUT.max_ms:.0f}ms")
+        page.wait_for_selector("#divLeftInformationBar", timeout=SEARCH_TIMEOUT.max_ms - limit)
+    SEARCH_TIMEOUT.observe((time.perf_counter() - t0) * 1000)
+
+def _scrape_zimas_page(page: Page, street_name: str, house_number: str, panels: Dict[str, Optional[str]],
+                       timing: Optional[ScrapeTiming] = None) -> Dict[str, Optional[str]]:
+    timing = timing or ScrapeTiming()
+    with timing.phase("goto"):
+        page.goto(ZIMAS_URL, wait_until="domcontentloaded")
+
+    with timing.phase("address_search"):
         page.click("#btn")
         page.fill("#txtStreetName", street_name)
         page.fill("#txtHouseNumber", house_number)
         page.click("#btnSearchGo")
+        _wait_for_info_bar(page)
 
-        page.wait_for_selector("#divLeftInformationBar", timeout=60000)
+    if SINGLE_PASS:
+        with timing.phase("single_pass"):
+            out = _collect_panels_single_pass(page, panels)
+    else:
+        out = dict(panels)
+    # per-tab clicks only for whatever the single pass could not read
+    missing = [k for k, v in out.items() if not v]
+    index = _TabIndex(page) if missing else None
+    for tab_name in missing:
+        with timing.phase(f"tab:{tab_name}", action="open_tab"):
+            out[tab_name] = _open_tab_and_get_content(page, tab_name, index=index)
+    summary = timing.summary()
+    logger.info(f"[SCRAPE-TIMING] {house_number} {street_name}: {summary}")
+    return out
 
-        for tab_name in list(panels.keys()):
-            content = _open_tab_and_get_content(page, tab_name)
-            panels[tab_name] = content
+def _empty_panels() -> Dict[str, Optional[str]]:
+    return {
+        "Address / Legal": None,
+        "Planning and Zoning": None,
+        "Assessor": None,
+        "Case Numbers": None,
+        "Citywide / Code Amendment Cases": None,
+        "Housing": None,
+    }
 
-        sources.append({"name": "ZIMAS", "url": "https://zimas.lacity.org/"})
-        browser.close()
+# every panel a full scrape reads, in tab order
+PANEL_NAMES: Tuple[str, ...] = tuple(_empty_panels())
 
+def _scrape_result(street_name: str, house_number: str, panels: Dict[str, Optional[str]],
+                   timing: Optional[ScrapeTiming] = None) -> Dict:
+    address = f"{house_number} {street_name}, Los Angeles, CA"
+    sources: List[Dict] = [{"name": "ZIMAS", "url": "https://zimas.lacity.org/"}]
+    notes_parts: List[str] = []
     return {
         "address": address,
         "panels": panels,
         "tavily_results": [],  # kept for compatibility; user/agent search happens later
         "notes": "\n".join(notes_parts),
         "sources": sources,
+        "timing": timing.summary() if timing is not None else None,
     }
+
+def _wanted_panels(panel_names: Optional[List[str]]) -> Dict[str, Optional[str]]:
+    panels = _empty_panels()
+    return panels if panel_names is None else {k: None for k in panels if k in panel_names}
+
+@traceable(name="la_scrape")
+def scrape_la_city_planning(street_name: str, house_number: str, panel_names: Optional[List[str]] = None) -> Dict:
+    """
+    ZIMAS scrape by street/house number (only `panel_names` when given, e.g. stale cached panels).
+    Tavily queries are handled elsewhere (planner or user-supplied).
+    Borrows a warm browser from the shared pool unless ZIMAS_BROWSER_POOL=0.
+    """
+    panels = _wanted_panels(panel_names)
+    timing = ScrapeTiming()
+
+    # ZIMAS
+    if USE_BROWSER_POOL:
+        panels = get_browser_pool().run(
+            lambda page: _scrape_zimas_page(page, street_name, house_number, panels, timing)
+        )
+    else:
+        with sync_playwright() as p:
+            browser = p.chromium.launch(headless=True)
+            try:
+                page = browser.new_context(**context_options()).new_page()
+                traffic = PageTraffic(page)
+                try:
+                    panels = _scrape_zimas_page(page, street_name, house_number, panels, timing)
+                finally:
+                    traffic.report("scrape")
+            finally:
+                browser.close()
+
+    return _scrape_result(street_name, house_number, panels, timing)
+
+@traceable(name="la_scrape_async")
+async def scrape_la_city_planning_async(street_name: str, house_number: str,
+                                        panel_names: Optional[List[str]] = None) -> Dict:
+    """
+    Async entry point used by the async workflow.
+    The page work runs on a pooled browser thread (Playwright sync objects are thread-bound),
+    so awaiting it holds neither the event loop nor a request worker thread.
+    """
+    if not USE_BROWSER_POOL:
+        return await asyncio.to_thread(scrape_la_city_planning, street_name, house_number, panel_names)
+    panels = _wanted_panels(panel_names)
+    timing = ScrapeTiming()
+    fut = await asyncio.to_thread(
+        get_browser_pool().submit,
+        lambda page: _scrape_zimas_page(page, street_name, house_number, panels, timing),
+    )
+    panels = await asyncio.wrap_future(fut)
+    return _scrape_result(street_name, house_number, panels, timing)
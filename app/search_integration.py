@@ -1,22 +1,21 @@
 # -*- coding: utf-8 -*-
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from loguru import logger
-import os, httpx, yaml
+import os, httpx, asyncio
 from langsmith import traceable
 import requests
 from dotenv import load_dotenv
+from app.aio import run_sync
+from app.cache import get_cache, make_key
+from app.http_clients import get_async_client
+from app.settings import get_settings
+from app.singleflight import get_singleflight
 
 load_dotenv()
 TAVILY_API = os.getenv("TAVILY_API_KEY")
 if not TAVILY_API:
     print("TAVILY_API_KEY is not set!")
 
-CONFIG_PATH = os.getenv("CONFIG_PATH", "config/config.yaml")
-
-def _load_config():
-    with open(CONFIG_PATH, "r", encoding="utf-8") as f:
-        return yaml.safe_load(f)
-
 @traceable(name="tavily_search")
 def tavily_search(address: str) -> List[Dict[str, Any]]:
     # legacy helper (no longer used in scraper)
@@ -42,38 +41,130 @@ def tavily_search(address: str) -> List[Dict[str, Any]]:
             print(f"Error with Tavily API: {resp.status_code}, {resp.text}")
     return results
 
-def tavily_search_many(queries: List[str], include_domains: List[str]) -> List[Dict]:
-    base_url = "https://api.tavily.com/search"
+def _url_key(url: str) -> str:
+    u = (url or "").strip()
+    u = u.split("#", 1)[0].rstrip("/")
+    if "://" in u:
+        scheme, rest = u.split("://", 1)
+        host, _, path = rest.partition("/")
+        u = f"{scheme.lower()}://{host.lower()}" + (f"/{path}" if path else "")
+    return u
+
+def dedupe_results(results: List[Dict]) -> List[Dict]:
+    """Drops repeated URLs across queries, keeping the first position and the best score."""
+    out: List[Dict] = []
+    seen: Dict[str, int] = {}
+    for rec in results:
+        key = _url_key(rec.get("url", ""))
+        if not key:
+            out.append(rec)
+            continue
+        if key in seen:
+            kept = out[seen[key]]
+            if (rec.get("score") or 0.0) > (kept.get("score") or 0.0):
+                kept["score"] = rec.get("score")
+            continue
+        seen[key] = len(out)
+        out.append(rec)
+    return out
+
+async def _tavily_query(client: httpx.AsyncClient, sem: asyncio.Semaphore, base_url: str, payload: Dict,
+                        timeout: httpx.Timeout, per_query_timeout: float) -> List[Dict]:
+    q = payload["query"]
+    async with sem:
+        try:
+            r = await asyncio.wait_for(client.post(base_url, json=payload, timeout=timeout), timeout=per_query_timeout)
+            r.raise_for_status()
+            data = r.json()
+        except asyncio.TimeoutError:
+            logger.error(f"Tavily query timed out after {per_query_timeout:.0f}s: {q}")
+            return []
+        except Exception as e:
+            logger.error(f"Tavily query failed: {q} | {e}")
+            return []
+    return [
+        {
+            "title": item.get("title", ""),
+            "url": item.get("url", ""),
+            "content": item.get("content", ""),
+            "score": item.get("score", 0.0),
+        }
+        for item in data.get("results", [])
+    ]
+
+def _search_cache_key(payload: Dict) -> str:
+    return make_key(
+        "tavily",
+        " ".join(str(payload["query"]).lower().split()),
+        sorted(payload.get("include_domains") or []),
+        payload.get("search_depth"),
+        payload.get("max_results"),
+    )
+
+async def tavily_search_many_async(queries: List[str], include_domains: List[str], use_cache: bool = True) -> List[Dict]:
+    """
+    Runs the queries concurrently (bounded by search.max_concurrency) and returns their results
+    in query order, deduplicated by URL. A failed or timed-out query contributes no results.
+    Per-query results are served from / stored in the `search` cache unless use_cache=False.
+    """
     if not TAVILY_API:
         logger.warning("Missing TAVILY_API_KEY")
         return []
-    timeout = httpx.Timeout(connect=10, read=30, write=15, pool=10)
-    results: List[Dict] = []
-    inc = list({d.lower() for d in include_domains})[:6] if include_domains else None
+    search_cfg = get_settings().integrations.search
+    cache = get_cache("search") if use_cache else None
+    base_url = search_cfg.base_url
+    max_concurrency = search_cfg.max_concurrency
+    per_query_timeout = search_cfg.per_query_timeout_sec or search_cfg.request_timeout_sec
 
-    with httpx.Client(timeout=timeout) as client:
-        for q in [q for q in queries[:12] if str(q).strip()]:
-            payload = {
-                "api_key": TAVILY_API,
-                "query": q,
-                "search_depth": "advanced",
-                "max_results": 6,
-                "include_answer": False,
-            }
-            if inc:
-                payload["include_domains"] = inc
-            try:
-                r = client.post(base_url, json=payload)
-                r.raise_for_status()
-                data = r.json()
-                for item in data.get("results", []):
-                    rec = {
-                        "title": item.get("title", ""),
-                        "url": item.get("url", ""),
-                        "content": item.get("content", ""),
-                        "score": item.get("score", 0.0),
-                    }
-                    results.append(rec)
-            except Exception as e:
-                logger.error(f"Tavily query failed: {q} | {e}")
-    return results
+    request_timeout = search_cfg.request_timeout_sec
+    timeout = httpx.Timeout(request_timeout, connect=min(10.0, request_timeout), pool=min(10.0, request_timeout))
+    inc = sorted({d.lower() for d in include_domains})[:6] if include_domains else None
+
+    payloads = []
+    for q in [q for q in queries[:12] if str(q).strip()]:
+        payload = {
+            "api_key": TAVILY_API,
+            "query": q,
+            "search_depth": "advanced",
+            "max_results": search_cfg.max_results,
+            "include_answer": False,
+        }
+        if inc:
+            payload["include_domains"] = inc
+        payloads.append(payload)
+
+    per_query: List[Optional[List[Dict]]] = [None] * len(payloads)
+    keys = [_search_cache_key(p) for p in payloads]
+    if cache is not None:
+        for i, key in enumerate(keys):
+            per_query[i] = cache.get(key)
+    todo = [i for i, recs in enumerate(per_query) if recs is None]
+
+    if todo:
+        sem = asyncio.Semaphore(max_concurrency)
+        client = get_async_client("search")
+
+        async def fetch(i: int) -> List[Dict]:
+            recs = await _tavily_query(client, sem, base_url, payloads[i], timeout, per_query_timeout)
+            # failed/timed-out queries come back empty; only cache real answers
+            if cache is not None and recs:
+                cache.set(keys[i], recs)
+            return recs
+
+        # an identical query already in flight for another analysis is awaited instead of re-sent
+        flights = get_singleflight("tavily")
+        fetched = await asyncio.gather(*(flights.do(keys[i], lambda i=i: fetch(i)) for i in todo))
+        for i, recs in zip(todo, fetched):
+            per_query[i] = recs or []
+
+    results: List[Dict] = [rec for recs in per_query for rec in recs]
+    deduped = dedupe_results(results)
+    logger.info(
+        f"[SEARCH] {len(payloads)} queries ({len(payloads) - len(todo)} cached) -> "
+        f"{len(results)} results, {len(deduped)} unique URLs"
+    )
+    return deduped
+
+def tavily_search_many(queries: List[str], include_domains: List[str], use_cache: bool = True) -> List[Dict]:
+    """Sync wrapper around tavily_search_many_async."""
+    return run_sync(tavily_search_many_async(queries, include_domains, use_cache=use_cache))
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+Typed view of config/config.yaml.
+
+The file is parsed and validated once; every module reads the resulting Settings object through
+get_settings(), so the request path does no file I/O or YAML parsing. With CONFIG_WATCH=1 the API
+starts a watcher thread that reloads on file change; an invalid edit is logged and the previous
+settings stay in effect.
+"""
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import yaml
+from loguru import logger
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
+
+CONFIG_PATH = os.getenv("CONFIG_PATH", "config/config.yaml")
+CONFIG_WATCH_INTERVAL_SEC = float(os.getenv("CONFIG_WATCH_INTERVAL_SEC", "2"))
+
+
+class _Section(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+
+class AppSettings(_Section):
+    name: str = "Property Analysis Agentic System"
+    version: str = "1.0.0"
+    default_city: str = "Los Angeles"
+    response_timeout_sec: int = 110
+
+
+class LLMSettings(_Section):
+    provider: str = "openrouter"
+    base_url: str
+    model: str
+    fallback_models: List[str] = Field(default_factory=list)
+    temperature: float = 0.2
+    max_tokens: int = Field(700, gt=0)
+    request_timeout_sec: int = Field(90, gt=0)
+    # retry / fallback scheduling (app/llm_scheduler.py)
+    max_attempts: int = Field(4, ge=1)
+    backoff_base_sec: float = Field(1.0, gt=0)
+    backoff_max_sec: float = Field(20.0, gt=0)
+    max_wait_sec: float = Field(30.0, ge=0)
+    tpm_limits: Dict[str, int] = Field(default_factory=dict)
+    # prompt packing (app/prompt_budget.py)
+    context_windows: Dict[str, int] = Field(default_factory=dict)
+    prompt_budget: Dict[str, int] = Field(default_factory=dict)
+
+
+class SearchSettings(_Section):
+    provider: str = "tavily"
+    base_url: str = "https://api.tavily.com/search"
+    max_results: int = Field(6, gt=0)
+    include_answer: bool = False
+    include_images: bool = False
+    request_timeout_sec: float = Field(30, gt=0)
+    max_concurrency: int = Field(4, ge=1)
+    per_query_timeout_sec: Optional[float] = None
+
+
+class IntegrationsSettings(_Section):
+    llm: LLMSettings
+    search: SearchSettings = Field(default_factory=SearchSettings)
+
+
+class HttpClientSettings(_Section):
+    max_connections: Optional[int] = None
+    max_keepalive_connections: Optional[int] = None
+    keepalive_expiry_sec: Optional[float] = None
+    http2: Optional[bool] = None
+
+
+class HttpSettings(_Section):
+    max_connections: int = 20
+    max_keepalive_connections: int = 10
+    keepalive_expiry_sec: float = 60
+    http2: bool = True
+
+    def for_client(self, name: str) -> "HttpSettings":
+        """Global limits overlaid with the per-client section (e.g. `http.search`), if any."""
+        override = (self.model_extra or {}).get(name) or {}
+        base = self.model_dump(include={"max_connections", "max_keepalive_connections", "keepalive_expiry_sec", "http2"})
+        return HttpSettings(**{**base, **HttpClientSettings(**override).model_dump(exclude_none=True)})
+
+
+class CacheSectionSettings(_Section):
+    enabled: bool = True
+    ttl_sec: float = Field(3600, gt=0)
+    max_entries: int = Field(1000, gt=0)
+    panel_ttl_sec: Dict[str, float] = Field(default_factory=dict)
+
+
+class CacheSettings(_Section):
+    path: str = ""
+
+    def section(self, name: str) -> CacheSectionSettings:
+        return CacheSectionSettings(**((self.model_extra or {}).get(name) or {}))
+
+
+class JobsSettings(_Section):
+    database_url: str = ""          # postgresql://... ; empty -> SQLite at `path`
+    path: str = ".cache/jobs.sqlite"
+    workers: int = Field(2, ge=0)   # per API process; 0 -> enqueue only, run `python -m agents.jobs`
+    poll_interval_sec: float = Field(1.0, gt=0)
+    job_timeout_sec: float = Field(600, gt=0)
+    stale_after_sec: float = Field(900, gt=0)
+    retention_sec: float = Field(604800, gt=0)
+
+
+class Settings(_Section):
+    app: AppSettings = Field(default_factory=AppSettings)
+    agents: Dict[str, Any] = Field(default_factory=dict)
+    integrations: IntegrationsSettings
+    http: HttpSettings = Field(default_factory=HttpSettings)
+    cache: CacheSettings = Field(default_factory=CacheSettings)
+    jobs: JobsSettings = Field(default_factory=JobsSettings)
+    report: Dict[str, Any] = Field(default_factory=dict)
+
+
+def load_settings(path: str = CONFIG_PATH) -> Settings:
+    with open(path, "r", encoding="utf-8") as f:
+        return Settings.model_validate(yaml.safe_load(f) or {})
+
+
+_settings: Optional[Settings] = None
+_lock = threading.Lock()
+_watcher: Optional[threading.Thread] = None
+
+
+def get_settings() -> Settings:
+    global _settings
+    s = _settings
+    if s is not None:
+        return s
+    with _lock:
+        if _settings is None:
+            _settings = load_settings()
+        return _settings
+
+
+def reload_settings() -> Settings:
+    """Re-reads the config file; on a bad file the current settings are kept."""
+    global _settings
+    try:
+        fresh = load_settings()
+    except (OSError, yaml.YAMLError, ValidationError) as e:
+        logger.error(f"[CONFIG] reload of {CONFIG_PATH} failed, keeping previous settings: {e}")
+        return get_settings()
+    with _lock:
+        _settings = fresh
+    logger.info(f"[CONFIG] reloaded {CONFIG_PATH}")
+    return fresh
+
+
+def start_settings_watcher(interval_sec: float = CONFIG_WATCH_INTERVAL_SEC) -> None:
+    """Polls the config file's mtime and reloads on change (daemon thread, started once)."""
+    global _watcher
+    if _watcher is not None:
+        return
+
+    def _watch() -> None:
+        last = None
+        while True:
+            try:
+                mtime = os.stat(CONFIG_PATH).st_mtime
+            except OSError:
+                mtime = None
+            if last is not None and mtime is not None and mtime != last:
+                reload_settings()
+            last = mtime if mtime is not None else last
+            time.sleep(interval_sec)
+
+    _watcher = threading.Thread(target=_watch, name="config-watcher", daemon=True)
+    _watcher.start()
+    logger.info(f"[CONFIG] watching {CONFIG_PATH} every {interval_sec:.0f}s")
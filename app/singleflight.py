@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Single-flight deduplication of concurrent identical work.
+
+The first caller for a key (the leader) starts the work as a task; callers that arrive with the
+same key while it is in flight (followers) wait for that task instead of starting their own and
+get a deep copy of its result or its exception. The slot is a concurrent.futures.Future, so
+followers may sit on other event loops (run_sync helper loops, job workers). The work runs
+shielded: a leader or follower that is cancelled stops waiting but does not cancel it for the others.
+Nothing is kept after completion; repeated work over time is the caches' job.
+"""
+import asyncio
+import copy
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict
+
+from loguru import logger
+
+from app.metrics import SINGLEFLIGHT_CALLS
+
+
+class SingleFlight:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+        self._leaders = 0
+        self._followers = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        with self._lock:
+            slot = self._calls.get(key)
+            leader = slot is None
+            if leader:
+                slot = self._calls[key] = Future()
+                self._leaders += 1
+            else:
+                self._followers += 1
+        SINGLEFLIGHT_CALLS.labels(self.name, "leader" if leader else "follower").inc()
+
+        if not leader:
+            logger.info(f"[SINGLEFLIGHT] {self.name}: joined in-flight {key[:60]}")
+            result = await asyncio.shield(asyncio.wrap_future(slot))
+            return copy.deepcopy(result)
+
+        task = asyncio.get_running_loop().create_task(fn())
+        task.add_done_callback(lambda t: self._settle(key, slot, t))
+        return await asyncio.shield(task)
+
+    def _settle(self, key: str, slot: Future, task: "asyncio.Task") -> None:
+        with self._lock:
+            self._calls.pop(key, None)
+        if task.cancelled():
+            # only happens when the leader's loop shuts down under it
+            slot.set_exception(RuntimeError(f"{self.name}: in-flight call was cancelled"))
+        elif task.exception() is not None:
+            slot.set_exception(task.exception())
+        else:
+            slot.set_result(task.result())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self._leaders + self._followers
+            return {
+                "in_flight": len(self._calls),
+                "executed": self._leaders,
+                "coalesced": self._followers,
+                "coalesced_ratio": round(self._followers / total, 4) if total else 0.0,
+            }
+
+
+_groups: Dict[str, SingleFlight] = {}
+_groups_lock = threading.Lock()
+
+
+def get_singleflight(name: str) -> SingleFlight:
+    with _groups_lock:
+        if name not in _groups:
+            _groups[name] = SingleFlight(name)
+        return _groups[name]
+
+
+def singleflight_stats() -> Dict[str, Dict[str, Any]]:
+    with _groups_lock:
+        groups = dict(_groups)
+    return {name: g.stats() for name, g in groups.items()}
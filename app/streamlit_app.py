@@ -5,6 +5,7 @@ import os
 import json  # For RAW debugging
 
 API_URL = os.getenv("API_URL", "http://localhost:8000/analyze")
+STREAM_URL = os.getenv("STREAM_URL", API_URL.rstrip("/") + "/stream")
 
 st.set_page_config(page_title="LA Property Analyzer", layout="wide")
 st.title("🏠 LA Property Analyzer")
@@ -24,6 +25,8 @@ if "_clear_q" not in st.session_state:
     st.session_state._clear_q = False
 if "show_raw" not in st.session_state:
     st.session_state.show_raw = False  # By default, do not show raw data
+if "stream_report" not in st.session_state:
+    st.session_state.stream_report = True  # render the report while it is generated
 
 # --- callbacks ---
 def add_question_cb():
@@ -35,6 +38,91 @@ def add_question_cb():
 def clear_questions_cb():
     st.session_state.user_questions = []
 
+def _normalize_result(data) -> dict:
+    if not isinstance(data, dict):
+        data = {"formatted_text": str(data or "")}
+
+    # --- FORCE formatted_text from any possible location ---
+    rpt = (data.get("report") or {}) if isinstance(data, dict) else {}
+    data["raw_llm_text"] = (data.get("raw_llm_text") or rpt.get("raw_llm_text") or "").strip()
+    data["formatted_text"] = (
+        (data.get("formatted_text") or "").strip()
+        or (rpt.get("formatted_text") or "").strip()
+        or data["raw_llm_text"]
+    )
+
+    # Normalize from nested 'report' if present
+    if isinstance(data, dict) and isinstance(data.get("report"), dict):
+        rpt = data["report"]
+        for k in ("formatted_text", "sections", "sources", "warnings", "la_data", "raw_llm_text"):
+            if k in rpt and rpt[k] is not None and (not data.get(k)):
+                data[k] = rpt[k]
+
+    # Safety net 1: if no formatted_text but have sections -> join to string
+    if not (data.get("formatted_text") or "").strip():
+        parts = []
+        for s in (data.get("sections") or []):
+            title = s.get("title", "Section")
+            body  = (s.get("content") or "").strip()
+            parts.append(f"## {title}\n\n{body}".strip())
+        if parts:
+            data["formatted_text"] = "\n\n".join(parts).strip()
+
+    # Safety net 2: still no formatted_text but have raw_llm_text -> use it
+    if not (data.get("formatted_text") or "").strip() and (data.get("raw_llm_text") or "").strip():
+        data["formatted_text"] = data["raw_llm_text"].strip()
+
+    # Final cleanup
+    data["formatted_text"] = (data.get("formatted_text") or "").strip()
+    data["raw_llm_text"]   = (data.get("raw_llm_text") or "").strip()
+    return data
+
+def _iter_sse(resp):
+    """Yields (event, data_dict) pairs from a streaming requests.Response."""
+    event, data_lines = "message", []
+    for line in resp.iter_lines(decode_unicode=True):
+        if line is None:
+            continue
+        if line == "":
+            if data_lines:
+                yield event, json.loads("\n".join(data_lines))
+            event, data_lines = "message", []
+        elif line.startswith("event:"):
+            event = line[6:].strip()
+        elif line.startswith("data:"):
+            data_lines.append(line[5:].strip())
+
+NODE_LABELS = {
+    "scrape": "ZIMAS scrape done",
+    "plan": "Search plan ready",
+    "search": "Web search done",
+    "prefetch": "Your questions searched",
+    "join": "ZIMAS and search results combined",
+    "extract": "Facts extracted",
+    "decide": "Research round finished",
+    "analyze": "Report complete",
+}
+
+def _run_streaming(payload: dict) -> dict:
+    status = st.status("Analyzing...", expanded=True)
+    report_box = st.empty()
+    text = ""
+    result = None
+    with requests.post(STREAM_URL, json=payload, stream=True, timeout=(10, 240)) as r:
+        r.raise_for_status()
+        for event, data in _iter_sse(r):
+            if event == "node":
+                status.write(f"✔ {NODE_LABELS.get(data.get('node'), data.get('node'))}")
+            elif event == "token":
+                text += data.get("text", "")
+                report_box.markdown(text)
+            elif event == "result":
+                result = data
+            elif event == "error":
+                raise RuntimeError(data.get("detail", "stream failed"))
+    status.update(label="Done", state="complete", expanded=False)
+    return result or {"formatted_text": text}
+
 def run_analysis_cb():
     if not (street_name and house_number):
         st.warning("Please enter a street name and a house number.")
@@ -45,52 +133,21 @@ def run_analysis_cb():
             "house_number": house_number,
             "user_questions": st.session_state.user_questions or None,
         }
-        with st.spinner("Analyzing..."):
-            r = requests.post(API_URL, json=payload, timeout=240)
-            r.raise_for_status()
-
-            # Server might return a plain string instead of JSON
-            try:
-                data = r.json()
-            except ValueError:
-                txt = (r.text or "").strip()
-                data = {"formatted_text": txt}
-
-            # --- FORCE formatted_text from any possible location ---
-            rpt = (data.get("report") or {}) if isinstance(data, dict) else {}
-            data["raw_llm_text"] = (data.get("raw_llm_text") or rpt.get("raw_llm_text") or "").strip()
-            data["formatted_text"] = (
-                (data.get("formatted_text") or "").strip()
-                or (rpt.get("formatted_text") or "").strip()
-                or data["raw_llm_text"]
-            )
-
-            # Normalize from nested 'report' if present
-            if isinstance(data, dict) and isinstance(data.get("report"), dict):
-                rpt = data["report"]
-                for k in ("formatted_text", "sections", "sources", "warnings", "la_data", "raw_llm_text"):
-                    if k in rpt and rpt[k] is not None and (not data.get(k)):
-                        data[k] = rpt[k]
-
-            # Safety net 1: if no formatted_text but have sections -> join to string
-            if not (data.get("formatted_text") or "").strip():
-                parts = []
-                for s in (data.get("sections") or []):
-                    title = s.get("title", "Section")
-                    body  = (s.get("content") or "").strip()
-                    parts.append(f"## {title}\n\n{body}".strip())
-                if parts:
-                    data["formatted_text"] = "\n\n".join(parts).strip()
-
-            # Safety net 2: still no formatted_text but have raw_llm_text -> use it
-            if not (data.get("formatted_text") or "").strip() and (data.get("raw_llm_text") or "").strip():
-                data["formatted_text"] = data["raw_llm_text"].strip()
-
-            # Final cleanup
-            data["formatted_text"] = (data.get("formatted_text") or "").strip()
-            data["raw_llm_text"]   = (data.get("raw_llm_text") or "").strip()
-
-            st.session_state.last_result = data
+        if st.session_state.stream_report:
+            data = _run_streaming(payload)
+        else:
+            with st.spinner("Analyzing..."):
+                r = requests.post(API_URL, json=payload, timeout=240)
+                r.raise_for_status()
+
+                # Server might return a plain string instead of JSON
+                try:
+                    data = r.json()
+                except ValueError:
+                    txt = (r.text or "").strip()
+                    data = {"formatted_text": txt}
+
+        st.session_state.last_result = _normalize_result(data)
 
         st.success("Done!")
     except Exception as e:
@@ -118,9 +175,11 @@ if st.session_state.user_questions:
     st.button("🗑️ Clear questions list", on_click=clear_questions_cb)
 
 st.divider()
-left, right = st.columns([1, 1])
+left, mid, right = st.columns([1, 1, 1])
 with left:
     st.button("✅ Run analysis", type="primary", on_click=run_analysis_cb)
+with mid:
+    st.toggle("Stream report", key="stream_report", help="Show progress and the report as it is written")
 with right:
     st.toggle("Show raw (ZIMAS/Tavily)", key="show_raw", help="For testing/debugging only")
 
@@ -198,6 +257,9 @@ if data:
                 for w in data["warnings"]:
                     st.write(f"- {w}")
 
+        if data.get("llm_model"):
+            st.caption(f"Report model: {data['llm_model']}")
+
     # Download as text
     def format_text_report(d: dict) -> str:
         lines = []
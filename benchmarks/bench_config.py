@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+Per-request config overhead: re-reading config.yaml the way the integrations used to
+(open + yaml.safe_load, several times per request) versus the cached Settings object.
+
+    python -m benchmarks.bench_config --loads-per-request 6 -n 2000
+"""
+import argparse
+import time
+
+import yaml
+
+from app.settings import CONFIG_PATH, get_settings
+
+
+def _legacy_request(loads: int) -> str:
+    model = ""
+    for _ in range(loads):
+        with open(CONFIG_PATH, "r", encoding="utf-8") as f:
+            cfg = yaml.safe_load(f)
+        model = cfg["integrations"]["llm"]["model"]
+    return model
+
+
+def _settings_request(loads: int) -> str:
+    model = ""
+    for _ in range(loads):
+        model = get_settings().integrations.llm.model
+    return model
+
+
+def _bench(fn, loads: int, n: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn(loads)
+    return (time.perf_counter() - t0) / n
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("-n", type=int, default=2000, help="simulated requests")
+    ap.add_argument("--loads-per-request", type=int, default=6,
+                    help="config reads per /analyze (headers, planner, extractor, report, search, ...)")
+    args = ap.parse_args()
+
+    get_settings()  # startup cost is paid once, outside the request path
+    before = _bench(_legacy_request, args.loads_per_request, args.n)
+    after = _bench(_settings_request, args.loads_per_request, args.n)
+    print(f"yaml per call : {before * 1e6:10.1f} us/request")
+    print(f"cached object : {after * 1e6:10.1f} us/request")
+    print(f"speedup       : {before / after:10.0f}x" if after else "speedup: n/a")
+
+
+if __name__ == "__main__":
+    main()
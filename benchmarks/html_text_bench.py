@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+Pages/sec micro-benchmark of the HTML -> text backends (app/html_text.py).
+
+Samples are the saved ZIMAS info bar (benchmarks/fixtures/zimas_bar.html): the whole bar and the
+content row of each panel tab, cut out the way scraper._parse_panels_from_html does, plus a few
+hand-written fragments for the markup the scraper has met in panels (line breaks, nested tables,
+entities, comments and scripts, cells without a label, text without tables). tests/test_html_text.py
+checks every installed backend against their bs4 output in benchmarks/fixtures/html_text_golden.json.
+A "page" in the timings is one bar's worth of panel fragments.
+
+    python -m benchmarks.html_text_bench --seconds 2
+    python -m benchmarks.html_text_bench --write-golden   # after a deliberate output change, with bs4
+"""
+import argparse
+import json
+import os
+import time
+from typing import Dict, List, Tuple
+
+from bs4 import BeautifulSoup
+
+from app.html_text import available_backends, html_to_text
+from benchmarks.replay_server import FIXTURES_DIR
+
+GOLDEN_PATH = os.path.join(FIXTURES_DIR, "html_text_golden.json")
+
+EDGE_CASES: Dict[str, str] = {
+    "br_in_cells": "<table><tr><td>Zoning</td><td>R2-1VL<br>[Q]C2-1<br/>CPIO</td></tr></table>",
+    "nested_table": (
+        "<td><table><tr><td>Case Number:</td><td>CPC-2019-4371-CA</td></tr>"
+        "<tr><td colspan=2><table><tr><td>Required Action(s):</td><td>CA-CODE AMENDMENT</td></tr></table></td></tr>"
+        "</table></td>"
+    ),
+    "entities": "<table><tr><td>Lot&nbsp;/&nbsp;Parcel</td><td>A &amp; B &lt;1&gt; &#233;</td></tr></table>",
+    "comments_scripts": (
+        "<table><tr><td>APN<!-- hidden --></td><td><script>var x = 1;</script>5404012015"
+        "<style>td {}</style></td></tr></table>"
+    ),
+    "inline_markup": "<table><tr><td><b>Specific</b> Plan <i>Area</i></td><td><a href='#'>None</a></td></tr></table>",
+    "label_only_and_spans": (
+        "<table><tr><td></td><td>ZI-2512 Housing Element Sites</td></tr>"
+        "<tr><td colspan=2><span>Building 1</span></td></tr><tr><td> </td><td> </td></tr></table>"
+    ),
+    "no_table": "<div>Direct all inquiries to<br>Los Angeles Housing Department<p>Telephone: (866) 557-7368</p></div>",
+    "th_cells": "<table><tr><th>Label</th><td>only td</td></tr><tr><th>a</th><th>b</th></tr></table>",
+}
+
+
+def samples() -> List[Tuple[str, str]]:
+    with open(os.path.join(FIXTURES_DIR, "zimas_bar.html"), encoding="utf-8") as fh:
+        bar = fh.read()
+    out = [("bar", bar)]
+    soup = BeautifulSoup(bar, "html.parser")
+    for td in soup.select("td.DataTabs"):
+        tab_tr = td.find_parent("tr")
+        row = tab_tr.find_next_sibling("tr") if tab_tr is not None else None
+        if row is not None and row.select_one("td.DataTabs") is None:
+            out.append((f"panel:{' '.join(td.get_text(' ', strip=True).split())}", row.decode_contents()))
+    return out + [(f"edge:{k}", v) for k, v in EDGE_CASES.items()]
+
+
+def bench(cases: List[Tuple[str, str]], seconds: float) -> Dict[str, float]:
+    panels = [html for name, html in cases if name.startswith("panel:")]
+    rates = {}
+    for backend in available_backends():
+        pages = 0
+        t0 = time.perf_counter()
+        while time.perf_counter() - t0 < seconds:
+            for html in panels:
+                html_to_text(html, backend=backend)
+            pages += 1
+        rates[backend] = pages / (time.perf_counter() - t0)
+    return rates
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--seconds", type=float, default=1.0, help="timing window per backend")
+    ap.add_argument("--write-golden", action="store_true", help="regenerate the golden file with bs4")
+    args = ap.parse_args()
+
+    cases = samples()
+    if args.write_golden:
+        with open(GOLDEN_PATH, "w", encoding="utf-8") as fh:
+            json.dump({name: html_to_text(html, backend="bs4") for name, html in cases}, fh,
+                      ensure_ascii=False, indent=1)
+            fh.write("\n")
+        print(f"wrote {len(cases)} samples to {GOLDEN_PATH}")
+        return
+
+    rates = bench(cases, args.seconds)
+    base = rates["bs4"]
+    print(f"{'backend':<12}{'pages/sec':>11}{'vs bs4':>9}")
+    for backend, rate in rates.items():
+        print(f"{backend:<12}{rate:>11.1f}{rate / base:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
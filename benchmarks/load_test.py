@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Concurrent-request load test for the /analyze endpoint.
+
+Fires N requests with C in flight against a running API and prints throughput and latency percentiles.
+Run it once against the sync handler (previous release) and once against the async one to compare:
+
+    python -m benchmarks.load_test --url http://localhost:8000/analyze -n 20 -c 10
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Dict, List
+
+import httpx
+
+
+def _pct(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    s = sorted(values)
+    idx = min(len(s) - 1, max(0, int(round(q * (len(s) - 1)))))
+    return s[idx]
+
+
+async def run_load(url: str, payload: Dict, total: int, concurrency: int, timeout: float) -> Dict:
+    sem = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async with httpx.AsyncClient(timeout=timeout) as client:
+        async def one() -> None:
+            nonlocal errors
+            async with sem:
+                t0 = time.perf_counter()
+                try:
+                    r = await client.post(url, json=payload)
+                    r.raise_for_status()
+                    latencies.append(time.perf_counter() - t0)
+                except Exception:
+                    errors += 1
+
+        t_start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        wall = time.perf_counter() - t_start
+
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "ok": len(latencies),
+        "errors": errors,
+        "wall_sec": round(wall, 2),
+        "throughput_rps": round(len(latencies) / wall, 3) if wall else 0.0,
+        "p50_sec": round(_pct(latencies, 0.50), 2),
+        "p95_sec": round(_pct(latencies, 0.95), 2),
+        "max_sec": round(max(latencies), 2) if latencies else 0.0,
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--url", default="http://localhost:8000/analyze")
+    ap.add_argument("-n", "--requests", type=int, default=20)
+    ap.add_argument("-c", "--concurrency", type=int, default=10)
+    ap.add_argument("--street", default="Main St")
+    ap.add_argument("--house", default="200")
+    ap.add_argument("--timeout", type=float, default=600)
+    args = ap.parse_args()
+
+    payload = {"street_name": args.street, "house_number": args.house}
+    out = asyncio.run(run_load(args.url, payload, args.requests, args.concurrency, args.timeout))
+    print(json.dumps(out, indent=2))
+
+
+if __name__ == "__main__":
+    main()
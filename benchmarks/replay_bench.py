@@ -0,0 +1,340 @@
+# -*- coding: utf-8 -*-
+"""
+Offline end-to-end benchmark of the property workflow against the replay stand-in server.
+
+Starts benchmarks.replay_server in-process (or uses --server-url), points the scraper, Tavily and
+LLM integrations at it through a temporary config, and runs `-n` analyses at each concurrency
+level. Reports end-to-end latency percentiles, throughput, per-node latency (from the
+property_graph_node_seconds histograms) and peak memory: the Python heap high-water mark and the
+peak RSS of this process plus its children (the Chromium processes of the browser pool).
+
+    python -m benchmarks.replay_bench -n 12 --concurrency 1,4,8 --json-out bench.json
+    python -m benchmarks.replay_bench -n 12 --concurrency 4 --baseline bench.json --threshold 0.15
+
+With --baseline the run is compared with an earlier --json-out file and exits non-zero when p50/p95
+latency or throughput regress by more than --threshold. Caches are disabled unless --with-cache,
+and the client-side tokens-per-minute budgets are lifted unless --keep-tpm-limits, so every request
+does the full amount of work.
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import socket
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional, Tuple
+
+import yaml
+
+from benchmarks.load_test import _pct
+from benchmarks.replay_server import DEFAULT_LATENCY, FIXTURES_DIR, create_app
+
+NODES = ["scrape", "plan", "search", "prefetch", "extract", "decide", "analyze", "format"]
+ERROR_PREFIXES = ("scrape:", "plan:", "search:", "extract:", "llm:")
+
+
+# ---------- stand-in server ----------
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_server(latency: Dict[str, float]) -> Tuple[str, Any]:
+    import uvicorn
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(create_app(FIXTURES_DIR, latency), host="127.0.0.1", port=port,
+                                           log_level="warning"))
+    thread = threading.Thread(target=server.run, name="replay-server", daemon=True)
+    thread.start()
+    deadline = time.time() + 15
+    while not server.started:
+        if time.time() > deadline:
+            raise RuntimeError("replay server did not start")
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}", server
+
+
+def _write_config(server_url: str, with_cache: bool, keep_tpm_limits: bool) -> str:
+    with open(os.getenv("CONFIG_PATH", "config/config.yaml"), "r", encoding="utf-8") as f:
+        cfg = yaml.safe_load(f) or {}
+    integ = cfg.setdefault("integrations", {})
+    integ.setdefault("llm", {})["base_url"] = f"{server_url}/v1/chat/completions"
+    integ.setdefault("search", {})["base_url"] = f"{server_url}/tavily/search"
+    if not keep_tpm_limits:
+        integ["llm"]["tpm_limits"] = {}
+    cache = cfg.setdefault("cache", {})
+    cache["path"] = ""
+    for name in ("search", "panels", "llm", "artifacts"):
+        cache.setdefault(name, {})["enabled"] = with_cache
+    fd, path = tempfile.mkstemp(prefix="replay_config_", suffix=".yaml")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        yaml.safe_dump(cfg, f, sort_keys=False)
+    return path
+
+
+# ---------- measurements ----------
+def _tree_rss_bytes() -> int:
+    """RSS of this process and all its descendants (Linux /proc); 0 where unavailable."""
+    total, stack, seen = 0, [os.getpid()], set()
+    while stack:
+        pid = stack.pop()
+        if pid in seen:
+            continue
+        seen.add(pid)
+        try:
+            with open(f"/proc/{pid}/status", "r") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+                        break
+            for task in os.listdir(f"/proc/{pid}/task"):
+                with open(f"/proc/{pid}/task/{task}/children", "r") as f:
+                    stack.extend(int(c) for c in f.read().split())
+        except (OSError, ValueError):
+            continue
+    return total
+
+
+class _RssSampler:
+    def __init__(self, interval: float = 0.2) -> None:
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.peak = max(self.peak, _tree_rss_bytes())
+            self._stop.wait(self.interval)
+
+    def __enter__(self) -> "_RssSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _tree_rss_bytes())
+
+
+def _histogram_snapshot(hist: Any) -> Dict[str, Dict[str, Any]]:
+    """{node: {"count", "sum", "buckets": [(le, cumulative_count), ...]}} from a labelled prometheus Histogram."""
+    out: Dict[str, Dict[str, Any]] = {}
+    for metric in hist.collect():
+        for s in metric.samples:
+            node = s.labels.get("node")
+            if node is None:
+                continue
+            entry = out.setdefault(node, {"count": 0.0, "sum": 0.0, "buckets": []})
+            if s.name.endswith("_bucket"):
+                entry["buckets"].append((float(s.labels["le"]), s.value))
+            elif s.name.endswith("_count"):
+                entry["count"] = s.value
+            elif s.name.endswith("_sum"):
+                entry["sum"] = s.value
+    return out
+
+
+def _bucket_quantile(q: float, buckets: List[Tuple[float, float]]) -> Optional[float]:
+    """Linear interpolation inside the bucket holding the q-quantile (same as PromQL histogram_quantile)."""
+    if not buckets or buckets[-1][1] <= 0:
+        return None
+    rank = q * buckets[-1][1]
+    prev_le, prev_count = 0.0, 0.0
+    for le, count in buckets:
+        if count >= rank:
+            if le == float("inf"):
+                return prev_le
+            span = count - prev_count
+            return prev_le + (le - prev_le) * ((rank - prev_count) / span if span else 0.0)
+        prev_le, prev_count = le, count
+    return prev_le
+
+
+def _node_latency(before: Dict[str, Any], after: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    out: Dict[str, Dict[str, Any]] = {}
+    for node, a in after.items():
+        b = before.get(node, {"count": 0.0, "sum": 0.0, "buckets": []})
+        count = a["count"] - b["count"]
+        if count <= 0:
+            continue
+        b_buckets = dict(b["buckets"])
+        buckets = [(le, c - b_buckets.get(le, 0.0)) for le, c in sorted(a["buckets"])]
+        out[node] = {
+            "count": int(count),
+            "mean_sec": round((a["sum"] - b["sum"]) / count, 3),
+            "p50_sec": round(_bucket_quantile(0.50, buckets) or 0.0, 3),
+            "p95_sec": round(_bucket_quantile(0.95, buckets) or 0.0, 3),
+        }
+    return out
+
+
+# ---------- run ----------
+async def _run_level(n: int, concurrency: int, stream: bool, address: Tuple[str, str]) -> Dict[str, Any]:
+    from agents import arun_property_workflow, astream_property_workflow
+    from app.browser_pool import browser_pool_stats
+    from app.metrics import NODE_LATENCY
+
+    sem = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    failed = 0
+    degraded = 0
+
+    async def one() -> None:
+        nonlocal failed, degraded
+        async with sem:
+            t0 = time.perf_counter()
+            try:
+                if stream:
+                    result: Dict[str, Any] = {}
+                    async for ev in astream_property_workflow(*address):
+                        if ev.get("event") == "result":
+                            result = ev
+                else:
+                    result = await arun_property_workflow(*address)
+            except Exception as e:
+                failed += 1
+                print(f"  request failed: {e}", file=sys.stderr)
+                return
+            latencies.append(time.perf_counter() - t0)
+            if any(str(w).startswith(ERROR_PREFIXES) for w in result.get("warnings") or []):
+                degraded += 1
+
+    before = _histogram_snapshot(NODE_LATENCY)
+    pool_before = browser_pool_stats()
+    tracemalloc.start()
+    with _RssSampler() as rss:
+        t_start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(n)))
+        wall = time.perf_counter() - t_start
+    _, py_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    after = _histogram_snapshot(NODE_LATENCY)
+    pool_after = browser_pool_stats()
+    pages = (pool_after.get("jobs_completed", 0) + pool_after.get("jobs_failed", 0)
+             - pool_before.get("jobs_completed", 0) - pool_before.get("jobs_failed", 0))
+    page_bytes = pool_after.get("bytes_total", 0) - pool_before.get("bytes_total", 0)
+
+    return {
+        "concurrency": concurrency,
+        "requests": n,
+        "ok": len(latencies),
+        "failed": failed,
+        "with_node_errors": degraded,
+        "wall_sec": round(wall, 2),
+        "throughput_rpm": round(len(latencies) / wall * 60, 2) if wall else 0.0,
+        "p50_sec": round(_pct(latencies, 0.50), 3),
+        "p95_sec": round(_pct(latencies, 0.95), 3),
+        "max_sec": round(max(latencies), 3) if latencies else 0.0,
+        "python_heap_peak_mb": round(py_peak / 2**20, 1),
+        "rss_peak_mb": round(rss.peak / 2**20, 1),
+        "browser_kb_per_scrape": round(page_bytes / pages / 1024, 1) if pages else 0.0,
+        "nodes": _node_latency(before, after),
+    }
+
+
+def _print_level(res: Dict[str, Any]) -> None:
+    print(f"\n== concurrency {res['concurrency']}: {res['ok']}/{res['requests']} ok, "
+          f"{res['with_node_errors']} with node errors, {res['failed']} failed")
+    print(f"   wall {res['wall_sec']}s  throughput {res['throughput_rpm']} req/min  "
+          f"p50 {res['p50_sec']}s  p95 {res['p95_sec']}s  max {res['max_sec']}s")
+    print(f"   peak memory: python heap {res['python_heap_peak_mb']} MB, rss (incl. browsers) {res['rss_peak_mb']} MB, "
+          f"browser transfer {res['browser_kb_per_scrape']} KB/scrape")
+    print(f"   {'node':<10}{'count':>7}{'mean':>9}{'p50':>9}{'p95':>9}")
+    for node in NODES:
+        st = res["nodes"].get(node)
+        if st:
+            print(f"   {node:<10}{st['count']:>7}{st['mean_sec']:>9.3f}{st['p50_sec']:>9.3f}{st['p95_sec']:>9.3f}")
+
+
+def _compare(current: List[Dict[str, Any]], baseline: List[Dict[str, Any]], threshold: float) -> List[str]:
+    base = {r["concurrency"]: r for r in baseline}
+    problems = []
+    for r in current:
+        b = base.get(r["concurrency"])
+        if b is None:
+            continue
+        for key in ("p50_sec", "p95_sec"):
+            if b[key] and r[key] > b[key] * (1 + threshold):
+                problems.append(f"c={r['concurrency']} {key} {b[key]} -> {r[key]}")
+        if b["throughput_rpm"] and r["throughput_rpm"] < b["throughput_rpm"] * (1 - threshold):
+            problems.append(f"c={r['concurrency']} throughput_rpm {b['throughput_rpm']} -> {r['throughput_rpm']}")
+    return problems
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("-n", type=int, default=8, help="requests per concurrency level")
+    ap.add_argument("--concurrency", default="1,4", help="comma-separated levels")
+    ap.add_argument("--street", default="Sample St")
+    ap.add_argument("--house", default="1234")
+    ap.add_argument("--stream", action="store_true", help="drive astream_property_workflow instead of ainvoke")
+    ap.add_argument("--server-url", default="", help="use an already running replay_server")
+    ap.add_argument("--with-cache", action="store_true")
+    ap.add_argument("--keep-tpm-limits", action="store_true")
+    for name, default in DEFAULT_LATENCY.items():
+        flag = name.replace("_", "-") if name in ("token_delay", "jitter") else f"{name.replace('_', '-')}-latency"
+        ap.add_argument(f"--{flag}", dest=name, type=float, default=default)
+    ap.add_argument("--json-out", default="")
+    ap.add_argument("--baseline", default="")
+    ap.add_argument("--threshold", type=float, default=0.15)
+    args = ap.parse_args()
+
+    server = None
+    server_url = args.server_url.rstrip("/")
+    if not server_url:
+        server_url, server = _start_server({name: getattr(args, name) for name in DEFAULT_LATENCY})
+    config_path = _write_config(server_url, args.with_cache, args.keep_tpm_limits)
+
+    # must be in place before app.settings / app.scraper are imported
+    os.environ["CONFIG_PATH"] = config_path
+    os.environ["ZIMAS_URL"] = f"{server_url}/zimas/"
+    os.environ["CACHE_PATH"] = ""  # never touch the developer's on-disk cache
+    for key in ("GROQ_API_KEY", "OPENROUTER_API_KEY", "TAVILY_API_KEY"):
+        os.environ.setdefault(key, "replay")
+    os.environ.setdefault("LANGSMITH_TRACING", "false")
+
+    from app.aio import run_sync
+    from app.browser_pool import close_browser_pool
+
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    results = []
+    print(f"replay server {server_url}; {args.n} requests per level; levels {levels}; "
+          f"mode {'stream' if args.stream else 'invoke'}; caches {'on' if args.with_cache else 'off'}")
+    try:
+        for c in levels:
+            res = run_sync(_run_level(args.n, c, args.stream, (args.street, args.house)))
+            _print_level(res)
+            results.append(res)
+    finally:
+        close_browser_pool()
+        if server is not None:
+            server.should_exit = True
+        os.unlink(config_path)
+
+    report = {"created_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "args": vars(args), "levels": results,
+              "max_rss_self_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)}
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nwrote {args.json_out}")
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            problems = _compare(results, json.load(f)["levels"], args.threshold)
+        if problems:
+            print("\nREGRESSIONS vs baseline (> {:.0%}):".format(args.threshold))
+            for p in problems:
+                print(f"  {p}")
+            sys.exit(1)
+        print("\nno regressions vs baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+"""
+Local stand-in for ZIMAS, Tavily and the OpenAI-compatible chat endpoint, for offline benchmarks.
+
+    /zimas/                      search form + #divLeftInformationBar flow driven by the real scraper
+    /tavily/search               Tavily-shaped JSON
+    /v1/chat/completions         chat completions (JSON mode, plain and `stream: true`)
+
+Responses come from benchmarks/fixtures: `zimas_bar.html` (an expanded info-bar dump), `tavily.json`
+and `llm.json`. Recorded responses under `<fixtures>/recorded/<service>/<key>.json` take precedence;
+with --record and an upstream URL, misses are forwarded upstream and saved there, so a live run can
+be captured once and replayed without network access. Every endpoint sleeps for its configured
+latency (plus jitter) before answering.
+
+    python -m benchmarks.replay_server serve --port 8765 --llm-latency 1.5 --token-delay 0.01
+    python -m benchmarks.replay_server serve --record --upstream-llm https://api.groq.com/openai/v1/chat/completions \
+        --upstream-tavily https://api.tavily.com/search
+    python -m benchmarks.replay_server record-zimas --street "Sunset Blvd" --house 6400
+"""
+import argparse
+import asyncio
+import copy
+import hashlib
+import html
+import json
+import os
+import random
+import re
+from typing import Any, Dict, List, Optional
+
+import httpx
+from bs4 import BeautifulSoup
+from fastapi import FastAPI, Request
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+DEFAULT_LATENCY = {
+    "zimas_page": 0.3,     # landing page
+    "zimas_search": 1.5,   # address search -> info bar
+    "tavily": 0.8,         # per search query
+    "llm": 1.2,            # time to first byte of a chat completion
+    "token_delay": 0.005,  # between streamed chunks
+    "jitter": 0.2,         # +- fraction applied to every delay
+}
+
+_LANDING_HTML = """<!DOCTYPE html>
+<html><head><title>ZIMAS (replay)</title></head>
+<body>
+<button id="btn">Search</button>
+<div id="searchBox" style="display:none">
+  <input id="txtHouseNumber" /> <input id="txtStreetName" />
+  <button id="btnSearchGo">Go</button>
+</div>
+<div id="barHolder"></div>
+<script>
+document.getElementById("btn").addEventListener("click", () => {
+  document.getElementById("searchBox").style.display = "block";
+});
+document.getElementById("btnSearchGo").addEventListener("click", async () => {
+  const q = new URLSearchParams({
+    street: document.getElementById("txtStreetName").value,
+    house: document.getElementById("txtHouseNumber").value,
+  });
+  const r = await fetch("bar?" + q.toString());
+  document.getElementById("barHolder").innerHTML = await r.text();
+  document.querySelectorAll("#divLeftInformationBar td.DataTabs a").forEach((a) => {
+    a.addEventListener("click", () => {
+      const img = a.querySelector("img");
+      const row = a.closest("tr").nextElementSibling;
+      const closed = (img.getAttribute("src") || "").includes("twist_closed");
+      img.setAttribute("src", closed ? "images/twist_open.gif" : "images/twist_closed.gif");
+      if (row && !row.querySelector("td.DataTabs")) row.style.display = closed ? "" : "none";
+    });
+  });
+});
+</script>
+</body></html>
+"""
+
+
+def _collapsed_bar(expanded_html: str) -> str:
+    """Turns an expanded info-bar dump into the initial state ZIMAS serves: every tab closed, rows hidden."""
+    soup = BeautifulSoup(expanded_html, "html.parser")
+    for td in soup.select("td.DataTabs"):
+        img = td.find("img")
+        if img is not None:
+            img["src"] = re.sub(r"twist_open", "twist_closed", img.get("src") or "images/twist_closed.gif")
+        tr = td.find_parent("tr")
+        nxt = tr.find_next_sibling("tr") if tr is not None else None
+        if nxt is not None and nxt.select_one("td.DataTabs") is None:
+            nxt["style"] = "display:none"
+    return str(soup)
+
+
+def _request_key(body: Dict[str, Any]) -> str:
+    # the serving model and transport flags don't change what a recorded answer should be
+    core = {k: v for k, v in body.items() if k not in ("model", "stream", "api_key")}
+    raw = json.dumps(core, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+def _llm_stage(body: Dict[str, Any]) -> str:
+    system = next((m.get("content") or "" for m in body.get("messages") or [] if m.get("role") == "system"), "")
+    if "research planning agent" in system:
+        return "plan"
+    if "extraction agent" in system:
+        return "extract"
+    return "report"
+
+
+def _sse(obj: Any) -> str:
+    return f"data: {json.dumps(obj, ensure_ascii=False)}\n\n"
+
+
+def create_app(fixtures_dir: str = FIXTURES_DIR, latency: Optional[Dict[str, float]] = None,
+               record: bool = False, upstream_llm: str = "", upstream_tavily: str = "") -> FastAPI:
+    lat = {**DEFAULT_LATENCY, **(latency or {})}
+    with open(os.path.join(fixtures_dir, "zimas_bar.html"), "r", encoding="utf-8") as f:
+        bar_html = _collapsed_bar(f.read())
+    with open(os.path.join(fixtures_dir, "tavily.json"), "r", encoding="utf-8") as f:
+        tavily_fx = json.load(f)
+    with open(os.path.join(fixtures_dir, "llm.json"), "r", encoding="utf-8") as f:
+        llm_fx = json.load(f)
+    recorded_dir = os.path.join(fixtures_dir, "recorded")
+    counters = {"zimas_search": 0, "tavily": 0, "llm": 0, "recorded_hits": 0, "recorded_saves": 0}
+
+    async def _delay(name: str) -> None:
+        base = lat.get(name, 0.0)
+        if base > 0:
+            j = lat["jitter"]
+            await asyncio.sleep(max(0.0, base * random.uniform(1 - j, 1 + j)))
+
+    def _recorded(service: str, key: str) -> Optional[Dict[str, Any]]:
+        path = os.path.join(recorded_dir, service, f"{key}.json")
+        if not os.path.exists(path):
+            return None
+        counters["recorded_hits"] += 1
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save(service: str, key: str, data: Dict[str, Any]) -> None:
+        os.makedirs(os.path.join(recorded_dir, service), exist_ok=True)
+        with open(os.path.join(recorded_dir, service, f"{key}.json"), "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        counters["recorded_saves"] += 1
+
+    async def _forward(url: str, body: Dict[str, Any], request: Request) -> Dict[str, Any]:
+        headers = {k: v for k, v in request.headers.items() if k.lower() in ("authorization", "content-type")}
+        async with httpx.AsyncClient(timeout=120) as client:
+            r = await client.post(url, json=body, headers=headers)
+            r.raise_for_status()
+            return r.json()
+
+    app = FastAPI(title="replay stand-in")
+
+    # ---------- ZIMAS ----------
+    @app.get("/zimas/", response_class=HTMLResponse)
+    async def zimas_landing() -> str:
+        await _delay("zimas_page")
+        return _LANDING_HTML
+
+    @app.get("/zimas/bar", response_class=HTMLResponse)
+    async def zimas_bar(street: str = "", house: str = "") -> str:
+        counters["zimas_search"] += 1
+        await _delay("zimas_search")
+        return bar_html.replace("1234 W SAMPLE ST", html.escape(f"{house} {street}".upper().strip()) or "1234 W SAMPLE ST")
+
+    # ---------- Tavily ----------
+    @app.post("/tavily/search")
+    async def tavily(request: Request) -> JSONResponse:
+        counters["tavily"] += 1
+        body = await request.json()
+        key = _request_key(body)
+        data = _recorded("tavily", key)
+        if data is None and record and upstream_tavily:
+            data = await _forward(upstream_tavily, body, request)
+            _save("tavily", key, data)
+            return JSONResponse(data)
+        if data is None:
+            q = " ".join(str(body.get("query") or "").lower().split())
+            data = copy.deepcopy(tavily_fx.get("by_query", {}).get(q) or tavily_fx["default"])
+            data["query"] = body.get("query")
+        await _delay("tavily")
+        return JSONResponse(data)
+
+    # ---------- chat completions ----------
+    @app.post("/v1/chat/completions")
+    async def chat(request: Request):
+        counters["llm"] += 1
+        body = await request.json()
+        key = _request_key(body)
+        stage = _llm_stage(body)
+        data = _recorded("llm", key)
+        if data is not None:
+            await _delay("llm")
+        elif record and upstream_llm:
+            data = await _forward(upstream_llm, {**body, "stream": False}, request)
+            _save("llm", key, data)
+        else:
+            await _delay("llm")
+            content = llm_fx[stage] if stage == "report" else json.dumps(llm_fx[stage], ensure_ascii=False)
+            prompt_tokens, completion_tokens = llm_fx.get("usage", {}).get(stage, [0, 0])
+            data = {
+                "id": f"replay-{key[:12]}",
+                "object": "chat.completion",
+                "model": body.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                          "total_tokens": prompt_tokens + completion_tokens},
+            }
+
+        if not body.get("stream"):
+            return JSONResponse(data)
+
+        content = data["choices"][0]["message"]["content"] or ""
+        chunks: List[str] = re.findall(r"\S+\s*|\s+", content)
+
+        async def _stream():
+            for piece in chunks:
+                yield _sse({"choices": [{"index": 0, "delta": {"content": piece}}]})
+                if lat["token_delay"] > 0:
+                    await asyncio.sleep(lat["token_delay"])
+            yield "data: [DONE]\n\n"
+        return StreamingResponse(_stream(), media_type="text/event-stream")
+
+    @app.get("/replay/stats")
+    def replay_stats() -> Dict[str, int]:
+        return dict(counters)
+
+    return app
+
+
+def record_zimas(street: str, house: str, out_path: str, url: str = "https://zimas.lacity.org/") -> None:
+    """Captures the expanded #divLeftInformationBar of a live ZIMAS search into a fixture file."""
+    from playwright.sync_api import sync_playwright
+    from app.scraper import _EXPAND_ALL_TABS_JS
+
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        try:
+            page = browser.new_page()
+            page.goto(url, wait_until="domcontentloaded")
+            page.click("#btn")
+            page.fill("#txtStreetName", street)
+            page.fill("#txtHouseNumber", house)
+            page.click("#btnSearchGo")
+            root = page.locator("#divLeftInformationBar")
+            root.wait_for(timeout=60000)
+            root.evaluate(_EXPAND_ALL_TABS_JS)
+            page.wait_for_load_state("networkidle", timeout=15000)
+            dump = root.evaluate("(el) => el.outerHTML")
+        finally:
+            browser.close()
+    with open(out_path, "w", encoding="utf-8") as f:
+        f.write(dump)
+    print(f"saved {len(dump)} bytes to {out_path}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    sv = sub.add_parser("serve", help="run the stand-in server")
+    sv.add_argument("--host", default="127.0.0.1")
+    sv.add_argument("--port", type=int, default=8765)
+    sv.add_argument("--fixtures", default=FIXTURES_DIR)
+    for name, default in DEFAULT_LATENCY.items():
+        flag = name.replace("_", "-") if name in ("token_delay", "jitter") else f"{name.replace('_', '-')}-latency"
+        sv.add_argument(f"--{flag}", dest=name, type=float, default=default)
+    sv.add_argument("--record", action="store_true", help="forward misses upstream and save them")
+    sv.add_argument("--upstream-llm", default="")
+    sv.add_argument("--upstream-tavily", default="")
+
+    rz = sub.add_parser("record-zimas", help="capture a live ZIMAS info bar as zimas_bar.html")
+    rz.add_argument("--street", required=True)
+    rz.add_argument("--house", required=True)
+    rz.add_argument("--out", default=os.path.join(FIXTURES_DIR, "zimas_bar.html"))
+
+    args = ap.parse_args()
+    if args.cmd == "record-zimas":
+        record_zimas(args.street, args.house, args.out)
+        return
+
+    import uvicorn
+    latency = {name: getattr(args, name) for name in DEFAULT_LATENCY}
+    app = create_app(args.fixtures, latency, record=args.record,
+                     upstream_llm=args.upstream_llm, upstream_tavily=args.upstream_tavily)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Browser round-trips spent finding the six ZIMAS panel tabs.
+
+Loads the replay stand-in page (benchmarks/replay_server.py, fixture info bar) in Chromium and,
+for each of --runs fresh page loads, looks up every panel tab with
+  legacy   the old _find_tab_locator: per alias pattern a get_by_role() probe, then
+           count() / nth() / inner_text() on every td.DataTabs child
+  indexed  scraper._TabIndex: one in-page evaluation, then a locator per hit
+and then runs the whole per-tab scrape (ZIMAS_SINGLE_PASS=0 path) and the default single-pass scrape.
+Round-trips are Playwright protocol messages, counted at the connection layer.
+
+    python -m benchmarks.tab_lookup_bench --runs 5
+"""
+import argparse
+import statistics
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from playwright._impl._connection import Channel
+from playwright.sync_api import Locator, Page, sync_playwright
+
+from benchmarks.replay_bench import _start_server
+from benchmarks.replay_server import DEFAULT_LATENCY
+
+_calls = {"n": 0}
+
+
+def _count_round_trips() -> None:
+    inner_send, send_no_reply = Channel._inner_send, Channel.send_no_reply
+
+    async def counted_inner_send(self: Channel, *args: Any, **kwargs: Any) -> Any:
+        _calls["n"] += 1
+        return await inner_send(self, *args, **kwargs)
+
+    def counted_send_no_reply(self: Channel, *args: Any, **kwargs: Any) -> Any:
+        _calls["n"] += 1
+        return send_no_reply(self, *args, **kwargs)
+
+    Channel._inner_send = counted_inner_send
+    Channel.send_no_reply = counted_send_no_reply
+
+
+def _legacy_find_tab_locator(page: Page, canonical_name: str) -> Optional[Locator]:
+    """_find_tab_locator as it was before the tab index."""
+    from app.scraper import _alias_patterns, _norm
+
+    root = page.locator("#divLeftInformationBar")
+    for rx in _alias_patterns(canonical_name):
+        try:
+            loc = root.get_by_role("link", name=rx).first
+            if loc.count() > 0:
+                return loc
+        except Exception:
+            pass
+        containers = root.locator("td.DataTabs").locator("a, span, div")
+        n = containers.count()
+        for i in range(n):
+            el = containers.nth(i)
+            try:
+                txt = el.inner_text(timeout=200)
+            except Exception:
+                continue
+            if rx.match(_norm(txt) or ""):
+                return el
+    return None
+
+
+def _open_bar(page: Page, url: str) -> None:
+    page.goto(url, wait_until="domcontentloaded")
+    page.click("#btn")
+    page.fill("#txtStreetName", "Sample St")
+    page.fill("#txtHouseNumber", "1234")
+    page.click("#btnSearchGo")
+    page.wait_for_selector("#divLeftInformationBar", timeout=30000)
+
+
+def _measure(page: Page, url: str, fn: Callable[[Page], Any]) -> Dict[str, float]:
+    _open_bar(page, url)
+    before = _calls["n"]
+    t0 = time.perf_counter()
+    fn(page)
+    return {"round_trips": _calls["n"] - before, "sec": time.perf_counter() - t0}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--runs", type=int, default=3)
+    args = ap.parse_args()
+
+    from app import scraper
+
+    names = list(scraper._empty_panels())
+    server_url, server = _start_server({**DEFAULT_LATENCY, "zimas_page": 0.0, "zimas_search": 0.0, "jitter": 0.0})
+    url = f"{server_url}/zimas/"
+    _count_round_trips()
+
+    def legacy(page: Page) -> None:
+        for name in names:
+            assert _legacy_find_tab_locator(page, name) is not None, name
+
+    def indexed(page: Page) -> None:
+        index = scraper._TabIndex(page)
+        for name in names:
+            assert index.find(name) is not None, name
+
+    def per_tab_scrape(page: Page) -> None:
+        index = scraper._TabIndex(page)
+        for name in names:
+            scraper._open_tab_and_get_content(page, name, index=index)
+
+    def single_pass(page: Page) -> None:
+        scraper._collect_panels_single_pass(page, scraper._empty_panels())
+
+    cases = {"legacy lookup": legacy, "indexed lookup": indexed,
+             "per-tab scrape": per_tab_scrape, "single-pass scrape": single_pass}
+    results: Dict[str, List[Dict[str, float]]] = {k: [] for k in cases}
+    try:
+        with sync_playwright() as p:
+            browser = p.chromium.launch(headless=True)
+            page = browser.new_page()
+            for _ in range(args.runs):
+                for label, fn in cases.items():
+                    results[label].append(_measure(page, url, fn))
+            browser.close()
+    finally:
+        server.should_exit = True
+
+    print(f"{'case':<22}{'round-trips':>12}{'mean ms':>10}")
+    for label, runs in results.items():
+        rt = statistics.mean(r["round_trips"] for r in runs)
+        ms = statistics.mean(r["sec"] for r in runs) * 1000
+        print(f"{label:<22}{rt:>12.1f}{ms:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+"""
+Every installed HTML -> text backend reproduces the bs4 golden output (benchmarks/fixtures/
+html_text_golden.json) on the saved ZIMAS bar, its panels and the hand-written edge cases.
+"""
+import json
+
+import pytest
+
+from app.html_text import available_backends, html_to_text
+from benchmarks.html_text_bench import GOLDEN_PATH, samples
+
+CASES = samples()
+
+
+@pytest.fixture(scope="module")
+def golden():
+    with open(GOLDEN_PATH, encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def test_golden_covers_every_sample(golden):
+    assert sorted(golden) == sorted(name for name, _ in CASES)
+
+
+@pytest.mark.parametrize("backend", available_backends())
+@pytest.mark.parametrize("name,html", CASES, ids=[name for name, _ in CASES])
+def test_backend_matches_golden(golden, backend, name, html):
+    assert html_to_text(html, backend=backend) == golden[name]